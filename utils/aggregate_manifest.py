@@ -0,0 +1,151 @@
+import io
+import os
+import json
+import sqlite3
+import hashlib
+import numpy as np
+from collections import defaultdict
+from instrumentation import count, traced
+from parallel_ingest import imap_chunks
+from running_stats import RunningStats
+
+# === Settings ===
+HASH_BLOCK_SIZE = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    contribution BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aggregates (
+    name TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+"""
+
+# === Helper Functions ===
+
+def manifest_path_for(output_path):
+    """Manifest kept next to the aggregate it describes."""
+    return os.path.splitext(output_path)[0] + ".manifest.sqlite"
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def encode_contribution(contribution):
+    buffer = io.BytesIO()
+    np.savez(buffer, **contribution)
+    return buffer.getvalue()
+
+def decode_contribution(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+@traced("scan_changes")
+def scan_changes(conn, file_paths):
+    """Compare the files on disk against the manifest.
+
+    Returns (stale, fresh, removed): stale files have a new hash and must be
+    re-ingested, fresh ones only changed their mtime, removed ones are gone.
+    Unchanged files cost one stat call and are never read.
+    """
+    count(files=len(file_paths))
+    known = {path: (mtime_ns, size, sha256) for path, mtime_ns, size, sha256
+             in conn.execute("SELECT path, mtime_ns, size, sha256 FROM files")}
+
+    stale, fresh = [], []
+    for path in file_paths:
+        st = os.stat(path)
+        entry = known.get(path)
+        if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+            continue
+        digest = file_digest(path)
+        record = (path, st.st_mtime_ns, st.st_size, digest)
+        if entry is not None and entry[2] == digest:
+            fresh.append(record)
+        else:
+            stale.append(record)
+
+    removed = sorted(set(known) - set(file_paths))
+    return stale, fresh, removed
+
+def retract(conn, stats, paths):
+    """Take the stored contributions of `paths` back out of the aggregates.
+
+    Returns True if a retracted sample held a current min or max.
+    """
+    touched_extrema = False
+    for i in range(0, len(paths), 500):
+        chunk = paths[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        for (blob,) in conn.execute(f"SELECT contribution FROM files WHERE path IN ({marks})", chunk):
+            for name, value in decode_contribution(blob).items():
+                acc = stats[name]
+                if acc.count and (np.any(value <= acc.min) or np.any(value >= acc.max)):
+                    touched_extrema = True
+                acc.remove(value[None])
+    return touched_extrema
+
+def rebuild_extrema(conn, stats):
+    """Min and max are not retractable, rebuild them from the stored contributions."""
+    extrema = defaultdict(RunningStats)
+    for (blob,) in conn.execute("SELECT contribution FROM files"):
+        for name, value in decode_contribution(blob).items():
+            extrema[name].update(value[None])
+    for name, acc in stats.items():
+        if acc.count:
+            acc.min, acc.max = extrema[name].min, extrema[name].max
+
+# === Main Function ===
+
+def incremental_aggregate(file_paths, manifest_path, contribute, workers=None):
+    """Bring the running aggregates of a file set up to date.
+
+    `contribute` maps a chunk of file paths to one dict per file of
+    name -> fixed-shape array; each array is one sample of the aggregate
+    with that name. Only new or changed files are passed to it, deleted and
+    changed files have their previous contribution retracted. Returns the
+    aggregates (name -> RunningStats) and a report of what was ingested.
+    """
+    file_paths = sorted(file_paths)
+    conn = sqlite3.connect(manifest_path)
+    try:
+        conn.executescript(SCHEMA)
+        stats = defaultdict(RunningStats)
+        for name, state in conn.execute("SELECT name, state FROM aggregates"):
+            stats[name] = RunningStats.from_state(json.loads(state))
+
+        stale, fresh, removed = scan_changes(conn, file_paths)
+        replaced = [record[0] for record in stale]
+
+        with conn:
+            touched_extrema = retract(conn, stats, removed + replaced)
+            conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+            conn.executemany("UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                             [(mtime_ns, size, path) for path, mtime_ns, size, _ in fresh])
+
+            contributions = (c for chunk in imap_chunks(contribute, replaced, workers) for c in chunk)
+            for (path, mtime_ns, size, digest), contribution in zip(stale, contributions):
+                for name, value in contribution.items():
+                    stats[name].update(np.asarray(value, dtype=np.float64)[None])
+                conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                             (path, mtime_ns, size, digest, encode_contribution(contribution)))
+
+            if touched_extrema:
+                rebuild_extrema(conn, stats)
+
+            conn.executemany("INSERT OR REPLACE INTO aggregates VALUES (?, ?)",
+                             [(name, json.dumps(acc.to_state())) for name, acc in stats.items()])
+    finally:
+        conn.close()
+
+    report = {"files": len(file_paths), "ingested": len(stale), "removed": len(removed),
+              "unchanged": len(file_paths) - len(stale)}
+    return stats, report
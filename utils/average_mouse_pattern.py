@@ -1,35 +1,81 @@
-import os
 import json
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.interpolate import interp1d
-from matplotlib.collections import LineCollection
+from functools import partial
+from aggregate_manifest import incremental_aggregate, manifest_path_for
+from label_index import LABEL_INDEX_PATH, session_files
+from parallel_ingest import imap_chunks, load_json
+from resample import downsample_path, resample_ragged, to_ragged
+from session_archive import SessionArchive
 
-def load_mouse_movements_from_json(folder_path):
+# === Settings ===
+AVERAGING = "mean"  # "dba" averages DTW-aligned paths (dba.py), so hesitations at different moments do not smear
+
+def load_mouse_movements_from_json(folder_path, label=None, label_index=LABEL_INDEX_PATH):
     all_movements = []
-    for file in os.listdir(folder_path):
-        if file.endswith(".json"):
-            with open(os.path.join(folder_path, file), 'r') as f:
-                data = json.load(f)
-                all_movements.append(data["mouseMovements"])
+    for file_path in session_files(folder_path, label, label_index):
+        with open(file_path, 'r') as f:
+            data = json.load(f)
+            all_movements.append(data["mouseMovements"])
     return all_movements
 
+def load_mouse_movements_from_archive(archive_path, label=None):
+    archive = SessionArchive(archive_path)
+    values, offsets = archive.ragged("mouseMovements", archive.select(label))
+    return np.split(values, offsets[1:-1])
+
 def interpolate_movements(movements, num_points=100):
-    interpolated = []
-    for path in movements:
-        path = np.array(path)
-        t = np.linspace(0, 1, len(path))
-        new_t = np.linspace(0, 1, num_points)
-
-        kind = 'cubic' if len(path) >= 4 else 'linear'
-        interp_x = interp1d(t, path[:, 0], kind=kind)
-        interp_y = interp1d(t, path[:, 1], kind=kind)
-        interp_path = np.stack((interp_x(new_t), interp_y(new_t)), axis=-1)
-        interpolated.append(interp_path)
-    return np.array(interpolated)
+    # Cubic for paths of 4+ points, linear below, all paths in one batched pass
+    values, offsets = to_ragged(movements)
+    return resample_ragged(values, offsets, num_points, kind="cubic", min_cubic_points=4)
 
 def average_mouse_movements(interpolated_paths):
-    return np.mean(interpolated_paths, axis=0)
+    # Empty paths resample to NaN and are left out of the average
+    return np.nanmean(interpolated_paths, axis=0)
+
+def resampled_paths(file_paths, num_points=100):
+    """Resampled paths of a chunk of files; the process-pool work unit."""
+    return interpolate_movements([load_json(file_path).get("mouseMovements", []) for file_path in file_paths],
+                                 num_points)
+
+def file_path_contributions(file_paths, num_points=100):
+    """Each file's resampled path, as stored in the incremental manifest."""
+    movements = [load_json(file_path).get("mouseMovements", []) for file_path in file_paths]
+    interpolated = interpolate_movements(movements, num_points)
+    return [{} if np.isnan(path).any() else {"averageMouseMovements": path} for path in interpolated]
+
+def average_movements_incremental(folder_path, output_path, workers=None, label=None, label_index=LABEL_INDEX_PATH):
+    """Average path of a folder, re-reading only files changed since the last run.
+
+    With a label, only the sessions the label index gives that label count.
+    """
+    files = session_files(folder_path, label, label_index)
+    stats, report = incremental_aggregate(files, manifest_path_for(output_path),
+                                          file_path_contributions, workers)
+    print(f"Ingested {report['ingested']}, removed {report['removed']}, "
+          f"reused {report['unchanged']} of {report['files']} files.")
+
+    if not stats["averageMouseMovements"].count:
+        print("No usable mouse paths found.")
+        return None
+    avg_array = stats["averageMouseMovements"].mean
+    save_average_to_json(avg_array, output_path)
+    return avg_array
+
+def average_movements_dba(folder_path, output_path, num_points=100, workers=None, label=None,
+                          label_index=LABEL_INDEX_PATH):
+    """DTW barycenter average path of a folder, saved in the same format as the mean path."""
+    from dba import dba_average
+
+    files = session_files(folder_path, label, label_index)
+    if not files:
+        print("No JSON files found.")
+        return None
+    paths = np.concatenate(list(imap_chunks(partial(resampled_paths, num_points=num_points), files, workers)))
+    avg_array, report = dba_average(paths, workers=workers)
+    print(f"DBA over {report['paths']} paths, band radius {report['radius']}, "
+          f"mean DTW cost per iteration: {', '.join(f'{cost:.1f}' for cost in report['costs'])}")
+    save_average_to_json(avg_array, output_path)
+    return avg_array
 
 def save_average_to_json(avg_array, output_path):
     result = {
@@ -38,7 +84,12 @@ def save_average_to_json(avg_array, output_path):
     with open(output_path, 'w') as f:
         json.dump(result, f, indent=4)
 
-def plot_mouse_path(avg_array):
+def plot_mouse_path(avg_array, title="Truth: Average Mouse Movement Path", output_path=None,
+                    show=True, max_points=None):
+    import matplotlib.pyplot as plt  # Only plotting needs matplotlib
+    from batch_render import finish_figure
+
+    avg_array = downsample_path(avg_array, max_points)
     x, y = avg_array[:, 0], avg_array[:, 1]
 
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -47,26 +98,28 @@ def plot_mouse_path(avg_array):
     ax.plot(x, y, color='blue', linewidth=2, label="Mouse Path")
 
     # Mark first point
-    ax.plot(x[0], y[0], 'go', color='grey', label="Start", markersize=6)
+    ax.plot(x[0], y[0], 'o', color='grey', label="Start", markersize=6)
     # Mark last point
-    ax.plot(x[-1], y[-1], 'ro', color='grey', label="End", markersize=6)
+    ax.plot(x[-1], y[-1], 'o', color='grey', label="End", markersize=6)
     # Line between first and last point
-    ax.plot([x[0], x[-1]], [y[0], y[-1]], 'k--', color='grey', label="Start-End Line", linewidth=1.5)
+    ax.plot([x[0], x[-1]], [y[0], y[-1]], '--', color='grey', label="Start-End Line", linewidth=1.5)
 
-    ax.set_title("Truth: Average Mouse Movement Path")
+    ax.set_title(title)
     ax.set_xlabel("X position")
     ax.set_ylabel("Y position")
     ax.invert_yaxis()  # typical screen coords
     ax.legend()
     ax.grid(True, linestyle='--', alpha=0.4)
-    plt.tight_layout()
-    plt.show()
+    finish_figure(output_path, show)
 
 # === USAGE ===
-folder_path = "questionnaire_sessions/truth"  # Replace with your actual folder
-
-movements = load_mouse_movements_from_json(folder_path)
-interpolated = interpolate_movements(movements, num_points=100)
-avg_array = average_mouse_movements(interpolated)
-plot_mouse_path(avg_array)
+if __name__ == "__main__":
+    folder_path = "questionnaire_sessions/truth"  # Replace with your actual folder
 
+    if AVERAGING == "dba":
+        avg_array = average_movements_dba(folder_path, "averaged_json/truth_average_mouse_path.json", label=0)
+    else:
+        avg_array = average_movements_incremental(folder_path, "averaged_json/truth_average_mouse_path.json",
+                                                  label=0)
+    if avg_array is not None:
+        plot_mouse_path(avg_array)
@@ -1,15 +1,21 @@
-import os
 import json
+import numpy as np
+from aggregate_manifest import incremental_aggregate, manifest_path_for
+from instrumentation import count, traced
+from label_index import LABEL_INDEX_PATH, session_files
+from parallel_ingest import load_json
+from session_archive import SessionArchive
 
-def load_json_files(folder_path):
+def load_json_files(folder_path, label=None, label_index=LABEL_INDEX_PATH):
     data = []
-    for file in os.listdir(folder_path):
-        if file.endswith(".json"):
-            with open(os.path.join(folder_path, file), 'r') as f:
-                data.append(json.load(f))
+    for file_path in session_files(folder_path, label, label_index):
+        with open(file_path, 'r') as f:
+            data.append(json.load(f))
     return data
 
+@traced("aggregate")
 def compute_summary_stats(data):
+    count(sessions=len(data))
     total_time = []
     avg_speed = []
     jerk_spikes = []
@@ -40,19 +46,78 @@ def compute_summary_stats(data):
         "averagePauseCount": safe_avg(pause_counts)
     }
 
+def compute_summary_stats_from_archive(archive_path, label=None):
+    archive = SessionArchive(archive_path)
+    indices = archive.select(label)
+    pauses, pause_offsets = archive.ragged("pausePoints", indices)
+
+    def safe_avg(arr):
+        return float(np.mean(arr)) if len(arr) else 0
+
+    return {
+        "averageTotalTime": safe_avg(archive.scalar("totalTime")[indices]),
+        "averageSpeed": safe_avg(archive.scalar("averageSpeed")[indices]),
+        "averageJerkSpikeCount": safe_avg(archive.scalar("jerkSpikeCount")[indices]),
+        "averageHesitation": safe_avg(archive.scalar("hesitation")[indices]),
+        "averagePauseDuration": safe_avg(pauses[:, 2]),
+        "averagePauseCount": safe_avg(np.diff(pause_offsets))
+    }
+
+def file_summary_contributions(file_paths):
+    """Per-file scalars stored in the incremental manifest."""
+    contributions = []
+    for file_path in file_paths:
+        entry = load_json(file_path)
+        pauses = entry.get("pausePoints", [])
+        contributions.append({
+            "totalTime": np.float64(entry.get("totalTime", 0)),
+            "averageSpeed": np.float64(entry.get("averageSpeed", 0)),
+            "jerkSpikeCount": np.float64(entry.get("jerkSpikeCount", 0)),
+            "hesitation": np.float64(entry.get("hesitation", 0)),
+            "pauseCount": np.float64(len(pauses)),
+            "pauseDurationTotal": np.float64(sum(pause.get("duration", 0) for pause in pauses))
+        })
+    return contributions
+
+def compute_summary_stats_incremental(folder_path, output_path, workers=None, label=None,
+                                      label_index=LABEL_INDEX_PATH):
+    """compute_summary_stats over a folder, re-reading only files changed since the last run.
+
+    With a label, only the sessions the label index gives that label count.
+    """
+    files = session_files(folder_path, label, label_index)
+    stats, report = incremental_aggregate(files, manifest_path_for(output_path),
+                                          file_summary_contributions, workers)
+    print(f"Ingested {report['ingested']}, removed {report['removed']}, "
+          f"reused {report['unchanged']} of {report['files']} files.")
+
+    def mean(name):
+        return float(stats[name].mean) if stats[name].count else 0
+
+    # Pause durations are pooled over all pauses, not averaged per file
+    pause_count = mean("pauseCount")
+    return {
+        "averageTotalTime": mean("totalTime"),
+        "averageSpeed": mean("averageSpeed"),
+        "averageJerkSpikeCount": mean("jerkSpikeCount"),
+        "averageHesitation": mean("hesitation"),
+        "averagePauseDuration": mean("pauseDurationTotal") / pause_count if pause_count else 0,
+        "averagePauseCount": pause_count
+    }
+
 def save_stats_to_json(stats, output_path):
     with open(output_path, 'w') as f:
         json.dump(stats, f, indent=4)
 
 # === USAGE ===
-folder_path = "questionnaire_sessions/truth"  # Replace with your folder path
-output_file = "truth_mouse_stats_summary.json"
+if __name__ == "__main__":
+    folder_path = "questionnaire_sessions/truth"  # Replace with your folder path
+    output_file = "truth_mouse_stats_summary.json"
 
-data = load_json_files(folder_path)
-stats = compute_summary_stats(data)
-save_stats_to_json(stats, output_file)
+    stats = compute_summary_stats_incremental(folder_path, output_file, label=0)
+    save_stats_to_json(stats, output_file)
 
-# Print to console
-print("Summary Statistics:")
-for key, value in stats.items():
-    print(f"{key}: {value:.4f}")
+    # Print to console
+    print("Summary Statistics:")
+    for key, value in stats.items():
+        print(f"{key}: {value:.4f}")
@@ -1,27 +1,39 @@
 import json
 import matplotlib.pyplot as plt
 import numpy as np
+from batch_render import finish_figure
+
+# Chart keys and the names compute_summary_stats gives the same metrics
+SUMMARY_KEYS = {
+    "TotalTime": "averageTotalTime",
+    "averageSpeed": "averageSpeed",
+    "JerkSpikeCount": "averageJerkSpikeCount",
+    "Hesitation": "averageHesitation",
+    "PauseDuration": "averagePauseDuration",
+    "PauseCount": "averagePauseCount",
+}
 
 def load_summary_metrics(filepath):
     with open(filepath, 'r') as f:
         return json.load(f)
 
-def plot_comparison_chart(lie_data, truth_data):
+def plot_comparison_chart(lie_data, truth_data, output_path="averaged_charts/comparison_stats_chart.png", show=True,
+                          labels=("Lie", "Truth")):
     metric_labels = ["Total Time (s)", "Average Speed (px/s)", "Jerk Spikes", "Hesitation", "Pause Duration", "Pause Count"]
     keys = ["TotalTime", "averageSpeed", "JerkSpikeCount", "Hesitation", "PauseDuration", "PauseCount"]
 
-    lie_values = [lie_data.get(k, 0) for k in keys]
-    truth_values = [truth_data.get(k, 0) for k in keys]
+    lie_values = [lie_data.get(k, lie_data.get(SUMMARY_KEYS[k], 0)) for k in keys]
+    truth_values = [truth_data.get(k, truth_data.get(SUMMARY_KEYS[k], 0)) for k in keys]
 
     x = np.arange(len(metric_labels))
     width = 0.35
 
     fig, ax = plt.subplots(figsize=(10, 6))
-    bars1 = ax.bar(x - width/2, lie_values, width, label='Lie', color='red', alpha=0.9)
-    bars2 = ax.bar(x + width/2, truth_values, width, label='Truth', color='blue', alpha=0.9)
+    bars1 = ax.bar(x - width/2, lie_values, width, label=labels[0], color='red', alpha=0.9)
+    bars2 = ax.bar(x + width/2, truth_values, width, label=labels[1], color='blue', alpha=0.9)
 
     ax.set_ylabel('Values')
-    ax.set_title('Summary Statistics: Lie vs Truth')
+    ax.set_title(f'Summary Statistics: {labels[0]} vs {labels[1]}')
     ax.set_xticks(x)
     ax.set_xticklabels(metric_labels, rotation=15)
     ax.legend()
@@ -35,15 +47,14 @@ def plot_comparison_chart(lie_data, truth_data):
                     textcoords="offset points",
                     ha='center', va='bottom')
 
-    plt.tight_layout()
-    plt.savefig("averaged_charts/comparison_stats_chart.png")
-    plt.show()
+    finish_figure(output_path, show)
 
 # === USAGE ===
-lie_file = "averaged_json/lie_mouse_stats_summary.json"
-truth_file = "averaged_json/truth_mouse_stats_summary.json"
+if __name__ == "__main__":
+    lie_file = "averaged_json/lie_mouse_stats_summary.json"
+    truth_file = "averaged_json/truth_mouse_stats_summary.json"
 
-lie_metrics = load_summary_metrics(lie_file)
-truth_metrics = load_summary_metrics(truth_file)
+    lie_metrics = load_summary_metrics(lie_file)
+    truth_metrics = load_summary_metrics(truth_file)
 
-plot_comparison_chart(lie_metrics, truth_metrics)
+    plot_comparison_chart(lie_metrics, truth_metrics)
@@ -0,0 +1,212 @@
+import os
+import time
+import argparse
+import multiprocessing
+import matplotlib
+import matplotlib.pyplot as plt
+from contextlib import contextmanager
+from instrumentation import span
+from parallel_ingest import imap_chunks, load_json
+from resample import downsample_path, downsample_series, to_point_array
+from session_archive import find_session_files
+
+# === Settings ===
+MAX_PLOT_POINTS = 1000  # Points per line after LTTB; more do not show at chart resolution
+SESSION_FIELDS = ["accelerations", "jerks", "curvatures"]
+SESSION_CHARTS_DIR = "session_charts"
+DPI = 100
+RENDER_CHUNK_SIZE = 32  # Charts per pool task
+
+# === Helper Functions ===
+
+def use_headless():
+    """Switch matplotlib to the non-interactive Agg backend, nothing opens a window."""
+    matplotlib.use("Agg", force=True)
+
+def finish_figure(output_path=None, show=True, dpi=None):
+    """Lay out the current figure, save it if output_path is given, then show or close it.
+
+    With show=False the figure is closed instead of shown, so loops over
+    many charts neither block nor accumulate open figures.
+    """
+    with span("render", charts=1):
+        plt.tight_layout()
+        if output_path:
+            plt.savefig(output_path, dpi=dpi)
+    if show:
+        plt.show()
+    else:
+        plt.close()
+
+def new_session_figure():
+    """Empty path and series panels of a session chart; plot_session fills in the data."""
+    fig, axes = plt.subplots(1, 1 + len(SESSION_FIELDS), figsize=(16, 4))
+    fig.subplots_adjust(left=0.04, right=0.99, bottom=0.14, top=0.84, wspace=0.25)  # Fixed, tight_layout is slow
+    lines = {
+        "path": axes[0].plot([], [], color="blue", linewidth=1)[0],
+        "start": axes[0].plot([], [], 'o', color="grey", markersize=4)[0],
+        "end": axes[0].plot([], [], 's', color="grey", markersize=4)[0],
+    }
+    axes[0].set_title("Mouse Path")
+    axes[0].invert_yaxis()  # typical screen coords
+    for ax, field in zip(axes[1:], SESSION_FIELDS):
+        lines[field] = ax.plot([], [], color="red", linewidth=1)[0]
+        ax.set_title(field.capitalize())
+        ax.set_xlabel("Step")
+    for ax in axes:
+        ax.grid(True, linestyle='--', alpha=0.4)
+    return fig, axes, lines, fig.suptitle("", fontsize=10)
+
+_session_figure = None  # Reused by every headless session chart of a worker process
+
+def plot_session(file_path, output_path=None, show=True, max_points=MAX_PLOT_POINTS):
+    """One answer's path next to its acceleration, jerk and curvature over time.
+
+    Headless calls redraw the same figure with new data instead of building
+    a fresh one, which saves about a third of the time per chart.
+    """
+    global _session_figure
+    if show or _session_figure is None:
+        figure = new_session_figure()
+        if not show:
+            _session_figure = figure
+    fig, axes, lines, title = figure if show else _session_figure
+    session = load_json(file_path)
+
+    path = downsample_path(to_point_array(session.get("mouseMovements", [])).reshape(-1, 2), max_points)
+    lines["path"].set_data(path[:, 0], path[:, 1])
+    lines["start"].set_data(path[:1, 0], path[:1, 1])
+    lines["end"].set_data(path[-1:, 0], path[-1:, 1])
+    for field in SESSION_FIELDS:
+        lines[field].set_data(*downsample_series(session.get(field, []), max_points))
+    for ax in axes:
+        ax.relim()
+        ax.autoscale_view()
+
+    title.set_text(f"{session.get('question', '')} ({session.get('answer', '')}, "
+                   f"hesitation: {session.get('hesitationLevel', 'n/a')})")
+    if output_path:
+        with span("render", charts=1):
+            fig.savefig(output_path, dpi=DPI)
+    if show:
+        plt.show()
+
+# === Jobs ===
+# A job is (plot_function, args, kwargs). Plot functions take show= and are
+# defined at module level, so jobs pickle by reference to the pool workers.
+
+def session_chart_jobs(folder_path, output_dir=SESSION_CHARTS_DIR, max_points=MAX_PLOT_POINTS):
+    """One chart per session JSON below folder_path, mirroring its subfolders in output_dir."""
+    jobs = []
+    for file_path in find_session_files(folder_path):
+        relative = os.path.relpath(file_path, folder_path)
+        output_path = os.path.join(output_dir, os.path.splitext(relative)[0] + ".png")
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        jobs.append((plot_session, (file_path, output_path), {"max_points": max_points}))
+    return jobs
+
+def comparison_chart_jobs(lie_file, truth_file, output_dir="averaged_charts", max_points=MAX_PLOT_POINTS):
+    """The averaged_charts/ series and path comparisons of two averaged result files."""
+    from plot_mouse_analyse import (load_array, load_band, load_mouse_movements,
+                                    plot_mouse_path_comparison, plot_series_comparison)
+
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for key, title in (("accelerations", "Acceleration"), ("curvatures", "Curvature"), ("jerks", "Jerk")):
+        output_path = os.path.join(output_dir, f"{title.lower()}_comparison.png")
+        args = (load_array(lie_file, key), load_array(truth_file, key), title, title, output_path)
+        kwargs = {"band_lie": load_band(lie_file, key), "band_truth": load_band(truth_file, key),
+                  "max_points": max_points}
+        jobs.append((plot_series_comparison, args, kwargs))
+    jobs.append((plot_mouse_path_comparison,
+                 (load_mouse_movements(lie_file), load_mouse_movements(truth_file),
+                  os.path.join(output_dir, "path_comparison.png")),
+                 {"max_points": max_points}))
+    return jobs
+
+def summary_chart_jobs(lie_file, truth_file, output_dir="averaged_charts"):
+    """The summary statistics bar chart of two *_mouse_stats_summary.json files."""
+    from average_mouse_stats_chart import load_summary_metrics, plot_comparison_chart
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, "comparison_stats_chart.png")
+    return [(plot_comparison_chart, (load_summary_metrics(lie_file), load_summary_metrics(truth_file), output_path), {})]
+
+# === Main Functions ===
+
+@contextmanager
+def headless():
+    """use_headless for the duration of the block, then back to the previous backend.
+
+    The reused session figure was drawn on Agg, so it is closed before
+    switching back rather than left for the caller's next plt.show().
+    """
+    global _session_figure
+    previous = matplotlib.get_backend()
+    use_headless()
+    try:
+        yield
+    finally:
+        if previous.lower() != "agg":
+            if _session_figure is not None:
+                plt.close(_session_figure[0])
+                _session_figure = None
+            matplotlib.use(previous, force=True)
+
+def render_jobs(jobs):
+    for func, args, kwargs in jobs:
+        func(*args, show=False, **kwargs)
+    return len(jobs)
+
+def render_chunk(jobs):
+    """Render a chunk of jobs headlessly; the process-pool work unit.
+
+    Pool workers switch to Agg for good. Run in the calling process (one
+    worker or one chunk), the caller's backend is restored afterwards.
+    """
+    if multiprocessing.parent_process() is not None:
+        use_headless()
+        return render_jobs(jobs)
+    with headless():
+        return render_jobs(jobs)
+
+def render_batch(jobs, workers=None, chunk_size=RENDER_CHUNK_SIZE):
+    """Render every job to its file on a process pool, without opening any window."""
+    start = time.perf_counter()
+    count = sum(imap_chunks(render_chunk, jobs, workers, chunk_size))
+    seconds = time.perf_counter() - start
+    print(f"✅ Rendered {count} charts in {seconds:.1f}s")
+    return count
+
+def render_charts(sessions=None, averages=None, stats=None, output_dir=None, max_points=MAX_PLOT_POINTS,
+                  workers=None):
+    """Render the session, averaged comparison and/or summary charts asked for; see the CLI below."""
+    jobs = []
+    if sessions:
+        jobs += session_chart_jobs(sessions, output_dir or SESSION_CHARTS_DIR, max_points)
+    if averages:
+        jobs += comparison_chart_jobs(*averages, output_dir or "averaged_charts", max_points)
+    if stats:
+        jobs += summary_chart_jobs(*stats, output_dir or "averaged_charts")
+    if not jobs:
+        raise ValueError("nothing to render, pass sessions, averages and/or stats")
+    return render_batch(jobs, workers)
+
+# === Entry Point ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render charts to PNG files headlessly on a process pool.")
+    parser.add_argument("--sessions", help="Folder of session JSONs, one chart per answer")
+    parser.add_argument("--averages", nargs=2, metavar=("LIE_FILE", "TRUTH_FILE"),
+                        help="Averaged result files to compare, as in averaged_charts/")
+    parser.add_argument("--stats", nargs=2, metavar=("LIE_FILE", "TRUTH_FILE"),
+                        help="Summary statistics files to compare in a bar chart")
+    parser.add_argument("--output-dir", help="Defaults to session_charts/ or averaged_charts/")
+    parser.add_argument("--max-points", type=int, default=MAX_PLOT_POINTS,
+                        help="Points per line after LTTB downsampling, 0 keeps all")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        render_charts(args.sessions, args.averages, args.stats, args.output_dir, args.max_points or None, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
@@ -0,0 +1,91 @@
+import json
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from instrumentation import peak_rss_mb
+
+# === Settings ===
+FOLDERS = {
+    "data/truthful_responses": 0,
+    "data/deceptive_responses": 1,
+}
+MODES = ["fixed", "bucketed"]
+BENCHMARK_STEPS = 100
+WARMUP_STEPS = 10  # Excluded from timing; covers graph tracing for the first batch shapes
+OUTPUT_PATH = "bucketing_benchmark.json"
+
+# === Helper Functions ===
+
+def run_mode(mode, folders=FOLDERS, steps=BENCHMARK_STEPS, warmup=WARMUP_STEPS):
+    """Train `steps` batches with one input mode and measure it.
+
+    Runs in a fresh process per mode so the peak memory of one mode does not
+    leak into the other.
+    """
+    import tensorflow as tf
+    from input_pipeline import BATCH_SIZE, PAD_VALUE, dataset_bucketed, window_ragged
+    from model_training_dl_lstm_gru_v1 import SEED, build_model, load_labelled_sequences, load_raw_sequences
+
+    tf.random.set_seed(SEED)
+    if mode == "bucketed":
+        values, offsets, labels = load_raw_sequences(folders)
+        starts, ends, groups = window_ragged(offsets, np.arange(len(labels)))
+        ds = dataset_bucketed(values, starts, ends, labels[groups], shuffle=True, seed=SEED)
+        model = build_model(variable_length=True)
+        sequences = len(starts)
+    else:
+        # The current path: every answer truncated or zero-padded to SEQUENCE_LENGTH
+        X, y = load_labelled_sequences(folders, cache_dir=None)
+        ds = tf.data.Dataset.from_tensor_slices((X.astype(np.float32), y.astype(np.float32)))
+        ds = ds.shuffle(len(X), seed=SEED).batch(BATCH_SIZE)
+        model = build_model()
+        sequences = len(X)
+
+    batches = iter(ds.repeat())
+    for _ in range(warmup):
+        model.train_on_batch(*next(batches))
+
+    padded = real = seen = 0
+    elapsed = 0.0
+    for _ in range(steps):
+        x, y = next(batches)
+        start = time.perf_counter()
+        model.train_on_batch(x, y)
+        elapsed += time.perf_counter() - start
+
+        x = x.numpy()
+        seen += x.shape[0]
+        padded += x.shape[0] * x.shape[1]
+        if mode == "bucketed":
+            real += int((x != PAD_VALUE).any(axis=2).sum())
+        else:
+            real += int(np.count_nonzero(np.abs(x).sum(axis=2)))  # Fixed-length sequences are zero-padded
+
+    return {
+        "mode": mode,
+        "sequences": sequences,
+        "steps": steps,
+        "steps_per_sec": steps / elapsed,
+        "sequences_per_sec": seen / elapsed,
+        "timesteps_processed": padded,
+        "padding_fraction": 1 - real / padded,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+# === Entry Point ===
+if __name__ == "__main__":
+    results = []
+    for mode in MODES:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results.append(pool.submit(run_mode, mode).result())
+
+    print(f"{'mode':<10}{'steps/s':>10}{'seq/s':>10}{'padding':>10}{'peak MB':>10}")
+    for r in results:
+        peak = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else "n/a"
+        print(f"{r['mode']:<10}{r['steps_per_sec']:>10.1f}{r['sequences_per_sec']:>10.1f}"
+              f"{r['padding_fraction']:>10.1%}{peak:>10}")
+
+    with open(OUTPUT_PATH, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Saved benchmark results to {OUTPUT_PATH}")
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import argparse
+import platform
+import subprocess
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from instrumentation import peak_rss_mb
+from synthetic_sessions import LABEL_FOLDERS, generate_dataset
+
+# === Settings ===
+SIZES = [1000, 10000]  # Files per run; the generator scales to 1000000
+DATA_DIR = "benchmark_data"
+OUTPUT_PATH = "benchmark_results.json"
+MODEL_MAX_FILES = 50000  # Cap for the model stages, which hold X in memory
+TRAIN_EPOCHS = 1
+REGRESSION_RATIO = 1.2  # Slowdown against a previous run that gets flagged
+SEED = 0
+
+# === Stages ===
+# Each stage takes the dataset directory, does its setup untimed and returns
+# (items processed, seconds spent in the benchmarked call).
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def _truthful(data_dir):
+    return os.path.join(data_dir, LABEL_FOLDERS[0])
+
+def _model_inputs(data_dir):
+    from parallel_ingest import map_chunks
+    from sequence_features import featurize_labelled_files
+
+    per_label = MODEL_MAX_FILES // 2
+    items = []
+    for label, folder in LABEL_FOLDERS.items():
+        folder_path = os.path.join(data_dir, folder)
+        names = sorted(os.listdir(folder_path))[:per_label]
+        items += [(os.path.join(folder_path, name), label) for name in names]
+    chunks = map_chunks(featurize_labelled_files, items)
+    return np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])
+
+def stage_load_json_files(data_dir):
+    from average_mouse_stats import load_json_files
+    data, seconds = _timed(load_json_files, _truthful(data_dir))
+    return len(data), seconds
+
+def stage_load_mouse_movements(data_dir):
+    from average_mouse_pattern import load_mouse_movements_from_json
+    movements, seconds = _timed(load_mouse_movements_from_json, _truthful(data_dir))
+    return len(movements), seconds
+
+def stage_interpolate_movements(data_dir):
+    from average_mouse_pattern import interpolate_movements, load_mouse_movements_from_json
+    movements = load_mouse_movements_from_json(_truthful(data_dir))
+    _, seconds = _timed(interpolate_movements, movements)
+    return len(movements), seconds
+
+def stage_interpolate_to_fixed_length(data_dir):
+    from average_mouse_stats import load_json_files
+    from calc_averages import interpolate_to_fixed_length
+    arrays = [entry["accelerations"] for entry in load_json_files(_truthful(data_dir))]
+    _, seconds = _timed(lambda: [interpolate_to_fixed_length(array) for array in arrays])
+    return len(arrays), seconds
+
+def stage_average_json_from_folder(data_dir):
+    from calc_averages import average_json_from_folder
+    from session_archive import AVERAGED_RESULT_NAME
+    folder_path = _truthful(data_dir)
+    _, seconds = _timed(average_json_from_folder, folder_path)
+    count = len(os.listdir(folder_path)) - 1
+    os.remove(os.path.join(folder_path, AVERAGED_RESULT_NAME))
+    return count, seconds
+
+def stage_compute_summary_stats(data_dir):
+    from average_mouse_stats import compute_summary_stats, load_json_files
+    data = load_json_files(_truthful(data_dir))
+    _, seconds = _timed(compute_summary_stats, data)
+    return len(data), seconds
+
+def stage_load_sequences_from_folder(data_dir):
+    from model_training_dl_lstm_gru_v1 import load_sequences_from_folder
+    (X, _), seconds = _timed(load_sequences_from_folder, _truthful(data_dir), 0, cache_dir=None)
+    return len(X), seconds
+
+def stage_summary_features(data_dir):
+    from summary_features import summary_features
+    X, _ = _model_inputs(data_dir)
+    _, seconds = _timed(summary_features, X)
+    return len(X), seconds
+
+def stage_training_epoch(data_dir):
+    from model_training_dl_lstm_gru_v1 import build_model
+    X, y = _model_inputs(data_dir)
+    model = build_model()
+    _, seconds = _timed(model.fit, X, y, epochs=TRAIN_EPOCHS, batch_size=32, verbose=0)
+    return len(X) * TRAIN_EPOCHS, seconds
+
+def stage_model_predict(data_dir):
+    from model_training_dl_lstm_gru_v1 import build_model
+    X, _ = _model_inputs(data_dir)
+    model = build_model()
+    model.predict(X[:32], verbose=0)  # Trace the graph outside the timing
+    _, seconds = _timed(model.predict, X, verbose=0)
+    return len(X), seconds
+
+STAGES = {
+    "load_json_files": stage_load_json_files,
+    "load_mouse_movements_from_json": stage_load_mouse_movements,
+    "interpolate_movements": stage_interpolate_movements,
+    "interpolate_to_fixed_length": stage_interpolate_to_fixed_length,
+    "average_json_from_folder": stage_average_json_from_folder,
+    "compute_summary_stats": stage_compute_summary_stats,
+    "load_sequences_from_folder": stage_load_sequences_from_folder,
+    "summary_features": stage_summary_features,
+    "training_epoch": stage_training_epoch,
+    "model_predict": stage_model_predict,
+}
+
+# === Helper Functions ===
+
+def run_stage(name, data_dir):
+    """Run one stage; called in a fresh process so peak memory is per stage."""
+    items, seconds = STAGES[name](data_dir)
+    return {
+        "stage": name,
+        "items": items,
+        "seconds": seconds,
+        "items_per_sec": items / seconds if seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+def compare_results(results, previous):
+    """Print the time ratio to a previous run for every stage and size both contain."""
+    before = {(r["files"], r["stage"]): r for r in previous["results"]}
+    print(f"\nAgainst {previous['environment'].get('commit')}:")
+    for r in results:
+        old = before.get((r["files"], r["stage"]))
+        if old is None:
+            continue
+        ratio = r["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+        flag = "⚠️ " if ratio > REGRESSION_RATIO else "   "
+        print(f"{flag}{r['stage']:<32}{r['files']:>9}  {old['seconds']:>9.3f}s → {r['seconds']:>9.3f}s  ({ratio:.2f}x)")
+
+# === Main Function ===
+
+def run_benchmarks(sizes=SIZES, stages=None, data_dir=DATA_DIR, workers=None):
+    results = []
+    for size in sizes:
+        dataset = generate_dataset(os.path.join(data_dir, str(size)), size, SEED, workers)
+        for name in stages or STAGES:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(run_stage, name, dataset).result()
+            result["files"] = size
+            results.append(result)
+            peak = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else "n/a"
+            print(f"{name:<32}{size:>9} files  {result['seconds']:>9.3f}s  {peak:>9}")
+    return {"environment": environment(), "results": results}
+
+# === Entry Point ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile the utils/ pipeline on synthetic sessions.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=None)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.stages, args.data_dir)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Saved benchmark results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare_results(report["results"], json.load(f))
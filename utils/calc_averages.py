@@ -1,58 +1,55 @@
 import os
 import json
 import numpy as np
-from glob import glob
-from scipy.interpolate import CubicSpline
+from aggregate_manifest import incremental_aggregate, manifest_path_for
+from instrumentation import count, traced
+from label_index import LABEL_INDEX_PATH, session_files
+from parallel_ingest import imap_chunks, load_json
+from resample import INTERPOLATION_POINTS, resample_ragged, to_point_array, to_ragged
+from running_stats import RunningStats
+from session_archive import AVERAGED_RESULT_NAME, SessionArchive
 
 # === Settings ===
-INTERPOLATION_POINTS = 100
+SERIES_FIELDS = ["accelerations", "curvatures", "timestamps", "mouseMovements", "pausePoints"]
+SCALAR_FIELDS = ["totalTime", "averageSpeed", "jerkSpikeCount", "hesitation"]
+STREAM_CHUNK_SIZE = 256  # Files resampled and folded in per batch
 
 # === Helper Functions ===
 
 def interpolate_to_fixed_length(array, target_len=INTERPOLATION_POINTS):
-    if not array:
+    if not len(array):
         return []
 
-    # Convert dicts {"x": ..., "y": ...} to [x, y]
-    if isinstance(array[0], dict) and "x" in array[0] and "y" in array[0]:
-        array = [[pt["x"], pt["y"]] for pt in array]
+    values, offsets = to_ragged([array])
+    return resample_ragged(values, offsets, target_len, kind="cubic")[0].tolist()
 
-    if len(array) == 1:
-        return [array[0] for _ in range(target_len)]
-
-    x_old = np.linspace(0, 1, len(array))
-    x_new = np.linspace(0, 1, target_len)
-
-    # 2D coordinate list
-    if isinstance(array[0], list) and len(array[0]) == 2:
-        xs = [pt[0] for pt in array]
-        ys = [pt[1] for pt in array]
-        cs_x = CubicSpline(x_old, xs)
-        cs_y = CubicSpline(x_old, ys)
-        return [[float(x), float(y)] for x, y in zip(cs_x(x_new), cs_y(x_new))]
-
-    # 1D values
-    cs = CubicSpline(x_old, array)
-    return cs(x_new).tolist()
-
-def average_interpolated(arrays, target_len=INTERPOLATION_POINTS):
+@traced("aggregate")
+def average_interpolated(arrays, target_len=INTERPOLATION_POINTS, method="mean"):
+    """Average of the arrays after resampling; method="dba" aligns them with DTW first (dba.py)."""
     clean_arrays = []
 
     for arr in arrays:
         try:
-            interpolated = interpolate_to_fixed_length(arr, target_len)
-            if isinstance(interpolated[0], list):
-                if all(len(p) == 2 for p in interpolated):
-                    clean_arrays.append(interpolated)
-            elif isinstance(interpolated[0], (int, float)):
-                clean_arrays.append(interpolated)
-        except Exception as e:
+            points = to_point_array(arr)
+            if not len(points):
+                raise ValueError("empty array")
+            if points.ndim == 1 or (points.ndim == 2 and points.shape[1] == 2):
+                clean_arrays.append(points)
+        except (ValueError, TypeError, KeyError) as e:
             print(f"⚠️ Skipped invalid array: {e}")
+            count(skipped=1)
+    count(sessions=len(clean_arrays))
 
     if not clean_arrays:
         return []
 
-    return np.mean(clean_arrays, axis=0).tolist()
+    # All trajectories are resampled in one batched pass
+    values, offsets = to_ragged(clean_arrays)
+    resampled = resample_ragged(values, offsets, target_len, kind="cubic")
+    if method == "dba":
+        from dba import dba_average
+        return dba_average(resampled)[0].tolist()
+    return resampled.mean(axis=0).tolist()
 
 def normalize_jerks(jerks):
     mean_abs = np.mean(np.abs(jerks))
@@ -60,54 +57,87 @@ def normalize_jerks(jerks):
         return jerks  # Avoid divide-by-zero
     return [j / mean_abs for j in jerks]
 
-# === Main Function ===
-
-def average_json_from_folder(folder_path):
-    json_files = glob(os.path.join(folder_path, "*.json"))
-    if not json_files:
-        print("No JSON files found.")
-        return
-
-    numeric_fields = ["accelerations", "curvatures", "timestamps"]
-    array_fields = {
-        "mouseMovements": [],
-        "pausePoints": []
-    }
-    scalar_fields = {
-        "totalTime": [],
-        "averageSpeed": [],
-        "jerkSpikeCount": [],
-        "hesitation": []
-    }
-
-    all_data = {field: [] for field in numeric_fields}
-
-    for file_path in json_files:
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-            for field in numeric_fields:
-                if field in data:
-                    all_data[field].append(data[field])
-            for field in array_fields:
-                if field in data:
-                    array_fields[field].append(data[field])
-            for field in scalar_fields:
-                if field in data:
-                    scalar_fields[field].append(data[field])
-
+def new_accumulators():
+    fields = SERIES_FIELDS + ["jerks"] + SCALAR_FIELDS
+    return {field: RunningStats() for field in fields}
+
+def fold_series(stats, field, values, offsets, target_len=INTERPOLATION_POINTS):
+    """Resample a ragged batch of one field and fold it into the running stats."""
+    resampled = resample_ragged(values, offsets, target_len, kind="cubic")
+    stats[field].update(resampled)  # Empty entries come back as NaN and are skipped
+    if field == "accelerations":
+        stats["jerks"].update(np.diff(resampled, axis=1))
+
+def valid_points(data, field):
+    """The field as a float array if it is a usable 1-D or [x, y] series, else None."""
+    if field not in data:
+        return None
+    try:
+        points = to_point_array(data[field])
+    except (ValueError, TypeError, KeyError) as e:
+        print(f"⚠️ Skipped invalid array: {e}")
+        count(skipped=1)
+        return None
+    if points.ndim == 1 or (points.ndim == 2 and points.shape[1] == 2):
+        return points
+    return None
+
+@traced("aggregate")
+def fold_records(stats, records):
+    """Fold a chunk of parsed session JSONs into the running stats."""
+    count(sessions=len(records))
+    for field in SERIES_FIELDS:
+        arrays = [points for points in (valid_points(data, field) for data in records) if points is not None]
+        if arrays:
+            fold_series(stats, field, *to_ragged(arrays))
+
+    for field in SCALAR_FIELDS:
+        values = [data[field] for data in records if field in data]
+        stats[field].update(np.asarray(values, dtype=np.float64))
+
+def fold_files(file_paths):
+    """Parse and fold a chunk of session files into fresh accumulators; the process-pool work unit."""
+    stats = new_accumulators()
+    fold_records(stats, [load_json(file_path) for file_path in file_paths])
+    return stats
+
+def file_contributions(file_paths):
+    """Each file's own resampled series and scalars, as stored in the incremental manifest."""
+    records = [load_json(file_path) for file_path in file_paths]
+    contributions = [{} for _ in records]
+
+    for field in SERIES_FIELDS:
+        rows, arrays = [], []
+        for i, data in enumerate(records):
+            points = valid_points(data, field)
+            if points is not None and len(points):
+                rows.append(i)
+                arrays.append(points)
+        if not arrays:
+            continue
+        resampled = resample_ragged(*to_ragged(arrays), INTERPOLATION_POINTS, kind="cubic")
+        for i, sample in zip(rows, resampled):
+            contributions[i][field] = sample
+            if field == "accelerations":
+                contributions[i]["jerks"] = np.diff(sample)
+
+    for data, contribution in zip(records, contributions):
+        for field in SCALAR_FIELDS:
+            if field in data:
+                contribution[field] = np.float64(data[field])
+    return contributions
+
+def summarize_stats(stats, sample_count):
     result = {
-        "question": f"Average over {len(json_files)} samples",
+        "question": f"Average over {sample_count} samples",
         "answer": "N/A"
     }
 
-    for field in numeric_fields:
-        result[field] = average_interpolated(all_data[field]) if all_data[field] else []
-
-    for field in array_fields:
-        result[field] = average_interpolated(array_fields[field]) if array_fields[field] else []
+    for field in SERIES_FIELDS:
+        result[field] = stats[field].mean.tolist() if stats[field].count else []
 
-    for field in scalar_fields:
-        result[field] = float(np.mean(scalar_fields[field])) if scalar_fields[field] else 0
+    for field in SCALAR_FIELDS:
+        result[field] = float(stats[field].mean) if stats[field].count else 0
 
     # Compute raw jerks and normalized jerks
     if "accelerations" in result and result["accelerations"]:
@@ -116,12 +146,81 @@ def average_json_from_folder(folder_path):
         result["jerks"] = jerk_clean
         result["jerksNormalized"] = normalize_jerks(jerk_clean)
 
-    # Save output
-    output_path = os.path.join(folder_path, "averaged_result_interpolated.json")
+    # Per-timestep spread next to each averaged series
+    for field in SERIES_FIELDS + ["jerks"]:
+        acc = stats[field]
+        if not acc.count:
+            continue
+        lower, upper = acc.band()
+        result[f"{field}Std"] = acc.std.tolist()
+        result[f"{field}Lower"] = lower.tolist()
+        result[f"{field}Upper"] = upper.tolist()
+        result[f"{field}Min"] = acc.min.tolist()
+        result[f"{field}Max"] = acc.max.tolist()
+    result["sampleCounts"] = {field: stats[field].count for field in SERIES_FIELDS}
+
+    return result
+
+def save_result(result, output_path):
     with open(output_path, 'w') as f:
         json.dump(result, f, indent=2)
 
     print(f"✅ Saved averaged result to: {output_path}")
+
+# === Main Functions ===
+
+def average_json_from_folder(folder_path, chunk_size=STREAM_CHUNK_SIZE, workers=None, incremental=False,
+                             label=None, label_index=LABEL_INDEX_PATH):
+    """Average the sessions below folder_path; with a label, only those the label index gives that label."""
+    json_files = session_files(folder_path, label, label_index)
+    if not json_files:
+        print("No JSON files found.")
+        return
+
+    output_path = os.path.join(folder_path, AVERAGED_RESULT_NAME)
+    if incremental:
+        # Only new or changed files are parsed, deleted ones are retracted
+        stats, report = incremental_aggregate(json_files, manifest_path_for(output_path),
+                                              file_contributions, workers)
+        print(f"Ingested {report['ingested']}, removed {report['removed']}, "
+              f"reused {report['unchanged']} of {report['files']} files.")
+        save_result(summarize_stats(stats, len(json_files)), output_path)
+        return
+
+    # Chunks are folded on worker processes and merged here in file order,
+    # memory does not grow with the corpus and results match any worker count
+    stats = new_accumulators()
+    for partial in imap_chunks(fold_files, json_files, workers, chunk_size):
+        for field, acc in partial.items():
+            stats[field].merge(acc)
+
+    result = summarize_stats(stats, len(json_files))
+
+    # Save output
+    save_result(result, output_path)
+
+def average_archive(archive_path, output_path, label=None, chunk_size=STREAM_CHUNK_SIZE):
+    """Same averages as average_json_from_folder, read from a packed session archive."""
+    archive = SessionArchive(archive_path)
+    indices = archive.select(label)
+    if len(indices) == 0:
+        print("No sessions found in archive.")
+        return
+
+    stats = new_accumulators()
+    for i in range(0, len(indices), chunk_size):
+        chunk = indices[i:i + chunk_size]
+        for field in SERIES_FIELDS:
+            values, offsets = archive.ragged(field, chunk)
+            if field == "pausePoints":
+                values = values[:, :2]  # Positions only, as in the JSON path
+            fold_series(stats, field, values, offsets)
+        for field in SCALAR_FIELDS:
+            stats[field].update(archive.scalar(field)[chunk])
+
+    result = summarize_stats(stats, len(indices))
+    save_result(result, output_path)
+
 # === Entry Point ===
 if __name__ == "__main__":
-    average_json_from_folder("questionnaire_sessions/truth")  # Update path as needed
+    average_json_from_folder("questionnaire_sessions/truth", incremental=True, label=0)  # Update path as needed
@@ -0,0 +1,322 @@
+import os
+import sys
+import argparse
+
+# Every command imports its module when it runs, so `stats` never loads
+# matplotlib, scipy or TensorFlow and --help answers immediately.
+# Run from the repository root, e.g. `python utils/cli.py stats questionnaire_sessions/truth`.
+
+LABELS = {"truthful": 0, "deceptive": 1}
+
+# === Commands ===
+
+def cmd_stats(args):
+    from average_mouse_stats import compute_summary_stats_from_archive, compute_summary_stats_incremental, save_stats_to_json
+
+    label = LABELS.get(args.label)
+    if args.archive:
+        stats = compute_summary_stats_from_archive(args.source, label)
+    else:
+        stats = compute_summary_stats_incremental(args.source, args.output, args.workers, label, args.label_index)
+    save_stats_to_json(stats, args.output)
+
+    print("Summary Statistics:")
+    for key, value in stats.items():
+        print(f"{key}: {value:.4f}")
+
+def cmd_average(args):
+    from calc_averages import average_json_from_folder
+    average_json_from_folder(args.folder, workers=args.workers, incremental=not args.full,
+                             label=LABELS.get(args.label), label_index=args.label_index)
+
+def cmd_pattern(args):
+    from average_mouse_pattern import average_movements_dba, average_movements_incremental, plot_mouse_path
+
+    label = LABELS.get(args.label)
+    if args.dba:
+        try:
+            avg_array = average_movements_dba(args.folder, args.output, workers=args.workers, label=label,
+                                              label_index=args.label_index)
+        except ValueError as e:
+            sys.exit(f"⚠️ {e}")
+    else:
+        avg_array = average_movements_incremental(args.folder, args.output, args.workers, label, args.label_index)
+    if avg_array is None:
+        return
+    print(f"✅ Saved average mouse path to: {args.output}")
+    if args.chart:
+        from batch_render import use_headless
+        use_headless()
+        plot_mouse_path(avg_array, args.title, args.chart, show=False)
+        print(f"✅ Saved chart to: {args.chart}")
+
+def cmd_group(args):
+    from group_aggregate import group_report, parse_group_by
+    try:
+        group_report(args.root, [parse_group_by(spec) for spec in args.by], args.table, args.trajectories,
+                     args.compare, args.chart, args.workers, args.label_index)
+    except ValueError as e:
+        sys.exit(f"⚠️ {e}")
+
+def cmd_density(args):
+    from pause_density import FOLDERS, LABEL_NAMES, PauseDensity, plot_heatmap, plot_label_comparison
+
+    index = PauseDensity(args.index, args.samples)
+    try:
+        if not args.no_update:
+            folders = {args.folders[0]: 0, args.folders[1]: 1} if args.folders else FOLDERS
+            report = index.update(folders, args.workers, args.label_index)
+            print(f"Ingested {report['ingested']}, removed {report['removed']}, "
+                  f"reused {report['unchanged']} of {report['files']} files.")
+        for label in [args.label] if args.label is not None else LABEL_NAMES:
+            total = index.query(args.region, args.layer, label, args.question, args.level)
+            print(f"{LABEL_NAMES[label]}: {total:.1f} {args.layer} in {tuple(args.region)}")
+        if args.heatmap or args.compare:
+            from batch_render import use_headless
+            use_headless()
+        if args.heatmap:
+            plot_heatmap(index, args.layer, args.label, args.question, args.level, args.region, args.heatmap, show=False)
+            print(f"✅ Saved heatmap to: {args.heatmap}")
+        if args.compare:
+            plot_label_comparison(index, args.layer, args.question, args.level, args.region, args.compare, show=False)
+            print(f"✅ Saved comparison to: {args.compare}")
+    finally:
+        index.close()
+
+def cmd_thresholds(args):
+    from population_thresholds import (FOLDERS, build_population_sketches, load_sketches, population_threshold,
+                                       print_quantiles, recompute_spike_counts, save_sketches)
+
+    folders = {args.folders[0]: 0, args.folders[1]: 1} if args.folders else FOLDERS
+    if args.reuse:
+        sketches = load_sketches(args.sketches)
+    else:
+        sketches = build_population_sketches(folders, args.workers, args.label_index)
+        save_sketches(sketches, args.sketches)
+    print_quantiles(sketches, [name for name in sorted(sketches) if not name.startswith("question:")])
+    if args.group not in sketches:
+        sys.exit(f"⚠️ No sketch group {args.group!r}, choose from: {', '.join(sorted(sketches))}")
+    threshold = population_threshold(sketches, args.group, args.quantile)
+    print(f"Population |jerk| threshold (p{args.quantile * 100:g} of {args.group}): {threshold:.4g}")
+    recompute_spike_counts(threshold, folders, args.output, args.workers, args.label_index)
+
+def cmd_simplify(args):
+    from simplify_sessions import FOLDERS, simplify_sessions
+    folders = {args.folders[0]: 0, args.folders[1]: 1} if args.folders else FOLDERS
+    try:
+        simplify_sessions(folders, None if args.no_json else args.output, args.archive, args.tolerance, args.metric,
+                          args.workers)
+    except ValueError as e:
+        sys.exit(f"⚠️ {e}")
+
+def cmd_similar(args):
+    from trajectory_index import (FOLDERS, K_NEIGHBOURS, TrajectoryIndex, knn_baseline, model_baseline,
+                                  print_comparison)
+    from label_index import labelled_paths
+
+    folders = {args.folders[0]: 0, args.folders[1]: 1} if args.folders else FOLDERS
+    if args.evaluate:
+        knn, test_items = knn_baseline(labelled_paths(folders, args.label_index), K_NEIGHBOURS, args.workers)
+        reports = [knn]
+        if os.path.exists(args.model):
+            reports.append(model_baseline(test_items, args.model, args.workers))
+        print_comparison(reports)
+        return
+
+    index = TrajectoryIndex(args.index)
+    try:
+        if not args.no_update:
+            added, skipped = index.update(folders, args.workers, args.label_index)
+            print(f"Indexed {added} new answers ({skipped} without a usable path), {len(index)} in total.")
+        if args.query:
+            try:
+                matches = index.similar(args.query, args.k)
+            except ValueError as e:
+                sys.exit(f"⚠️ {e}")
+            for path, label, flagged, distance in matches:
+                print(f"{distance:>10.1f}  label {label}  {'flagged' if flagged else '       '}  {path}")
+    finally:
+        index.close()
+
+def cmd_plot(args):
+    if not (args.sessions or args.averages or args.stats):
+        sys.exit("⚠️ Nothing to render, pass --sessions, --averages and/or --stats")
+    from batch_render import render_charts
+    render_charts(args.sessions, args.averages, args.stats, args.output_dir, args.max_points or None, args.workers)
+
+def cmd_label(args):
+    from label_index import LabelIndex, label_folder
+
+    if args.counts:
+        index = LabelIndex(args.index)
+        print(index.counts())
+        index.close()
+        return
+    if args.folder is None or args.label is None:
+        sys.exit("⚠️ Pass a folder and a label, or --counts")
+    changed = label_folder(args.folder, args.label, args.index)
+    print(f"✅ Labelled {args.folder} as {args.label} ({changed} entries changed) in: {args.index}")
+
+def cmd_train(args):
+    import model_training_dl_lstm_gru_v1 as training
+    training.main(streaming=args.streaming, bucketed=args.bucketed,
+                  export=not args.no_export, show_plots=not args.headless)
+
+def cmd_search(args):
+    from model_search import FOLDERS, SEARCH_SPACE, run_search
+    folders = {args.folders[0]: 0, args.folders[1]: 1} if args.folders else FOLDERS
+    run_search(folders, SEARCH_SPACE, args.random, args.folds, args.workers, args.threads, args.epochs,
+               args.results, args.summary)
+
+def cmd_score(args):
+    from score_sessions import score_source
+    score_source(args.source, args.output, args.archive, args.model, args.workers, args.batch_size)
+
+# === Parser ===
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Mouse-tracking analysis and model tools.")
+    parser.add_argument("--profile", nargs="?", const="spans", choices=["spans", "cprofile"],
+                        help="Time the pipeline stages into a JSON report and trace (also MOUSE_PROFILE=1)")
+    parser.add_argument("--profile-output", help="Report path, default profiles/<script>-<time>-<pid>.json")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stats = commands.add_parser("stats", help="Summary statistics of a session folder or archive")
+    stats.add_argument("source", help="Folder of session JSONs, or an archive with --archive")
+    stats.add_argument("output", nargs="?", default="mouse_stats_summary.json")
+    stats.add_argument("--archive", action="store_true", help="Read the source as a session archive")
+    stats.set_defaults(func=cmd_stats)
+
+    average = commands.add_parser("average", help="Averaged series of a session folder (calc_averages)")
+    average.add_argument("folder")
+    average.add_argument("--full", action="store_true", help="Re-read every file instead of only changed ones")
+    average.set_defaults(func=cmd_average)
+
+    pattern = commands.add_parser("pattern", help="Average mouse path of a session folder")
+    pattern.add_argument("folder")
+    pattern.add_argument("output", help="JSON file for the average path")
+    pattern.add_argument("--chart", help="Also save the path chart to this PNG")
+    pattern.add_argument("--title", default="Average Mouse Movement Path")
+    pattern.add_argument("--dba", action="store_true", help="DTW barycenter average instead of the point-wise mean")
+    pattern.set_defaults(func=cmd_pattern)
+
+    for command in (stats, average, pattern):
+        command.add_argument("--label", choices=list(LABELS),
+                             help="Only sessions with this label: the label index's, else the folder's")
+        command.add_argument("--label-index", default="data/labels.sqlite", help="Labels that override the folder's")
+
+    group = commands.add_parser("group", help="Summary metrics and mean trajectories per group in one pass")
+    group.add_argument("root", help="Folder of session JSONs, e.g. questionnaire_sessions")
+    group.add_argument("--by", action="append", required=True,
+                       help="Comma-separated keys, repeatable: folder, session, part, file or a payload field")
+    group.add_argument("--table", default="group_summary.csv")
+    group.add_argument("--trajectories", default="group_trajectories.json")
+    group.add_argument("--compare", nargs=3, metavar=("GROUP_BY", "FIRST", "SECOND"),
+                       help="Draw the summary chart of two groups, e.g. --compare part 1 2")
+    group.add_argument("--chart", default="averaged_charts/group_comparison_chart.png")
+    group.add_argument("--label-index", help="Label index to join the label key from, e.g. data/labels.sqlite")
+    group.set_defaults(func=cmd_group)
+
+    density = commands.add_parser("density", help="Pause-point density pyramid: update, query a region, heatmaps")
+    density.add_argument("--index", default="pause_density.sqlite")
+    density.add_argument("--folders", nargs=2, metavar=("TRUTHFUL", "DECEPTIVE"), help="Defaults to data/")
+    density.add_argument("--label-index", default="data/labels.sqlite", help="Labels that override the folder's")
+    density.add_argument("--no-update", action="store_true", help="Query the index as it is")
+    density.add_argument("--samples", action="store_true", help="Also bin every trajectory sample")
+    density.add_argument("--layer", choices=["pauses", "pause_seconds", "samples"], default="pauses")
+    density.add_argument("--label", type=int, choices=[0, 1])
+    density.add_argument("--question")
+    density.add_argument("--level", type=int, default=2, help="Zoom level, 0 is the finest (16 px cells)")
+    density.add_argument("--region", type=float, nargs=4, metavar=("X0", "Y0", "X1", "Y1"), default=(0, 0, 1920, 1080))
+    density.add_argument("--heatmap", help="Save a heatmap of the selection to this PNG")
+    density.add_argument("--compare", help="Save the truth/lie comparison to this PNG")
+    density.set_defaults(func=cmd_density)
+
+    thresholds = commands.add_parser("thresholds", help="Corpus quantile sketches and population jerk-spike counts")
+    thresholds.add_argument("--folders", nargs=2, metavar=("TRUTHFUL", "DECEPTIVE"), help="Defaults to data/")
+    thresholds.add_argument("--label-index", default="data/labels.sqlite", help="Labels that override the folder's")
+    thresholds.add_argument("--sketches", default="population_quantiles.json")
+    thresholds.add_argument("--reuse", action="store_true", help="Load the saved sketches instead of rebuilding them")
+    thresholds.add_argument("--group", default="all", help='Threshold group, e.g. "all", "label:0" or "question:..."')
+    thresholds.add_argument("--quantile", type=float, default=0.95)
+    thresholds.add_argument("--output", default="population_spikes.csv")
+    thresholds.set_defaults(func=cmd_thresholds)
+
+    simplify = commands.add_parser("simplify", help="Error-bounded path simplification into JSONs and/or an archive")
+    simplify.add_argument("--folders", nargs=2, metavar=("TRUTHFUL", "DECEPTIVE"), help="Defaults to data/")
+    simplify.add_argument("--output", default="data_simplified", help="Folder for the reduced session JSONs")
+    simplify.add_argument("--no-json", action="store_true", help="Only write the archive")
+    simplify.add_argument("--archive", help="Also pack the reduced sessions into this archive folder")
+    simplify.add_argument("--tolerance", type=float, default=2.0, help="Largest deviation of a dropped sample (px)")
+    simplify.add_argument("--metric", choices=["time", "space"], default="time")
+    simplify.set_defaults(func=cmd_simplify)
+
+    similar = commands.add_parser("similar", help="Answers with the most similar mouse paths; k-NN vs model baseline")
+    similar.add_argument("query", nargs="?", help="Session JSON to find similar answers for")
+    similar.add_argument("-k", type=int, default=10)
+    similar.add_argument("--index", default="trajectory_index")
+    similar.add_argument("--folders", nargs=2, metavar=("TRUTHFUL", "DECEPTIVE"), help="Defaults to data/")
+    similar.add_argument("--label-index", default="data/labels.sqlite", help="Labels that override the folder's")
+    similar.add_argument("--no-update", action="store_true", help="Query the index as it is")
+    similar.add_argument("--evaluate", action="store_true", help="Compare the k-NN classifier with the model")
+    similar.add_argument("--model", default="best_lstm_gru_model.h5")
+    similar.set_defaults(func=cmd_similar)
+
+    plot = commands.add_parser("plot", help="Render charts to PNG headlessly (batch_render)")
+    plot.add_argument("--sessions", help="Folder of session JSONs, one chart per answer")
+    plot.add_argument("--averages", nargs=2, metavar=("LIE_FILE", "TRUTH_FILE"),
+                      help="Averaged result files to compare, as in averaged_charts/")
+    plot.add_argument("--stats", nargs=2, metavar=("LIE_FILE", "TRUTH_FILE"),
+                      help="Summary statistics files to compare in a bar chart")
+    plot.add_argument("--output-dir", help="Defaults to session_charts/ or averaged_charts/")
+    plot.add_argument("--max-points", type=int, default=1000, help="Points per line after LTTB, 0 keeps all")
+    plot.set_defaults(func=cmd_plot)
+
+    label = commands.add_parser("label", help="Label every session JSON below a folder in the label index")
+    label.add_argument("folder", nargs="?")
+    label.add_argument("label", type=int, nargs="?", choices=[0, 1], help="0 for truthful, 1 for deceptive")
+    label.add_argument("--index", default="data/labels.sqlite", help="Sidecar label index")
+    label.add_argument("--counts", action="store_true", help="Print the number of files per label and exit")
+    label.set_defaults(func=cmd_label)
+
+    train = commands.add_parser("train", help="Train and evaluate the LSTM/GRU model on data/")
+    train.add_argument("--streaming", action="store_true", help="Train from tf.data batches (STREAMING_INPUT)")
+    train.add_argument("--bucketed", action="store_true", help="Length-bucketed batches (BUCKETED_INPUT)")
+    train.add_argument("--no-export", action="store_true", help="Skip the TFLite export and parity check")
+    train.add_argument("--headless", action="store_true", help="Save the figures without showing them")
+    train.set_defaults(func=cmd_train)
+
+    search = commands.add_parser("search", help="Stratified k-fold CV and hyperparameter search (model_search)")
+    search.add_argument("--folders", nargs=2, metavar=("TRUTHFUL", "DECEPTIVE"), help="Defaults to data/")
+    search.add_argument("--folds", type=int, default=5)
+    search.add_argument("--random", type=int, help="Sample this many grid points instead of the full grid")
+    search.add_argument("--epochs", type=int, default=50)
+    search.add_argument("--threads", type=int, help="TensorFlow threads per worker, default CPUs / workers")
+    search.add_argument("--results", default="search_results.jsonl", help="Finished folds, resumed on rerun")
+    search.add_argument("--summary", default="search_summary.json")
+    search.set_defaults(func=cmd_search)
+
+    score = commands.add_parser("score", help="Score session JSONs with the trained model")
+    score.add_argument("source", help="Folder of session JSONs (searched recursively) or a packed archive")
+    score.add_argument("output", help="CSV file of per-file probabilities (.csv.gz to compress)")
+    score.add_argument("--archive", action="store_true", help="Read the source as a session archive")
+    score.add_argument("--model", default="best_lstm_gru_model.h5", help="h5 model or its .tflite export")
+    score.add_argument("--batch-size", type=int, default=256)
+    score.set_defaults(func=cmd_score)
+
+    # Every command that reads many files takes --workers
+    for command in (stats, average, pattern, group, density, thresholds, simplify, similar, plot, search, score):
+        command.add_argument("--workers", type=int, default=None, help="Worker processes, default one per CPU")
+    return parser
+
+# === Entry Point ===
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        from instrumentation import enable
+        enable(profile=args.profile == "cprofile", output_path=args.profile_output)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import numpy as np
+from functools import partial
+from numpy.lib.stride_tricks import sliding_window_view
+from parallel_ingest import imap_chunks
+
+# Optional compiled DTW kernel, the vectorized numpy one is used without it
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# === Settings ===
+BAND_FRACTION = 0.1  # Sakoe-Chiba radius as a fraction of the path length
+MAX_ITERATIONS = 10
+TOLERANCE = 1e-3  # Stop once the mean DTW cost improves by less than this fraction
+MEDOID_SAMPLE = 256  # Paths the starting medoid is picked from
+BATCH_SIZE = 256  # Paths aligned per vectorized batch, bounds the (batch, steps, steps) cost array
+USE_NUMBA = True  # Use the compiled kernel when numba is installed
+
+# === DTW ===
+# Costs are sums of squared Euclidean distances along the warping path,
+# so LB_Keogh on squared distances is a true lower bound.
+
+DIAGONAL, UP, LEFT = 0, 1, 2
+
+def band_radius(length, fraction=BAND_FRACTION):
+    return max(1, int(round(length * fraction)))
+
+def as_paths(paths):
+    """(n, steps, dims) float array; 1-D series get a dims axis of 1."""
+    paths = np.asarray(paths, dtype=np.float64)
+    return paths[:, :, None] if paths.ndim == 2 else paths
+
+def envelope(series, radius):
+    """LB_Keogh upper and lower envelopes of (..., steps, dims) series within the band."""
+    pad = [(0, 0)] * (series.ndim - 2) + [(radius, radius), (0, 0)]
+    windows = sliding_window_view(np.pad(series, pad, mode="edge"), 2 * radius + 1, axis=-2)
+    return windows.max(axis=-1), windows.min(axis=-1)
+
+def lb_keogh(paths, upper, lower):
+    """Lower bound of the DTW cost between each path and the series the envelope came from."""
+    above = np.maximum(paths - upper, 0)
+    below = np.maximum(lower - paths, 0)
+    return (above ** 2 + below ** 2).sum(axis=(-2, -1))
+
+def _align_numpy(paths, average, radius):
+    """Banded DTW of a batch of paths against one average, vectorized over the batch.
+
+    Returns the aligned path values summed onto each average step, the number
+    of values per step and each path's DTW cost.
+    """
+    n, steps, dims = paths.shape
+    length = len(average)
+    cost = ((paths[:, :, None, :] - average[None, None, :, :]) ** 2).sum(axis=3)
+    D = np.full((n, steps + 1, length + 1), np.inf)
+    D[:, 0, 0] = 0
+    moves = np.zeros((n, steps + 1, length + 1), dtype=np.int8)
+    for i in range(1, steps + 1):
+        for j in range(max(1, i - radius), min(length, i + radius) + 1):
+            options = np.stack((D[:, i - 1, j - 1], D[:, i - 1, j], D[:, i, j - 1]))
+            move = options.argmin(axis=0)
+            moves[:, i, j] = move
+            D[:, i, j] = cost[:, i - 1, j - 1] + options[move, np.arange(n)]
+
+    # Walk every warping path back from the end at once
+    sums = np.zeros((length, dims))
+    counts = np.zeros(length)
+    rows = np.arange(n)
+    i = np.full(n, steps)
+    j = np.full(n, length)
+    active = np.ones(n, dtype=bool)
+    while active.any():
+        k, a, b = rows[active], i[active], j[active]
+        np.add.at(sums, b - 1, paths[k, a - 1])
+        np.add.at(counts, b - 1, 1)
+        move = moves[k, a, b]
+        i[active] = a - (move != LEFT)
+        j[active] = b - (move != UP)
+        active = (i > 0) & (j > 0)
+    return sums, counts, D[:, steps, length]
+
+if njit is not None:
+    @njit(cache=True)
+    def _align_compiled(paths, average, radius):
+        """_align_numpy one path at a time, compiled; same moves and tie-breaking."""
+        n, steps, dims = paths.shape
+        length = average.shape[0]
+        sums = np.zeros((length, dims))
+        counts = np.zeros(length)
+        costs = np.empty(n)
+        D = np.empty((steps + 1, length + 1))
+        moves = np.zeros((steps + 1, length + 1), dtype=np.int8)
+        for k in range(n):
+            D[:, :] = np.inf
+            D[0, 0] = 0.0
+            for i in range(1, steps + 1):
+                for j in range(max(1, i - radius), min(length, i + radius) + 1):
+                    c = 0.0
+                    for d in range(dims):
+                        c += (paths[k, i - 1, d] - average[j - 1, d]) ** 2
+                    best, move = D[i - 1, j - 1], 0
+                    if D[i - 1, j] < best:
+                        best, move = D[i - 1, j], 1
+                    if D[i, j - 1] < best:
+                        best, move = D[i, j - 1], 2
+                    D[i, j] = c + best
+                    moves[i, j] = move
+            costs[k] = D[steps, length]
+            i, j = steps, length
+            while i > 0 and j > 0:
+                for d in range(dims):
+                    sums[j - 1, d] += paths[k, i - 1, d]
+                counts[j - 1] += 1
+                move = moves[i, j]
+                if move != 2:
+                    i -= 1
+                if move != 1:
+                    j -= 1
+        return sums, counts, costs
+
+def align(paths, average, radius):
+    """(sums, counts, costs) of paths aligned to average, BATCH_SIZE paths at a time."""
+    paths = as_paths(paths)
+    average = np.asarray(average, dtype=np.float64).reshape(-1, paths.shape[2])
+    kernel = _align_compiled if njit is not None and USE_NUMBA else _align_numpy
+    sums = np.zeros(average.shape)
+    counts = np.zeros(len(average))
+    costs = []
+    for start in range(0, len(paths), BATCH_SIZE):
+        batch_sums, batch_counts, batch_costs = kernel(np.ascontiguousarray(paths[start:start + BATCH_SIZE]),
+                                                       average, radius)
+        sums += batch_sums
+        counts += batch_counts
+        costs.append(batch_costs)
+    return sums, counts, np.concatenate(costs) if costs else np.zeros(0)
+
+def align_chunk(paths, average, radius):
+    """Alignment sums, counts and total cost of a chunk of paths; the process-pool work unit."""
+    sums, counts, costs = align(np.asarray(paths), average, radius)
+    return sums, counts, costs.sum()
+
+# === Main Functions ===
+
+def medoid(paths, radius, sample=MEDOID_SAMPLE, seed=0):
+    """Path of a random sample with the least total DTW cost to the rest of the sample.
+
+    Candidates are tried in order of their summed LB_Keogh bound; once that
+    bound reaches the best exact total, no remaining candidate can win.
+    Returns the medoid and the number of candidates aligned exactly.
+    """
+    rng = np.random.default_rng(seed)
+    picked = np.sort(rng.choice(len(paths), min(sample, len(paths)), replace=False))
+    candidates = paths[picked]
+    upper, lower = envelope(candidates, radius)
+    bounds = np.array([lb_keogh(candidates, upper[c], lower[c]).sum() for c in range(len(candidates))])
+
+    best, best_total, exact = 0, np.inf, 0
+    for c in np.argsort(bounds, kind="stable"):
+        if bounds[c] >= best_total:
+            break
+        total = align(candidates, candidates[c], radius)[2].sum()
+        exact += 1
+        if total < best_total:
+            best, best_total = c, total
+    return candidates[best].copy(), exact
+
+def dba_average(paths, iterations=MAX_ITERATIONS, radius=None, workers=None, tolerance=TOLERANCE, seed=0):
+    """DTW barycenter average of equal-length paths (n, steps, dims), or of 1-D series (n, steps).
+
+    Starts from the LB_Keogh-pruned medoid and refines it: every path is
+    warped onto the current average within a Sakoe-Chiba band and each
+    average step becomes the mean of the values aligned to it. Paths are
+    aligned in chunks on a process pool. Paths containing NaN are skipped.
+    Returns the average and a report of the mean DTW cost per iteration.
+    """
+    squeeze = np.ndim(paths) == 2
+    paths = as_paths(paths)
+    paths = paths[~np.isnan(paths).any(axis=(1, 2))]
+    if not len(paths):
+        raise ValueError("no complete paths to average")
+    radius = band_radius(paths.shape[1]) if radius is None else radius
+
+    average, exact = medoid(paths, radius, seed=seed)
+    report = {"paths": len(paths), "radius": radius, "medoid_alignments": exact, "costs": []}
+    for _ in range(iterations):
+        sums, counts = np.zeros(average.shape), np.zeros(len(average))
+        total = 0.0
+        for chunk_sums, chunk_counts, chunk_cost in imap_chunks(partial(align_chunk, average=average, radius=radius),
+                                                                paths, workers):
+            sums += chunk_sums
+            counts += chunk_counts
+            total += chunk_cost
+        report["costs"].append(total / len(paths))
+        average = sums / counts[:, None]
+        costs = report["costs"]
+        if len(costs) > 1 and costs[-2] - costs[-1] < tolerance * costs[-2]:
+            break
+    return (average[:, 0] if squeeze else average), report
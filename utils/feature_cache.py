@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import numpy as np
+from numpy.lib.format import open_memmap
+from aggregate_manifest import file_digest
+from parallel_ingest import imap_chunks
+from sequence_features import NUM_FEATURES, SEQUENCE_LENGTH, feature_params, featurize_files
+
+# === Settings ===
+FEATURE_CACHE_DIR = "feature_cache"
+INITIAL_CAPACITY = 1024
+UNUSABLE = -1  # Row marker for files that produce no sequence
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    sha256 TEXT PRIMARY KEY,
+    row INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# === Helper Functions ===
+
+def params_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+class FeatureCache:
+    """Per-file feature sequences in a memory-mapped .npy block plus a SQLite index.
+
+    Entries are keyed by the file's content hash; each set of extraction
+    parameters gets its own directory, so changing either key misses.
+    """
+
+    def __init__(self, cache_dir=FEATURE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.params = feature_params()
+        self.key = params_key(self.params)
+        self.directory = os.path.join(cache_dir, self.key)
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.features_path = os.path.join(self.directory, "features.npy")
+        self.conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"))
+        self.conn.executescript(SCHEMA)
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('params', ?)", (json.dumps(self.params),))
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('next_row', '0')")
+        if not os.path.exists(self.features_path):
+            open_memmap(self.features_path, mode='w+', dtype=np.float64,
+                        shape=(INITIAL_CAPACITY, SEQUENCE_LENGTH, NUM_FEATURES)).flush()
+        self.features = np.load(self.features_path, mmap_mode='r+')
+
+    def close(self):
+        self.features.flush()
+        self.conn.close()
+
+    @property
+    def row_bytes(self):
+        return SEQUENCE_LENGTH * NUM_FEATURES * self.features.itemsize
+
+    def _next_row(self):
+        return int(self.conn.execute("SELECT value FROM meta WHERE key = 'next_row'").fetchone()[0])
+
+    def _allocate(self, count):
+        """Rows for `count` new entries, growing the block by doubling when full."""
+        start = self._next_row()
+        end = start + count
+        self.conn.execute("UPDATE meta SET value = ? WHERE key = 'next_row'", (str(end),))
+        capacity = len(self.features)
+        if end > capacity:
+            while capacity < end:
+                capacity *= 2
+            self._rewrite(np.arange(start), capacity)
+        return list(range(start, end))
+
+    def _rewrite(self, keep_rows, capacity):
+        """Copy keep_rows (in order) into a new block of `capacity` rows."""
+        self.features.flush()
+        tmp_path = self.features_path + ".tmp"
+        grown = open_memmap(tmp_path, mode='w+', dtype=np.float64,
+                            shape=(capacity, SEQUENCE_LENGTH, NUM_FEATURES))
+        for i in range(0, len(keep_rows), INITIAL_CAPACITY):
+            block = keep_rows[i:i + INITIAL_CAPACITY]
+            grown[i:i + len(block)] = self.features[block]
+        grown.flush()
+        del grown
+        self.features = None
+        os.replace(tmp_path, self.features_path)
+        self.features = np.load(self.features_path, mmap_mode='r+')
+
+    def _hashes(self, file_paths):
+        """Content hash of every file, re-hashing only files whose mtime or size moved."""
+        known = {path: (mtime_ns, size, sha256) for path, mtime_ns, size, sha256
+                 in self.conn.execute("SELECT path, mtime_ns, size, sha256 FROM files")}
+        hashes, updates = [], []
+        for path in file_paths:
+            st = os.stat(path)
+            entry = known.get(path)
+            if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+                hashes.append(entry[2])
+                continue
+            digest = file_digest(path)
+            hashes.append(digest)
+            updates.append((path, st.st_mtime_ns, st.st_size, digest))
+        self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", updates)
+        return hashes
+
+    def get_rows(self, file_paths, workers=None):
+        """Row of self.features holding each file's sequence, UNUSABLE if it has none.
+
+        Files not cached yet are extracted first. Reading the rows straight
+        from the memmap avoids stacking every sequence in memory.
+        """
+        file_paths = list(file_paths)
+        with self.conn:
+            hashes = self._hashes(file_paths)
+            rows = dict(self.conn.execute("SELECT sha256, row FROM entries"))
+
+            missing = {}
+            for path, digest in zip(file_paths, hashes):
+                if digest not in rows and digest not in missing:
+                    missing[digest] = path
+            missing_hashes, missing_paths = list(missing), list(missing.values())
+
+            done = 0
+            for sequences, usable in imap_chunks(featurize_files, missing_paths, workers):
+                chunk_hashes = missing_hashes[done:done + len(usable)]
+                done += len(usable)
+                new_rows = self._allocate(len(sequences))
+                if new_rows:
+                    self.features[np.asarray(new_rows)] = sequences
+                fresh = iter(new_rows)
+                for digest, ok in zip(chunk_hashes, usable):
+                    rows[digest] = next(fresh) if ok else UNUSABLE
+                self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, 0)",
+                                      [(digest, rows[digest]) for digest in chunk_hashes])
+
+            now = time.time()
+            self.conn.executemany("UPDATE entries SET last_used = ? WHERE sha256 = ?",
+                                  [(now, digest) for digest in set(hashes)])
+        self.features.flush()
+        return np.array([rows[digest] for digest in hashes], dtype=np.int64)
+
+    def get_sequences(self, file_paths, workers=None):
+        """Feature sequences for file_paths, extracting only files not cached yet.
+
+        Returns the stacked sequences and a boolean mask of which files were
+        usable, in the order of file_paths.
+        """
+        file_rows = self.get_rows(file_paths, workers)
+        usable = file_rows != UNUSABLE
+        return np.asarray(self.features[file_rows[usable]]), usable
+
+    def evict(self, max_bytes):
+        """Drop least recently used entries until the block fits in max_bytes, then compact it."""
+        max_rows = max_bytes // self.row_bytes
+        with self.conn:
+            live = self.conn.execute("SELECT COUNT(*) FROM entries WHERE row != ?", (UNUSABLE,)).fetchone()[0]
+            if live > max_rows:
+                self.conn.execute(
+                    "DELETE FROM entries WHERE sha256 IN (SELECT sha256 FROM entries WHERE row != ? "
+                    "ORDER BY last_used LIMIT ?)", (UNUSABLE, live - max_rows))
+
+            kept = self.conn.execute("SELECT sha256, row FROM entries WHERE row != ? ORDER BY row",
+                                     (UNUSABLE,)).fetchall()
+            keep_rows = np.array([row for _, row in kept], dtype=np.int64)
+            self._rewrite(keep_rows, max(len(kept), INITIAL_CAPACITY))
+            self.conn.executemany("UPDATE entries SET row = ? WHERE sha256 = ?",
+                                  [(new_row, digest) for new_row, (digest, _) in enumerate(kept)])
+            self.conn.execute("UPDATE meta SET value = ? WHERE key = 'next_row'", (str(len(kept)),))
+
+def evict_stale(cache_dir=FEATURE_CACHE_DIR):
+    """Delete cache directories built with other extraction parameters."""
+    current = params_key(feature_params())
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name != current and os.path.isdir(path):
+            shutil.rmtree(path)
+
+# === Entry Point ===
+if __name__ == "__main__":
+    evict_stale()
+    cache = FeatureCache()
+    cache.evict(2 * 1024 ** 3)  # Keep at most 2 GB of cached features
+    cache.close()
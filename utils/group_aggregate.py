@@ -0,0 +1,231 @@
+import os
+import csv
+import json
+import argparse
+import numpy as np
+from functools import partial
+from calc_averages import valid_points
+from instrumentation import count, traced
+from label_index import UNLABELLED, join_labels
+from parallel_ingest import imap_chunks, load_json
+from resample import INTERPOLATION_POINTS, resample_ragged, to_ragged
+from running_stats import RunningStats
+from session_archive import find_session_files
+
+# === Settings ===
+PATH_KEYS = {"session": "session_", "part": "part_"}  # Folders server.js writes, by name prefix
+SCALAR_FIELDS = ["totalTime", "averageSpeed", "jerkSpikeCount", "hesitation", "pauseCount", "pauseDurationTotal"]
+TRAJECTORY_FIELDS = ["mouseMovements", "accelerations", "curvatures"]
+MISSING = "n/a"  # Group of files that lack a key
+TABLE_PATH = "group_summary.csv"
+TRAJECTORIES_PATH = "group_trajectories.json"
+CHART_PATH = "averaged_charts/group_comparison_chart.png"
+SUMMARY_COLUMNS = ["averageTotalTime", "averageSpeed", "averageJerkSpikeCount", "averageHesitation",
+                   "averagePauseDuration", "averagePauseCount"]
+
+# === Helper Functions ===
+
+def parse_group_by(spec):
+    """"part,answer" -> ("part", "answer")."""
+    return tuple(name.strip() for name in spec.split(",") if name.strip())
+
+def path_keys(file_path, root):
+    """Keys encoded in the path below root: folder, session, part and the question file name."""
+    parts = os.path.relpath(file_path, root).split(os.sep)
+    keys = {"folder": parts[0] if len(parts) > 1 else MISSING, "file": os.path.splitext(parts[-1])[0]}
+    for name, prefix in PATH_KEYS.items():
+        keys[name] = next((p[len(prefix):] for p in parts[:-1] if p.startswith(prefix)), MISSING)
+    return keys
+
+def group_label(group_by, keys, data):
+    """Group of one file; path keys first, any other name is read from the payload."""
+    values = []
+    for name in group_by:
+        value = keys[name] if name in keys else data.get(name)
+        values.append(MISSING if value is None else str(value))
+    return "|".join(values)
+
+def scalar_rows(records):
+    """(n, len(SCALAR_FIELDS)) scalars per file, NaN where a value is missing or null."""
+    rows = np.full((len(records), len(SCALAR_FIELDS)), np.nan)
+    for i, data in enumerate(records):
+        pauses = data.get("pausePoints") or []
+        values = [data.get("totalTime"), data.get("averageSpeed"), data.get("jerkSpikeCount"),
+                  data.get("hesitation"), len(pauses), sum(pause.get("duration", 0) for pause in pauses)]
+        rows[i] = [np.nan if value is None else value for value in values]
+    return rows
+
+def trajectory_rows(records, field):
+    """Every file's field resampled to INTERPOLATION_POINTS in one pass, NaN rows where unusable."""
+    ndim = 2 if field == "mouseMovements" else 1
+    arrays = []
+    for data in records:
+        points = valid_points(data, field)
+        usable = points is not None and points.ndim == ndim
+        arrays.append(points if usable else np.zeros((0, 2) if ndim == 2 else 0))
+    return resample_ragged(*to_ragged(arrays), INTERPOLATION_POINTS, kind="cubic")
+
+def new_group():
+    group = {field: RunningStats() for field in SCALAR_FIELDS + TRAJECTORY_FIELDS}
+    group["files"] = 0
+    return group
+
+def merge_groups(total, partial_result):
+    """Fold one chunk's groups into the running result, group by group."""
+    for group_by, groups in partial_result.items():
+        target = total.setdefault(group_by, {})
+        for label, group in groups.items():
+            if label not in target:
+                target[label] = group
+                continue
+            target[label]["files"] += group["files"]
+            for field in SCALAR_FIELDS + TRAJECTORY_FIELDS:
+                target[label][field].merge(group[field])
+    return total
+
+def summarize_group(group):
+    """compute_summary_stats metrics of one group; pause durations are pooled over all pauses."""
+    def mean(name):
+        return float(group[name].mean) if group[name].count else 0
+
+    pause_count = mean("pauseCount")
+    return {
+        "files": group["files"],
+        "averageTotalTime": mean("totalTime"),
+        "averageSpeed": mean("averageSpeed"),
+        "averageJerkSpikeCount": mean("jerkSpikeCount"),
+        "averageHesitation": mean("hesitation"),
+        "averagePauseDuration": mean("pauseDurationTotal") / pause_count if pause_count else 0,
+        "averagePauseCount": pause_count,
+    }
+
+# === Main Functions ===
+
+@traced("aggregate")
+def aggregate_files(items, root, group_bys):
+    """Fold a chunk of (file_path, indexed label) pairs into every grouping at once; the process-pool work unit."""
+    records = [load_json(file_path) for file_path, _ in items]
+    count(sessions=len(records))
+    keys = [path_keys(file_path, root) for file_path, _ in items]
+    # Indexed labels take precedence over a "label" key in the payload
+    for k, (_, label) in zip(keys, items):
+        if label != UNLABELLED:
+            k["label"] = int(label)
+    scalars = scalar_rows(records)
+    trajectories = {field: trajectory_rows(records, field) for field in TRAJECTORY_FIELDS}
+
+    result = {}
+    for group_by in group_bys:
+        labels = np.array([group_label(group_by, k, data) for k, data in zip(keys, records)])
+        groups = result[group_by] = {}
+        for label in np.unique(labels):
+            rows = np.flatnonzero(labels == label)
+            group = groups[label] = new_group()
+            group["files"] = len(rows)
+            for j, field in enumerate(SCALAR_FIELDS):
+                group[field].update(scalars[rows, j])
+            for field in TRAJECTORY_FIELDS:
+                group[field].update(trajectories[field][rows])  # Unusable rows are NaN and skipped
+    return result
+
+def aggregate_groups(root, group_bys, workers=None, label_index=None):
+    """One pass over every session below root, grouped by each key tuple in group_bys.
+
+    With a label_index, the "label" key is joined from that label index.
+
+    Returns {group_by: {group label: accumulators}}; chunks are folded on
+    worker processes and merged in file order.
+    """
+    group_bys = [tuple(group_by) for group_by in group_bys]
+    files = find_session_files(root)
+    # Joined once here rather than per chunk, so the index is read once
+    labels = join_labels(files, label_index) if label_index else [UNLABELLED] * len(files)
+    total = {group_by: {} for group_by in group_bys}
+    items = list(zip(files, labels))
+    for partial_result in imap_chunks(partial(aggregate_files, root=root, group_bys=group_bys), items, workers):
+        merge_groups(total, partial_result)
+    return total
+
+def summary_table(groups):
+    """One row per (group_by, group) with the file count and the summary metrics."""
+    rows = []
+    for group_by, by_label in groups.items():
+        for label in sorted(by_label):
+            rows.append({"groupBy": ",".join(group_by), "group": label, **summarize_group(by_label[label])})
+    return rows
+
+def mean_trajectories(groups):
+    """{group_by: {group: {field: mean resampled series}}} for every group with data."""
+    return {
+        ",".join(group_by): {
+            label: {field: group[field].mean.tolist() for field in TRAJECTORY_FIELDS if group[field].count}
+            for label, group in sorted(by_label.items())
+        }
+        for group_by, by_label in groups.items()
+    }
+
+def save_table(rows, output_path=TABLE_PATH):
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=["groupBy", "group", "files"] + SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"✅ Saved group summary table to: {output_path}")
+
+def save_trajectories(trajectories, output_path=TRAJECTORIES_PATH):
+    with open(output_path, 'w') as f:
+        json.dump(trajectories, f)
+    print(f"✅ Saved group mean trajectories to: {output_path}")
+
+def plot_group_comparison(rows, group_by, first, second, output_path, show=True):
+    """plot_comparison_chart of two groups of one grouping in the summary table."""
+    from average_mouse_stats_chart import plot_comparison_chart
+    if not show:
+        from batch_render import use_headless
+        use_headless()
+
+    group_by = ",".join(parse_group_by(group_by))
+    by_label = {row["group"]: row for row in rows if row["groupBy"] == group_by}
+    missing = [label for label in (first, second) if label not in by_label]
+    if missing:
+        raise ValueError(f"No group {', '.join(missing)} for {group_by}, found: {', '.join(sorted(by_label))}")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    plot_comparison_chart(by_label[first], by_label[second], output_path, show, labels=(first, second))
+
+def print_table(rows):
+    print(f"{'group by':<20}{'group':<28}{'files':>7}{'time':>9}{'speed':>9}{'spikes':>8}{'hesit.':>8}{'pauses':>8}")
+    for row in rows:
+        print(f"{row['groupBy']:<20}{row['group'][:27]:<28}{row['files']:>7}{row['averageTotalTime']:>9.2f}"
+              f"{row['averageSpeed']:>9.1f}{row['averageJerkSpikeCount']:>8.2f}{row['averageHesitation']:>8.2f}"
+              f"{row['averagePauseCount']:>8.2f}")
+
+def group_report(root, group_bys, table_path=TABLE_PATH, trajectories_path=TRAJECTORIES_PATH, compare=None,
+                 chart_path=CHART_PATH, workers=None, label_index=None):
+    """Aggregate, print and save the table and trajectories, and chart `compare` = (group_by, first, second)."""
+    groups = aggregate_groups(root, group_bys, workers, label_index)
+    rows = summary_table(groups)
+    print_table(rows)
+    save_table(rows, table_path)
+    save_trajectories(mean_trajectories(groups), trajectories_path)
+    if compare:
+        plot_group_comparison(rows, *compare, chart_path, show=False)
+        print(f"✅ Saved comparison chart to: {chart_path}")
+    return rows
+
+# === Entry Point ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summary metrics and mean trajectories per group in one pass.")
+    parser.add_argument("root", help="Folder of session JSONs, e.g. questionnaire_sessions")
+    parser.add_argument("--by", action="append", required=True,
+                        help="Comma-separated keys, repeatable: folder, session, part, file or any payload "
+                             "field such as question, answer, hesitationLevel, deceptionFlag, label")
+    parser.add_argument("--table", default=TABLE_PATH)
+    parser.add_argument("--trajectories", default=TRAJECTORIES_PATH)
+    parser.add_argument("--compare", nargs=3, metavar=("GROUP_BY", "FIRST", "SECOND"),
+                        help="Draw plot_comparison_chart for two groups, e.g. --compare part 1 2")
+    parser.add_argument("--chart", default=CHART_PATH)
+    parser.add_argument("--label-index", help="Label index to join the label key from, e.g. data/labels.sqlite")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    group_report(args.root, [parse_group_by(spec) for spec in args.by], args.table, args.trajectories,
+                 args.compare, args.chart, args.workers, args.label_index)
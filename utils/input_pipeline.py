@@ -0,0 +1,145 @@
+import os
+import numpy as np
+import tensorflow as tf
+from sklearn.model_selection import train_test_split
+from parallel_ingest import load_json
+from sequence_features import NUM_FEATURES, SEQUENCE_LENGTH, WINDOW_STRIDE, featurize_session, window_starts
+
+# === Settings ===
+BATCH_SIZE = 32
+FILE_SHUFFLE_BUFFER = 10000  # Paths are shuffled through a buffer, cache rows are shuffled in full
+BUCKET_BOUNDARIES = [25, 50, 75, 100, 125]  # Length buckets; windows never exceed SEQUENCE_LENGTH
+PAD_VALUE = -1e9  # Pads bucketed batches for Masking; zero is a real step (a resting cursor), this is not
+
+# === Helper Functions ===
+
+def stratified_split(labels, seed, test_size=0.1, val_size=2/9):
+    """70/20/10 split of positions only, no feature array is copied.
+
+    Splitting positions with the same stratification and seed yields exactly
+    the partition train_test_split produces on (X, y).
+    """
+    positions = np.arange(len(labels))
+    temp, test = train_test_split(positions, test_size=test_size, stratify=labels, random_state=seed)
+    train, val = train_test_split(temp, test_size=val_size, stratify=labels[temp], random_state=seed)
+    return train, val, test
+
+def window_ragged(offsets, indices, window=SEQUENCE_LENGTH, stride=WINDOW_STRIDE):
+    """Cut the ragged sequences at `indices` into windows of at most `window` steps.
+
+    Returns the start and end of every window in the values array and its
+    group, the position in `indices` of the sequence it was cut from.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    starts, ends, groups = [], [], []
+    for group, i in enumerate(indices):
+        length = offsets[i + 1] - offsets[i]
+        window_start = window_starts(length, window, stride)
+        starts.append(offsets[i] + window_start)
+        ends.append(offsets[i] + np.minimum(window_start + window, length))
+        groups.append(np.full(len(window_start), group, dtype=np.int64))
+    if not starts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    return np.concatenate(starts), np.concatenate(ends), np.concatenate(groups)
+
+def _finish(ds, batch_size):
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+# === Main Functions ===
+
+def dataset_from_cache(features, rows, labels, batch_size=BATCH_SIZE, shuffle=False, seed=None):
+    """Batches gathered from a memory-mapped feature block (see feature_cache.py).
+
+    Only row numbers are shuffled; each batch is one gather from the memmap,
+    converted to float32 on a parallel map.
+    """
+    ds = tf.data.Dataset.from_tensor_slices((np.asarray(rows, dtype=np.int64),
+                                             np.asarray(labels, dtype=np.float32)))
+    if shuffle:
+        ds = ds.shuffle(len(rows), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+
+    def gather(batch_rows):
+        return np.asarray(features[batch_rows], dtype=np.float32)
+
+    def load(batch_rows, batch_labels):
+        x = tf.numpy_function(gather, [batch_rows], tf.float32)
+        return tf.ensure_shape(x, [None, SEQUENCE_LENGTH, NUM_FEATURES]), batch_labels
+
+    ds = ds.map(load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+def dataset_from_files(file_paths, labels, batch_size=BATCH_SIZE, shuffle=False, seed=None):
+    """Batches featurized straight from session JSON files.
+
+    Unusable files are dropped inside the pipeline, so use predict_with_labels
+    to keep predictions and labels aligned.
+    """
+    ds = tf.data.Dataset.from_tensor_slices((list(file_paths), np.asarray(labels, dtype=np.float32)))
+    if shuffle:
+        ds = ds.shuffle(min(len(file_paths), FILE_SHUFFLE_BUFFER), seed=seed, reshuffle_each_iteration=True)
+
+    def featurize(path):
+        path = path.decode()
+        seq = featurize_session(load_json(path), os.path.basename(path))
+        if seq is None:
+            return np.zeros((0, SEQUENCE_LENGTH, NUM_FEATURES), dtype=np.float32)
+        return seq[None].astype(np.float32)
+
+    def load(path, label):
+        x = tf.numpy_function(featurize, [path], tf.float32)
+        return tf.ensure_shape(x, [None, SEQUENCE_LENGTH, NUM_FEATURES]), label
+
+    ds = ds.map(load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+    ds = ds.filter(lambda x, label: tf.shape(x)[0] > 0)
+    ds = ds.map(lambda x, label: (x[0], label))
+    return _finish(ds, batch_size)
+
+def dataset_bucketed(values, starts, ends, labels, groups=None, batch_size=BATCH_SIZE,
+                     shuffle=False, seed=None, boundaries=BUCKET_BOUNDARIES):
+    """Batches of similar-length windows, padded with PAD_VALUE only to the longest in the batch.
+
+    `values` holds the raw sequences back to back; each element is the slice
+    values[start:end]. Pair with Masking(mask_value=PAD_VALUE) so only the
+    padding is ignored.
+    With groups, elements are (x, label, group) for predict_sessions.
+    """
+    values = tf.convert_to_tensor(values, dtype=tf.float32)
+    columns = (np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64),
+               np.asarray(labels, dtype=np.float32))
+    padding = (tf.constant(PAD_VALUE, tf.float32), tf.constant(0, tf.float32))
+    if groups is not None:
+        columns += (np.asarray(groups, dtype=np.int64),)
+        padding += (tf.constant(0, tf.int64),)
+    ds = tf.data.Dataset.from_tensor_slices(columns)
+    if shuffle:
+        ds = ds.shuffle(len(starts), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.map(lambda start, end, *rest: (values[start:end],) + tuple(rest),
+                num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+    ds = ds.bucket_by_sequence_length(
+        element_length_func=lambda x, *rest: tf.shape(x)[0],
+        bucket_boundaries=list(boundaries),
+        bucket_batch_sizes=[batch_size] * (len(boundaries) + 1),
+        padding_values=padding)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+def predict_sessions(model, ds, count):
+    """Mean predicted probability of the windows of each of `count` groups."""
+    total = np.zeros(count)
+    windows = np.zeros(count)
+    for x, _, groups in ds:
+        groups = groups.numpy()
+        np.add.at(total, groups, model.predict_on_batch(x).reshape(-1))
+        np.add.at(windows, groups, 1)
+    return total / np.maximum(windows, 1)
+
+def predict_with_labels(model, ds):
+    """Predicted probabilities and true labels from one pass over a dataset."""
+    probabilities, labels = [], []
+    for x, y in ds:
+        probabilities.append(model.predict_on_batch(x).reshape(-1))
+        labels.append(y.numpy())
+    if not labels:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(labels).astype(np.int64), np.concatenate(probabilities)
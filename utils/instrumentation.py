@@ -0,0 +1,312 @@
+import os
+import sys
+import json
+import time
+import atexit
+import platform
+import multiprocessing
+import threading
+from functools import wraps
+
+# Optional peak-memory sources: resource on Unix, psutil elsewhere
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# === Settings ===
+ENV_VAR = "MOUSE_PROFILE"  # "1" records spans and counters, "cprofile" also runs cProfile
+OUTPUT_ENV_VAR = "MOUSE_PROFILE_OUTPUT"  # Report path, default REPORT_DIR/<script>-<time>-<pid>.json
+REPORT_DIR = "profiles"
+TRACE_MIN_MS = 1.0  # Shorter spans count in the stage totals but are left out of the trace
+PROFILE_TOP = 30  # Functions listed in the report from the cProfile run
+
+# === Memory ===
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None if it cannot be read."""
+    # VmHWM restarts at exec, ru_maxrss keeps the peak of the parent that forked us
+    if sys.platform.startswith("linux"):
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 ** 2
+    return None
+
+def rss_mb():
+    """Current resident memory of this process in MB, or None if it cannot be read."""
+    if sys.platform.startswith("linux"):
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    return None
+
+# === Recorder ===
+# One per process. Spans are aggregated per name into stage totals; the ones
+# of at least TRACE_MIN_MS are also kept as trace events. Everything here is
+# a no-op until enable() runs, so instrumented code pays one flag check.
+
+class _Recorder:
+    def __init__(self):
+        self.enabled = False
+        self.owner = None  # Pid that writes the report; forked workers only hand their records back
+        self.output_path = None
+        self.profiler = None
+        self.started = time.time()
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.events = []
+        self.worker_peaks = {}
+        self.local = threading.local()
+
+    def stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def record(self, name, start, seconds, counters, rss):
+        stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "counters": {}})
+        stage["calls"] += 1
+        stage["seconds"] += seconds
+        stage["max_seconds"] = max(stage["max_seconds"], seconds)
+        for key, value in counters.items():
+            stage["counters"][key] = stage["counters"].get(key, 0) + value
+        if seconds * 1000 >= TRACE_MIN_MS:
+            self.events.append({"name": name, "ph": "X", "ts": round((start - self.started) * 1e6),
+                                "dur": round(seconds * 1e6), "pid": os.getpid(), "tid": threading.get_ident(),
+                                "args": dict(counters, rss_mb=rss)})
+
+    def absorb(self, records):
+        """Fold the stage totals and trace events a worker process handed back."""
+        for name, theirs in records["stages"].items():
+            stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "counters": {}})
+            stage["calls"] += theirs["calls"]
+            stage["seconds"] += theirs["seconds"]
+            stage["max_seconds"] = max(stage["max_seconds"], theirs["max_seconds"])
+            for key, value in theirs["counters"].items():
+                stage["counters"][key] = stage["counters"].get(key, 0) + value
+        for event in records["events"]:
+            event["ts"] += round((records["started"] - self.started) * 1e6)
+        self.events.extend(records["events"])
+        peak = self.worker_peaks.get(records["pid"])
+        if records["peak_rss_mb"] is not None:
+            self.worker_peaks[records["pid"]] = max(peak or 0, records["peak_rss_mb"])
+
+_recorder = _Recorder()
+
+class Span:
+    """Timed stage; counters passed in or added with add() are summed per stage name."""
+
+    __slots__ = ("name", "counters", "start", "clock")
+
+    def __init__(self, name, counters):
+        self.name = name
+        self.counters = counters
+
+    def add(self, **counters):
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        return self
+
+    def __enter__(self):
+        _recorder.stack().append(self)
+        self.start = time.time()
+        self.clock = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.clock
+        stack = _recorder.stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        _recorder.record(self.name, self.start, seconds, self.counters, rss_mb())
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def add(self, **counters):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+# === Helper Functions ===
+
+def enabled():
+    return _recorder.enabled
+
+def enable(profile=False, output_path=None):
+    """Start recording in this process; the report is written when it exits."""
+    if _recorder.enabled:
+        return
+    _recorder.enabled = True
+    _recorder.owner = os.getpid()
+    _recorder.started = time.time()
+    _recorder.output_path = output_path or os.environ.get(OUTPUT_ENV_VAR)
+    if profile:
+        import cProfile
+        _recorder.profiler = cProfile.Profile()
+        _recorder.profiler.enable()
+    atexit.register(_write_at_exit)
+
+def span(name, **counters):
+    """Context manager timing one stage: `with span("resample", sequences=n) as s: ... s.add(points=m)`."""
+    if not _recorder.enabled:
+        return NULL_SPAN
+    return Span(name, counters)
+
+def count(**counters):
+    """Add counters to the innermost open span of this thread."""
+    if _recorder.enabled:
+        stack = _recorder.stack()
+        if stack:
+            stack[-1].add(**counters)
+
+def traced(name=None):
+    """Decorator wrapping every call of a function in a span."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _recorder.enabled:
+                return func(*args, **kwargs)
+            with Span(label, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class collecting:
+    """Picklable wrapper of a process-pool work unit that hands the worker's records back with its result.
+
+    The worker starts each call with empty records, so forked workers do not
+    send back what the parent had recorded before the fork.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, chunk):
+        _recorder.enabled = True
+        if _recorder.profiler is not None and _recorder.owner != os.getpid():
+            _recorder.profiler.disable()  # Inherited through fork; only the parent's run is profiled
+            _recorder.profiler = None
+        _recorder.reset()
+        result = self.func(chunk)
+        records = {"pid": os.getpid(), "started": _recorder.started, "stages": _recorder.stages,
+                   "events": _recorder.events, "peak_rss_mb": peak_rss_mb()}
+        _recorder.reset()
+        return result, records
+
+def pool_func(func):
+    """func wrapped with collecting when recording is on, so worker stages reach the report."""
+    return collecting(func) if _recorder.enabled else func
+
+def pool_result(result):
+    """Unwrap a pool_func result, folding the worker's records into this process's."""
+    if not _recorder.enabled:
+        return result
+    result, records = result
+    _recorder.absorb(records)
+    return result
+
+def report():
+    """Stage totals, trace events, peak memory and the run's environment as a dict."""
+    stages = [{"stage": name, **stage} for name, stage in _recorder.stages.items()]
+    stages.sort(key=lambda stage: stage["seconds"], reverse=True)
+    for stage in stages:
+        files = stage["counters"].get("files")
+        stage["files_per_sec"] = files / stage["seconds"] if files and stage["seconds"] else None
+    return {
+        "argv": sys.argv,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_recorder.started)),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "wall_seconds": time.time() - _recorder.started,
+        "peak_rss_mb": peak_rss_mb(),
+        "worker_peak_rss_mb": max(_recorder.worker_peaks.values(), default=None),
+        "workers": len(_recorder.worker_peaks),
+        "stages": stages,
+    }
+
+def _profile_top(profiler, limit=PROFILE_TOP):
+    import pstats
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({"function": f"{os.path.basename(filename)}:{line}({function})", "calls": calls,
+                     "own_seconds": own, "cumulative_seconds": cumulative})
+    rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+    return rows[:limit]
+
+def default_report_path():
+    script = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(_recorder.started))
+    return os.path.join(REPORT_DIR, f"{script}-{stamp}-{os.getpid()}.json")
+
+def write_report(output_path=None):
+    """Write the report JSON and, next to it, a Chrome/Perfetto trace (.trace.json) and the cProfile dump (.prof)."""
+    output_path = output_path or _recorder.output_path or default_report_path()
+    base = output_path[:-5] if output_path.endswith(".json") else output_path
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    result = report()
+    if _recorder.profiler is not None:
+        _recorder.profiler.disable()
+        _recorder.profiler.dump_stats(f"{base}.prof")
+        result["profile"] = _profile_top(_recorder.profiler)
+        result["profile_path"] = f"{base}.prof"
+    result["trace_path"] = f"{base}.trace.json"
+    with open(result["trace_path"], 'w') as f:
+        json.dump({"traceEvents": _recorder.events, "displayTimeUnit": "ms"}, f)
+    with open(output_path, 'w') as f:
+        json.dump(result, f, indent=2)
+    return output_path, result
+
+def print_report(result, limit=15):
+    print(f"{'stage':<28}{'calls':>9}{'seconds':>11}{'max s':>10}  counters")
+    for stage in result["stages"][:limit]:
+        counters = ", ".join(f"{key}={value:,.0f}" for key, value in stage["counters"].items())
+        print(f"{stage['stage'][:27]:<28}{stage['calls']:>9}{stage['seconds']:>11.3f}{stage['max_seconds']:>10.3f}  "
+              f"{counters}")
+    peak = result["peak_rss_mb"]
+    workers = result["worker_peak_rss_mb"]
+    print(f"Wall {result['wall_seconds']:.2f}s, peak RSS {peak:.0f} MB" if peak is not None else
+          f"Wall {result['wall_seconds']:.2f}s", end="")
+    print(f", workers up to {workers:.0f} MB" if workers is not None else "")
+
+def _write_at_exit():
+    if not _recorder.enabled or _recorder.owner != os.getpid() or _in_worker():
+        return
+    output_path, result = write_report()
+    print_report(result)
+    print(f"✅ Saved profiling report to: {output_path}")
+
+def _in_worker():
+    # Spawned workers import this module before parent_process() is set, but after their name is
+    return multiprocessing.parent_process() is not None or multiprocessing.current_process().name != "MainProcess"
+
+# Switched on for any script by the environment, e.g. MOUSE_PROFILE=1 python calc_averages.py. Spawned and
+# forkserver workers re-import this module with the variable still set; they hand records back through
+# pool_func instead of each writing a report of their own.
+if os.environ.get(ENV_VAR, "").lower() not in ("", "0", "false", "no") and not _in_worker():
+    enable(profile=os.environ[ENV_VAR].lower() == "cprofile")
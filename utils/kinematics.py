@@ -0,0 +1,218 @@
+import json
+import numpy as np
+from instrumentation import count, traced
+from parallel_ingest import imap_chunks, load_json
+from resample import to_point_array, to_ragged
+from session_archive import find_session_files
+
+# === Settings ===
+# Same constants as public/script.js
+SMOOTHING_WINDOW = 3  # Previous accelerations averaged into the jerk
+MAX_JERK = 1000000
+MIN_JERK_DT = 0.01  # Jerk is 0 for events closer together than this (s)
+CURVATURE_EPS = 1e-6
+PAUSE_DISTANCE = 2  # Moves shorter than this (px) count as standing still
+PAUSE_THRESHOLD = 0.2  # Still time (s) after which each still event records a pause
+JERK_SPIKE_FACTOR = 4  # Spike threshold is this times the mean |jerk| ...
+JERK_SPIKE_RANGE = (400000, 1000000)  # ... clamped to this range
+
+# === Helper Functions ===
+# All functions take a batch of sessions as ragged arrays: positions (N, 2) and
+# timestamps (N,) of every event back to back, offsets (n + 1,) marking where
+# each session starts. Values are computed exactly as script.js does per event.
+
+def session_ids(offsets):
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+def _local_index(offsets):
+    """Position of every event within its session (mouseData.length when it arrived)."""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return np.arange(offsets[-1]) - np.repeat(offsets[:-1], np.diff(offsets))
+
+def _previous(values, local, fill):
+    """values[i - 1], or `fill` for the first event of a session."""
+    shifted = np.empty_like(values)
+    shifted[1:] = values[:-1]
+    shifted[local == 0] = fill
+    return shifted
+
+def step_distances(positions, offsets):
+    """Distance from the previous event; tracking starts at (0, 0) like lastPosition."""
+    positions = np.asarray(positions, dtype=np.float64)
+    local = _local_index(offsets)
+    previous = _previous(positions, local, 0.0)
+    return np.sqrt((positions[:, 0] - previous[:, 0]) ** 2 + (positions[:, 1] - previous[:, 1]) ** 2)
+
+@traced("kinematics")
+def compute_kinematics(positions, timestamps, offsets):
+    """Per-event speed, acceleration, jerk and curvature (trackMouse and its helpers)."""
+    positions = np.asarray(positions, dtype=np.float64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    local = _local_index(offsets)
+    count(sessions=len(offsets) - 1, points=len(positions))
+
+    ms = np.round(timestamps * 1000)  # Date.now() milliseconds since the question started
+    dt = (ms - _previous(ms, local, 0.0)) / 1000
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = step_distances(positions, offsets) / dt
+        acceleration = (speed - _previous(speed, local, 0.0)) / dt
+    acceleration[local == 0] = 0
+
+    # Mean of the last SMOOTHING_WINDOW accelerations and the current one,
+    # summed oldest first as Array.reduce does
+    window_sum = np.zeros(len(local))
+    for k in range(SMOOTHING_WINDOW, 0, -1):
+        lagged = np.zeros(len(local))
+        lagged[k:] = acceleration[:-k]
+        window_sum += np.where(local >= k, lagged, 0)
+    window_sum += acceleration
+    smoothed = window_sum / (np.minimum(local, SMOOTHING_WINDOW) + 1)
+    last_acceleration = _previous(acceleration, local, 0.0)
+    last_acceleration[np.isnan(last_acceleration)] = 0  # `acceleration || 0`
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jerk = np.clip((smoothed - last_acceleration) / dt, -MAX_JERK, MAX_JERK)
+    jerk[(local == 0) | (dt < MIN_JERK_DT)] = 0
+
+    # Bend through the two previous points and the current one, from the 4th event on
+    curvature = np.zeros(len(local))
+    valid = np.flatnonzero(local >= 3)
+    prev_point, last_point, end = positions[valid - 2], positions[valid - 1], positions[valid]
+    d1 = last_point - prev_point
+    d2 = end - last_point
+    dd = d2 - d1
+    numerator = np.abs(d1[:, 0] * dd[:, 1] - d1[:, 1] * dd[:, 0])
+    denominator = (d1[:, 0] * d1[:, 0] + d1[:, 1] * d1[:, 1]) ** 1.5
+    bent = denominator >= CURVATURE_EPS
+    curvature[valid[bent]] = numerator[bent] / denominator[bent]
+
+    return {"speeds": speed, "accelerations": acceleration, "jerks": jerk, "curvatures": curvature}
+
+def detect_pauses(positions, timestamps, offsets):
+    """Pause points as script.js records them, as ragged (x, y, duration) rows.
+
+    A run of still events starts a pause at its first event; every later
+    event of the run more than PAUSE_THRESHOLD after that start records a
+    pause lasting from the run start, so one long stop records several.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    local = _local_index(offsets)
+    ms = np.round(np.asarray(timestamps, dtype=np.float64) * 1000)  # Date.now() milliseconds
+
+    still = step_distances(positions, offsets) < PAUSE_DISTANCE
+    run_start = still & ((local == 0) | ~_previous(still, local, False))
+    start_index = np.maximum.accumulate(np.where(run_start, np.arange(len(local)), 0))
+    duration = (ms - ms[start_index]) / 1000
+    recorded = np.flatnonzero(still & ~run_start & (duration > PAUSE_THRESHOLD))
+
+    pauses = np.column_stack((positions[recorded], duration[recorded]))
+    counts = np.bincount(session_ids(offsets)[recorded], minlength=len(offsets) - 1)
+    return pauses, np.concatenate(([0], np.cumsum(counts)))
+
+def jerk_spike_counts(jerks, offsets):
+    """Spike count and dynamic threshold per session (handleAnswer)."""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    magnitudes = np.abs(np.asarray(jerks, dtype=np.float64))
+    ids = session_ids(offsets)
+    mean = np.bincount(ids, weights=magnitudes, minlength=len(lengths)) / np.maximum(lengths, 1)
+    threshold = np.minimum(np.maximum(mean * JERK_SPIKE_FACTOR, JERK_SPIKE_RANGE[0]), JERK_SPIKE_RANGE[1])
+    counts = np.bincount(ids, weights=magnitudes > threshold[ids], minlength=len(lengths))
+    return counts.astype(np.int64), threshold
+
+def hesitation_levels(hesitation, pause_counts, spike_counts):
+    high = (hesitation > 3) | (pause_counts > 5) | (spike_counts > 16)
+    moderate = (hesitation > 2) | ((spike_counts >= 11) & (spike_counts <= 16))
+    return np.where(high, "high", np.where(moderate, "moderate", "low"))
+
+def average_speeds(positions, timestamps, offsets):
+    """Path length over elapsed time per session (calculateSpeed); NaN where it is not a finite number."""
+    positions = np.asarray(positions, dtype=np.float64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    local = _local_index(offsets)
+    ids = session_ids(offsets)
+    inner = local > 0
+
+    distance = np.bincount(ids[inner], weights=step_distances(positions, offsets)[inner], minlength=len(offsets) - 1)
+    elapsed = np.bincount(ids[inner], weights=(timestamps - _previous(timestamps, local, 0.0))[inner],
+                          minlength=len(offsets) - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speeds = distance / elapsed
+    speeds[np.diff(offsets) < 2] = 0
+    speeds[~np.isfinite(speeds)] = np.nan
+    return speeds
+
+def _number(value):
+    """Whole pixel coordinates go back to JSON as ints, as the browser wrote them."""
+    return int(value) if float(value).is_integer() else value
+
+# === Main Functions ===
+
+def recompute_sessions(positions, timestamps, offsets):
+    """Every derived field of a batch of sessions from raw positions and timestamps.
+
+    Returns ragged per-event series (sharing `offsets`), ragged pause points
+    and one value per session for the scalars.
+    """
+    series = compute_kinematics(positions, timestamps, offsets)
+    pauses, pause_offsets = detect_pauses(positions, timestamps, offsets)
+    pause_ids = session_ids(pause_offsets)
+    hesitation = np.bincount(pause_ids, weights=pauses[:, 2], minlength=len(offsets) - 1)
+    pause_counts = np.diff(pause_offsets)
+    spike_counts, thresholds = jerk_spike_counts(series["jerks"], offsets)
+    levels = hesitation_levels(hesitation, pause_counts, spike_counts)
+    return {
+        "series": series,
+        "pausePoints": (pauses, pause_offsets),
+        "hesitation": hesitation,
+        "hesitationLevel": levels,
+        "deceptionFlag": levels == "high",
+        "jerkSpikeCount": spike_counts,
+        "jerkSpikeThreshold": thresholds,
+        "averageSpeed": average_speeds(positions, timestamps, offsets),
+    }
+
+def refeaturize_files(file_paths):
+    """Recompute the derived fields of a chunk of session files in place; the pool work unit."""
+    sessions = [load_json(file_path) for file_path in file_paths]
+    paths, times = [], []
+    for session in sessions:
+        xy = to_point_array(session.get("mouseMovements", [])).reshape(-1, 2)
+        ts = np.asarray(session.get("timestamps", []), dtype=np.float64)
+        n = min(len(xy), len(ts))  # Keep the two series aligned if one is short
+        paths.append(xy[:n])
+        times.append(ts[:n])
+    positions, offsets = to_ragged(paths)
+    timestamps, _ = to_ragged(times)
+    result = recompute_sessions(positions, timestamps, offsets)
+
+    series = result["series"]
+    pauses, pause_offsets = result["pausePoints"]
+    for i, (file_path, session) in enumerate(zip(file_paths, sessions)):
+        start, end = offsets[i], offsets[i + 1]
+        for name in ("accelerations", "jerks", "curvatures"):
+            session[name] = series[name][start:end].tolist()
+        session["pausePoints"] = [{"x": _number(x), "y": _number(y), "duration": d}
+                                  for x, y, d in pauses[pause_offsets[i]:pause_offsets[i + 1]].tolist()]
+        session["hesitation"] = float(result["hesitation"][i])
+        session["hesitationLevel"] = str(result["hesitationLevel"][i])
+        session["deceptionFlag"] = bool(result["deceptionFlag"][i])
+        session["jerkSpikeCount"] = int(result["jerkSpikeCount"][i])
+        session["jerkSpikeThreshold"] = _number(float(result["jerkSpikeThreshold"][i]))
+        speed = result["averageSpeed"][i]
+        session["averageSpeed"] = 0 if np.isnan(speed) else _number(float(speed))  # server.js stores `averageSpeed || 0`
+        with open(file_path, 'w') as f:
+            json.dump(session, f, indent=2)
+    return len(file_paths)
+
+def refeaturize_folder(folder_path, workers=None):
+    """Rewrite the derived fields of every session below folder_path with the current definitions."""
+    files = find_session_files(folder_path)
+    count = sum(imap_chunks(refeaturize_files, files, workers))
+    print(f"✅ Recomputed kinematics of {count} sessions in: {folder_path}")
+    return count
+
+# === Entry Point ===
+if __name__ == "__main__":
+    refeaturize_folder("questionnaire_sessions")
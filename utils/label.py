@@ -1,26 +1,27 @@
-import json
 import glob
-import os
+from label_index import LABEL_INDEX_PATH, LabelIndex
 
 # Paths to the folders containing the JSON files
 truthful_folder = "data/truthful_responses/"
 deceptive_folder = "data/deceptive_responses/"
 
-def add_labels_to_json_files(folder, label):
-    """Add label to each JSON file based on its folder."""
-    files = glob.glob(folder + "*.json")
-    for file_path in files:
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-        
-        # Add label to the data
-        data["label"] = label
-        
-        # Save the updated JSON file with the label
-        with open(file_path, 'w') as file:
-            json.dump(data, file, indent=4)
-        print(f"Added label {label} to {file_path}")
+def add_labels_to_json_files(folder, label, index_path=LABEL_INDEX_PATH):
+    """Record the label of each JSON file of a folder in the sidecar label index.
 
-# Add labels to truthful and deceptive files
-add_labels_to_json_files(truthful_folder, 0)  # 0 for truthful
-add_labels_to_json_files(deceptive_folder, 1)  # 1 for deceptive
+    The session files themselves are not rewritten; relabelling only writes
+    the entries that changed.
+    """
+    files = sorted(glob.glob(folder + "*.json"))
+    index = LabelIndex(index_path)
+    try:
+        changed = index.set_labels(files, label)
+    finally:
+        index.close()
+    print(f"✅ Labelled {len(files)} files in {folder} as {label} ({changed} changed) in: {index_path}")
+    return changed
+
+# === Entry Point ===
+if __name__ == "__main__":
+    # Add labels to truthful and deceptive files
+    add_labels_to_json_files(truthful_folder, 0)  # 0 for truthful
+    add_labels_to_json_files(deceptive_folder, 1)  # 1 for deceptive
@@ -0,0 +1,178 @@
+import os
+import time
+import sqlite3
+import numpy as np
+from aggregate_manifest import file_digest
+from session_archive import find_session_files
+
+# === Settings ===
+LABEL_INDEX_PATH = "data/labels.sqlite"
+UNLABELLED = -1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    label INTEGER NOT NULL,
+    labelled_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS labels_sha256 ON labels (sha256);
+"""
+
+class LabelIndex:
+    """Sidecar index of session labels, so labelling never rewrites the session JSONs.
+
+    Paths are stored relative to the index's folder with "/" separators,
+    next to the file's size, mtime and content hash. A file that was moved
+    or renamed is still found by its hash. Every call is one transaction, so
+    a batch of labels is applied completely or not at all. The table is read
+    once per instance and files are re-hashed only when their size or mtime
+    changed, so repeated lookups stay cheap.
+    """
+
+    def __init__(self, index_path=LABEL_INDEX_PATH):
+        self.index_path = index_path
+        self.root = os.path.dirname(os.path.abspath(index_path))
+        self.conn = sqlite3.connect(index_path)
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+        self.table = None  # {path: (mtime_ns, size, sha256, label)}, read on first use
+        self.by_hash = None
+        self.digests = {}  # Content hashes of unindexed files looked up, by path, with their size and mtime
+
+    def close(self):
+        self.conn.close()
+
+    def _key(self, file_path):
+        return os.path.relpath(os.path.abspath(file_path), self.root).replace(os.sep, "/")
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def _table(self):
+        if self.table is None:
+            self.table = {path: (mtime_ns, size, sha256, label) for path, mtime_ns, size, sha256, label
+                          in self.conn.execute("SELECT path, mtime_ns, size, sha256, label FROM labels")}
+            self.by_hash = {sha256: label for _, _, sha256, label in self.table.values()}
+        return self.table
+
+    def _digest(self, file_path):
+        """Content hash of a file, reused while its size and mtime are unchanged."""
+        st = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        cached = self.digests.get(key)
+        if cached is None or cached[:2] != (st.st_mtime_ns, st.st_size):
+            cached = self.digests[key] = (st.st_mtime_ns, st.st_size, file_digest(file_path))
+        return cached[2]
+
+    def set_labels(self, file_paths, label):
+        """Label files, touching only entries whose label or content changed.
+
+        Unchanged entries cost one stat call; files are hashed only when new
+        or modified. Returns the number of entries written.
+        """
+        known = self._table()
+        now = time.time()
+        updates = []
+        for file_path in file_paths:
+            key = self._key(file_path)
+            st = os.stat(file_path)
+            entry = known.get(key)
+            if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+                if entry[3] == label:
+                    continue
+                digest = entry[2]
+            else:
+                digest = self._digest(file_path)
+            updates.append((key, st.st_mtime_ns, st.st_size, digest, int(label), now))
+
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?, ?, ?)", updates)
+        self.table = None
+        return len(updates)
+
+    def remove(self, file_paths):
+        with self.conn:
+            self.conn.executemany("DELETE FROM labels WHERE path = ?", [(self._key(p),) for p in file_paths])
+        self.table = None
+
+    def labels_of(self, file_paths):
+        """Label of every file, UNLABELLED for files not in the index.
+
+        Files are matched by path first; the ones that miss are hashed and
+        matched by content, which finds sessions that were moved.
+        """
+        table = self._table()
+        labels = np.array([table[key][3] if key in table else UNLABELLED
+                           for key in map(self._key, file_paths)], dtype=np.int64)
+
+        missing = [i for i in np.flatnonzero(labels == UNLABELLED) if os.path.exists(file_paths[i])]
+        if missing and self.by_hash:
+            for i in missing:
+                labels[i] = self.by_hash.get(self._digest(file_paths[i]), UNLABELLED)
+        return labels
+
+    def labelled_files(self, label=None):
+        """(file_path, label) of every indexed file that still exists, sorted by path."""
+        if label is None:
+            rows = self.conn.execute("SELECT path, label FROM labels ORDER BY path")
+        else:
+            rows = self.conn.execute("SELECT path, label FROM labels WHERE label = ? ORDER BY path", (label,))
+        items = [(self._path(key), value) for key, value in rows]
+        return [(path, value) for path, value in items if os.path.exists(path)]
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT label, COUNT(*) FROM labels GROUP BY label"))
+
+# === Helper Functions ===
+
+def label_folder(folder_path, label, index_path=LABEL_INDEX_PATH):
+    """Label every session JSON below folder_path in the index; returns the entries written."""
+    index = LabelIndex(index_path)
+    try:
+        return index.set_labels(find_session_files(folder_path), label)
+    finally:
+        index.close()
+
+def labelled_paths(folders, index_path=LABEL_INDEX_PATH):
+    """(file_path, label) pairs of every session JSON, folder by folder in sorted order.
+
+    A file's label comes from the label index when it is indexed and from its
+    folder otherwise; folders mapped to None contribute only indexed files.
+    """
+    files, folder_labels = [], []
+    for folder_path, label in folders.items():
+        found = find_session_files(folder_path)
+        files += found
+        folder_labels += [label] * len(found)
+
+    # One index lookup for every folder
+    items = []
+    for file_path, label, indexed in zip(files, folder_labels, join_labels(files, index_path)):
+        if indexed != UNLABELLED:
+            items.append((file_path, int(indexed)))
+        elif label is not None:
+            items.append((file_path, label))
+    return items
+
+def session_files(folder_path, label=None, index_path=LABEL_INDEX_PATH):
+    """Session JSONs below folder_path; with a label, only those labelled so (see labelled_paths).
+
+    The folder stands for `label`, and files the index labels otherwise are
+    left out, so an aggregate over a folder follows the index.
+    """
+    if label is None:
+        return find_session_files(folder_path)
+    return [file_path for file_path, value in labelled_paths({folder_path: label}, index_path) if value == label]
+
+def join_labels(file_paths, index_path=LABEL_INDEX_PATH):
+    """Labels of file_paths from the index, all UNLABELLED when there is no index."""
+    if not index_path or not os.path.exists(index_path):
+        return np.full(len(file_paths), UNLABELLED, dtype=np.int64)
+    index = LabelIndex(index_path)
+    try:
+        return index.labels_of(list(file_paths))
+    finally:
+        index.close()
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context, shared_memory
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from parallel_ingest import default_workers
+
+# Optional: caps numpy's BLAS threads in the workers, which import numpy before they can set the env vars
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+# === Settings ===
+FOLDERS = {
+    "data/truthful_responses": 0,
+    "data/deceptive_responses": 1,
+}
+FOLDS = 5
+SEARCH_SPACE = {
+    "units": [32, 64, 128],
+    "dropout": [0.2, 0.3, 0.5],
+    "batch_size": [32, 64],
+}
+RANDOM_TRIALS = None  # None runs the full grid, a number samples that many combinations of it
+EPOCHS = 50
+PATIENCE = 5
+VAL_SIZE = 0.2  # Part of each training fold held out for early stopping
+THREADS_PER_WORKER = None  # None splits the CPUs evenly over the workers
+RESULTS_PATH = "search_results.jsonl"  # One line per finished fold; reruns skip the folds it already holds
+SUMMARY_PATH = "search_summary.json"
+SEED = 42
+
+# === Helper Functions ===
+
+def search_trials(space=SEARCH_SPACE, random_trials=RANDOM_TRIALS, seed=SEED):
+    """Parameter dicts of the grid, or of random_trials combinations sampled from it."""
+    names = list(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*space.values())]
+    if random_trials is None or random_trials >= len(grid):
+        return grid
+    picked = np.random.default_rng(seed).choice(len(grid), random_trials, replace=False)
+    return [grid[i] for i in sorted(picked)]
+
+def trial_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+def run_key(y, X, folds, epochs, patience, seed):
+    """Identifies the dataset and CV settings, so results of another setup are never resumed."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X))
+    digest.update(np.ascontiguousarray(y))
+    digest.update(json.dumps([folds, epochs, patience, seed, VAL_SIZE]).encode())
+    return digest.hexdigest()[:16]
+
+def load_results(results_path, run):
+    """Finished folds of this run, keyed by (trial key, fold)."""
+    done = {}
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path, 'r') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by an interrupted run
+            if result.get("run") == run:
+                done[(result["trial"], result["fold"])] = result
+    return done
+
+# === Worker Process ===
+# Workers are spawned, not forked, so TensorFlow starts in each one after
+# its thread counts are set. The dataset stays in one shared memory block
+# that every worker maps instead of receiving a pickled copy.
+
+_shared = {}
+
+def init_worker(shm_name, shape, dtype, y, threads, counter):
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    if threadpool_limits is not None:
+        threadpool_limits(threads)
+
+    # Pin each worker to its own block of cores where the OS allows it
+    with counter.get_lock():
+        slot = counter.value
+        counter.value += 1
+    if hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        block = [cpus[(slot * threads + i) % len(cpus)] for i in range(threads)]
+        os.sched_setaffinity(0, block)
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _shared["shm"] = shm  # Keeps the mapping alive
+    _shared["X"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _shared["y"] = y
+
+def run_fold(params, fold, train, test, epochs=EPOCHS, patience=PATIENCE, seed=SEED):
+    """Fit one parameter set on one CV fold and score it on the held-out fold."""
+    import tensorflow as tf
+    from sklearn.metrics import accuracy_score, f1_score
+    from model_training_dl_lstm_gru_v1 import build_model
+
+    X, y = _shared["X"], _shared["y"]
+    fit, val = train_test_split(train, test_size=VAL_SIZE, stratify=y[train], random_state=seed)
+    tf.keras.utils.set_random_seed(seed + fold)
+
+    start = time.perf_counter()
+    model = build_model(units=params["units"], dropout=params["dropout"])
+    history = model.fit(X[fit], y[fit], validation_data=(X[val], y[val]), epochs=epochs,
+                        batch_size=params["batch_size"], verbose=0,
+                        callbacks=[tf.keras.callbacks.EarlyStopping(patience=patience, restore_best_weights=True)])
+    y_pred = (model.predict(X[test], batch_size=256, verbose=0).reshape(-1) > 0.5).astype(int)
+    seconds = time.perf_counter() - start
+    tf.keras.backend.clear_session()
+
+    return {
+        "fold": fold,
+        "macro_f1": float(f1_score(y[test], y_pred, average='macro')),
+        "accuracy": float(accuracy_score(y[test], y_pred)),
+        "epochs": len(history.history["loss"]),
+        "seconds": seconds,
+    }
+
+# === Main Functions ===
+
+def summarize(trials, done, folds):
+    """Per-trial mean and spread of the macro F1 over its finished folds, best first."""
+    rows = []
+    for params in trials:
+        results = [done[(trial_key(params), fold)] for fold in range(folds) if (trial_key(params), fold) in done]
+        if not results:
+            continue
+        f1 = np.array([r["macro_f1"] for r in results])
+        rows.append({
+            **params,
+            "folds": len(results),
+            "macro_f1": float(f1.mean()),
+            "macro_f1_std": float(f1.std()),
+            "accuracy": float(np.mean([r["accuracy"] for r in results])),
+            "epochs": float(np.mean([r["epochs"] for r in results])),
+            "seconds": float(sum(r["seconds"] for r in results)),
+        })
+    return sorted(rows, key=lambda row: row["macro_f1"], reverse=True)
+
+def print_summary(rows, names):
+    header = "".join(f"{name:>12}" for name in names)
+    print(f"{header}{'folds':>7}{'macro F1':>10}{'± std':>8}{'acc.':>8}{'epochs':>8}{'wall s':>9}")
+    for row in rows:
+        values = "".join(f"{row[name]:>12}" for name in names)
+        print(f"{values}{row['folds']:>7}{row['macro_f1']:>10.4f}{row['macro_f1_std']:>8.4f}"
+              f"{row['accuracy']:>8.4f}{row['epochs']:>8.1f}{row['seconds']:>9.1f}")
+
+def cross_validate_search(X, y, trials, folds=FOLDS, workers=None, threads=THREADS_PER_WORKER,
+                          epochs=EPOCHS, patience=PATIENCE, results_path=RESULTS_PATH, seed=SEED):
+    """Stratified k-fold CV of every trial, one (trial, fold) fit per task on a process pool.
+
+    X is copied once into shared memory for all workers. Every finished fold
+    is appended to results_path right away, so an interrupted search resumes
+    with the folds that are still missing. Returns the per-trial summary.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.int64)
+    run = run_key(y, X, folds, epochs, patience, seed)
+    done = load_results(results_path, run)
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(np.zeros(len(y)), y))
+
+    # Trial by trial, so the first trials are complete early in a long search
+    tasks = [(params, fold) for params in trials for fold in range(folds) if (trial_key(params), fold) not in done]
+    print(f"{len(trials)} trials × {folds} folds, {len(tasks)} fits to run ({len(done)} already done)")
+
+    if tasks:
+        workers = min(workers or default_workers(), len(tasks))
+        threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        ctx = get_context("spawn")
+        shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        try:
+            np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[:] = X
+            initargs = (shm.name, X.shape, X.dtype, y, threads, ctx.Value('i', 0))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=init_worker,
+                                     initargs=initargs) as pool, open(results_path, 'a') as f:
+                futures = {pool.submit(run_fold, params, fold, *splits[fold], epochs, patience, seed): params
+                           for params, fold in tasks}
+                for future in as_completed(futures):
+                    params = futures[future]
+                    result = {"run": run, "trial": trial_key(params), "params": params, **future.result()}
+                    f.write(json.dumps(result) + "\n")
+                    f.flush()
+                    done[(result["trial"], result["fold"])] = result
+                    print(f"✅ {params} fold {result['fold']}: macro F1 {result['macro_f1']:.4f} "
+                          f"in {result['seconds']:.1f}s")
+        finally:
+            shm.close()
+            shm.unlink()
+
+    return summarize(trials, done, folds)
+
+def run_search(folders=FOLDERS, space=SEARCH_SPACE, random_trials=RANDOM_TRIALS, folds=FOLDS, workers=None,
+               threads=THREADS_PER_WORKER, epochs=EPOCHS, results_path=RESULTS_PATH, summary_path=SUMMARY_PATH):
+    """Load the sessions once, run the CV search and save the summary."""
+    from model_training_dl_lstm_gru_v1 import load_in_memory
+
+    X, y = load_in_memory(folders, workers)
+    trials = search_trials(space, random_trials)
+    rows = cross_validate_search(X, y, trials, folds, workers, threads, epochs, results_path=results_path)
+
+    print_summary(rows, list(space))
+    with open(summary_path, 'w') as f:
+        json.dump(rows, f, indent=2)
+    print(f"✅ Saved search summary to: {summary_path}")
+    return rows
+
+# === Entry Point ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stratified k-fold CV and hyperparameter search of the LSTM/GRU model.")
+    parser.add_argument("--folders", nargs=2, metavar=("TRUTHFUL", "DECEPTIVE"), help="Defaults to data/")
+    parser.add_argument("--folds", type=int, default=FOLDS)
+    parser.add_argument("--random", type=int, default=RANDOM_TRIALS, help="Sample this many grid points")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=THREADS_PER_WORKER, help="TensorFlow threads per worker")
+    parser.add_argument("--results", default=RESULTS_PATH)
+    parser.add_argument("--summary", default=SUMMARY_PATH)
+    args = parser.parse_args()
+
+    folders = {args.folders[0]: 0, args.folders[1]: 1} if args.folders else FOLDERS
+    run_search(folders, SEARCH_SPACE, args.random, args.folds, args.workers, args.threads, args.epochs,
+               args.results, args.summary)
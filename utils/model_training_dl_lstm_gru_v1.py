@@ -1,5 +1,4 @@
 import os
-import json
 import numpy as np
 import tensorflow as tf
 from sklearn.model_selection import train_test_split
@@ -7,182 +6,300 @@ from sklearn.metrics import classification_report, f1_score, confusion_matrix
 import matplotlib.pyplot as plt
 import seaborn as sns
 import random
-from sklearn.ensemble import RandomForestClassifier
-import pandas as pd
+from batch_render import finish_figure, use_headless
+import feature_cache
+from feature_cache import UNUSABLE, FeatureCache
+from instrumentation import span
+from input_pipeline import (PAD_VALUE, dataset_bucketed, dataset_from_cache, dataset_from_files, predict_sessions,
+                            predict_with_labels, stratified_split, window_ragged)
+from label_index import labelled_paths
+from parallel_ingest import map_chunks
+from sequence_features import (NUM_FEATURES, SEQUENCE_LENGTH, build_sequence, featurize_labelled_files,
+                               featurize_raw_labelled_files, fit_length)
+from session_archive import SessionArchive
+from summary_features import importance_analysis
+from tflite_export import compare_runtimes, export_tflite, print_report, save_report
 
 # Reproducibility
 SEED = 42
-random.seed(SEED)
-np.random.seed(SEED)
-tf.random.set_seed(SEED)
 
 # Load JSON sequence data
-SEQUENCE_LENGTH = 150
-NUM_FEATURES = 6  # x, y, velocity, acceleration, jerk, curvature
+SESSION_ARCHIVE = "session_archive"  # Packed with session_archive.py, used when present
+FEATURE_CACHE_DIR = feature_cache.FEATURE_CACHE_DIR  # None always re-extracts features
+STREAMING_INPUT = False  # Train from tf.data batches instead of holding X in memory
+BUCKETED_INPUT = False  # Batch by length with masking and window long answers instead of padding to SEQUENCE_LENGTH
+EXPORT_TFLITE = True  # Write best_lstm_gru_model.tflite and check it against the h5
+RF_MAX_SAMPLES = 20000  # Training sequences used for the RandomForest analysis when streaming or bucketing
+SHOW_PLOTS = True  # False only saves the figures, for unattended runs on machines without a display
+
+def load_labelled_sequences(folders, workers=None, cache_dir=FEATURE_CACHE_DIR):
+    """Featurize every JSON file of several labelled folders on a process pool.
+
+    `folders` maps a folder path to its label. Files are taken folder by folder
+    in sorted order, so (X, y) is identical for any number of workers. With a
+    cache_dir, only files missing from the feature cache are featurized.
+    """
+    items = labelled_paths(folders)
+
+    if cache_dir is not None:
+        cache = FeatureCache(cache_dir)
+        try:
+            X, usable = cache.get_sequences([path for path, _ in items], workers)
+        finally:
+            cache.close()
+        return X, np.array([label for _, label in items], dtype=np.int64)[usable]
+
+    chunks = map_chunks(featurize_labelled_files, items, workers)
+    if not chunks:
+        return np.zeros((0, SEQUENCE_LENGTH, NUM_FEATURES)), np.zeros(0, dtype=np.int64)
+    return np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])
+
+def load_sequences_from_folder(folder_path, label, workers=None, cache_dir=FEATURE_CACHE_DIR):
+    return load_labelled_sequences({folder_path: label}, workers, cache_dir)
+
+def load_sequences_from_archive(archive_path, label):
+    """Same sequences as load_sequences_from_folder, sliced from a packed session archive."""
+    archive = SessionArchive(archive_path)
+    fields = ["mouseMovements", "timestamps", "accelerations", "jerks", "curvatures"]
+    columns = {field: archive.ragged(field) for field in fields}
 
-def load_sequences_from_folder(folder_path, label):
     sequences = []
-    labels = []
-    for fname in os.listdir(folder_path):
-        if fname.endswith(".json"):
-            with open(os.path.join(folder_path, fname), 'r') as f:
-                data = json.load(f)
-
-            try:
-                xys = np.array(data['mouseMovements'])
-                ts = np.array(data['timestamps'])
-                acc = np.array(data['accelerations'])
-                jerk = np.array(data['jerks'])
-                curvature = np.array(data['curvatures'])
-            except KeyError as e:
-                print(f"Missing key {e} in {fname}, skipping.")
-                continue
-
-            if len(xys) < 2 or len(ts) < 2:
-                continue
-
-            xys = np.array(xys)
-            ts = np.array(ts)
-            dt = np.diff(ts)
-            dt[dt == 0] = 1e-6
-            velocity = np.linalg.norm(np.diff(xys, axis=0), axis=1) / dt
-            velocity = np.concatenate(([0], velocity))
-
-            seq = np.stack([
-                xys[:, 0],  # x
-                xys[:, 1],  # y
-                velocity,
-                acc,
-                jerk,
-                curvature
-            ], axis=1)
-
-            if seq.shape[0] >= SEQUENCE_LENGTH:
-                seq = seq[:SEQUENCE_LENGTH]
-            else:
-                pad = np.zeros((SEQUENCE_LENGTH - seq.shape[0], seq.shape[1]))
-                seq = np.vstack((seq, pad))
-
-            sequences.append(seq)
-            labels.append(label)
-    return np.array(sequences), np.array(labels)
-
-# Load both truthful and deceptive
-truthful_seq, truthful_labels = load_sequences_from_folder("data/truthful_responses", 0)
-deceptive_seq, deceptive_labels = load_sequences_from_folder("data/deceptive_responses", 1)
-
-X = np.concatenate([truthful_seq, deceptive_seq], axis=0)
-y = np.concatenate([truthful_labels, deceptive_labels], axis=0)
-
-# 70/20/10 split
-X_temp, X_test, y_temp, y_test = train_test_split(X, y, test_size=0.1, stratify=y, random_state=SEED)
-X_train, X_val, y_train, y_val = train_test_split(X_temp, y_temp, test_size=2/9, stratify=y_temp, random_state=SEED)
-
-# Model definition
-inputs = tf.keras.Input(shape=(SEQUENCE_LENGTH, NUM_FEATURES))
-x = tf.keras.layers.LSTM(64, return_sequences=True)(inputs)
-x = tf.keras.layers.GRU(64)(x)
-x = tf.keras.layers.Dense(64, activation='relu')(x)
-x = tf.keras.layers.Dropout(0.3)(x)
-outputs = tf.keras.layers.Dense(1, activation='sigmoid')(x)
-
-model = tf.keras.Model(inputs, outputs)
-model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
-
-# Training
-history = model.fit(
-    X_train, y_train,
-    validation_data=(X_val, y_val),
-    epochs=50,
-    batch_size=32,
-    callbacks=[tf.keras.callbacks.EarlyStopping(patience=5, restore_best_weights=True)]
-)
-
-# Save the best model
-model.save("best_lstm_gru_model.h5")
-print("Model saved as best_lstm_gru_model.h5")
-
-# Evaluation
-y_pred = (model.predict(X_test) > 0.5).astype(int)
-print("\nFinal Evaluation on Test Set")
-print("Macro F1:", f1_score(y_test, y_pred, average='macro'))
-print(classification_report(y_test, y_pred))
-
-# Confusion matrix
-cm = confusion_matrix(y_test, y_pred)
-plt.figure(figsize=(6, 5))
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=['Truthful', 'Deceptive'], yticklabels=['Truthful', 'Deceptive'])
-plt.title("Confusion Matrix")
-plt.xlabel("Predicted Label")
-plt.ylabel("True Label")
-plt.tight_layout()
-plt.savefig("confusion_matrix.png")
-plt.show()
-
-# Training & Validation Loss Plot
-plt.figure(figsize=(8, 5))
-plt.plot(history.history['loss'], label='Train Loss')
-plt.plot(history.history['val_loss'], label='Val Loss')
-plt.title("Training and Validation Loss")
-plt.xlabel("Epoch")
-plt.ylabel("Loss")
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.savefig("training_validation_loss.png")
-plt.show()
-
-# Feature importance from summary statistics using RandomForest
-X_flat = X_train.reshape((X_train.shape[0], -1))
-
-# Create meaningful feature names
-feature_types = ['x', 'y', 'velocity', 'acceleration', 'jerk', 'curvature']
-feature_names = []
-for time_step in range(SEQUENCE_LENGTH):
-    for feat_type in feature_types:
-        feature_names.append(f"{feat_type}_t{time_step}")
-
-rf = RandomForestClassifier(n_estimators=100, random_state=SEED)
-rf.fit(X_flat, y_train)
-importances = rf.feature_importances_
-
-importance_df = pd.DataFrame({"Feature": feature_names, "Importance": importances})
-importance_df = importance_df.sort_values("Importance", ascending=False)
-
-# Get top 10 features
-top_10_features = importance_df.head(10)['Feature'].values
-top_10_indices = [feature_names.index(f) for f in top_10_features]
-
-# Plot feature importance for top 20
-plt.figure(figsize=(12, 6))
-sns.barplot(data=importance_df.head(20), x="Importance", y="Feature")
-plt.title("Top 20 Features by Importance")
-plt.tight_layout()
-plt.savefig("feature_importance.png")
-plt.show()
-
-# Feature Correlation Matrix for top 10 features (triangular version)
-X_top10 = X_flat[:, top_10_indices]
-corr_matrix = np.corrcoef(X_top10, rowvar=False)
-
-# Create mask for upper triangle
-mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
-
-plt.figure(figsize=(10, 8))
-sns.heatmap(corr_matrix, 
-            mask=mask,
-            annot=True, 
-            fmt=".2f", 
-            cmap="coolwarm", 
-            center=0,
-            vmin=-1,
-            vmax=1,
-            xticklabels=top_10_features,
-            yticklabels=top_10_features,
-            square=True)
-plt.title("Feature Correlation Matrix")
-plt.xticks(rotation=45, ha='right')
-plt.yticks(rotation=0)
-plt.tight_layout()
-plt.savefig("feature_correlation_matrix.png")
-plt.show()
+    for i in archive.select(label):
+        xys, ts, acc, jerk, curvature = (values[offsets[i]:offsets[i + 1]]
+                                         for values, offsets in columns.values())
+        if len(xys) < 2 or len(ts) < 2:
+            continue
+        sequences.append(build_sequence(xys, ts, acc, jerk, curvature))
+    return np.array(sequences), np.full(len(sequences), label)
+
+def load_streaming_datasets(folders, workers=None, cache_dir=FEATURE_CACHE_DIR):
+    """Train/val/test tf.data pipelines plus a bounded training sample for the RandomForest.
+
+    With a cache_dir, batches are gathered from the feature cache memmap and
+    the split matches the in-memory one. Without it, every batch is featurized
+    from the JSON files and unusable files drop out inside the pipeline.
+    """
+    items = labelled_paths(folders)
+    paths = np.array([path for path, _ in items])
+    labels = np.array([label for _, label in items], dtype=np.int64)
+
+    if cache_dir is not None:
+        cache = FeatureCache(cache_dir)
+        try:
+            rows = cache.get_rows(paths, workers)
+        finally:
+            cache.close()
+        usable = rows != UNUSABLE
+        rows, labels = rows[usable], labels[usable]
+
+        train, val, test = stratified_split(labels, SEED)
+        datasets = [dataset_from_cache(cache.features, rows[idx], labels[idx], shuffle=idx is train, seed=SEED)
+                    for idx in (train, val, test)]
+        sample = np.sort(train[:RF_MAX_SAMPLES])
+        return datasets, np.asarray(cache.features[rows[sample]]), labels[sample]
+
+    train, val, test = stratified_split(labels, SEED)
+    datasets = [dataset_from_files(paths[idx], labels[idx], shuffle=idx is train, seed=SEED)
+                for idx in (train, val, test)]
+    sample = np.sort(train[:RF_MAX_SAMPLES])
+    X_sample, y_sample = featurize_labelled_files(zip(paths[sample], labels[sample]))
+    return datasets, X_sample, y_sample
+
+def load_raw_sequences(folders, workers=None):
+    """Sequences at their recorded length as a ragged block: (values, offsets, labels)."""
+    chunks = map_chunks(featurize_raw_labelled_files, labelled_paths(folders), workers)
+    if not chunks:
+        return np.zeros((0, NUM_FEATURES)), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    lengths = np.concatenate([c[1] for c in chunks])
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    return np.concatenate([c[0] for c in chunks]), offsets, np.concatenate([c[2] for c in chunks])
+
+def load_bucketed_datasets(folders, workers=None):
+    """Length-bucketed train/val/test pipelines over windows of the raw sequences.
+
+    Answers are split before windowing, so all windows of one answer stay in
+    the same split. The test pipeline carries each window's answer index for
+    predict_sessions. Also returns the test labels per answer and a bounded
+    fixed-length training sample for the RandomForest.
+    """
+    values, offsets, labels = load_raw_sequences(folders, workers)
+    values = tf.constant(values, dtype=tf.float32)
+    train, val, test = stratified_split(labels, SEED)
+
+    datasets = []
+    for idx in (train, val, test):
+        starts, ends, groups = window_ragged(offsets, idx)
+        datasets.append(dataset_bucketed(values, starts, ends, labels[idx][groups],
+                                         groups=groups if idx is test else None,
+                                         shuffle=idx is train, seed=SEED))
+
+    sample = np.sort(train[:RF_MAX_SAMPLES])
+    raw = values.numpy()
+    X_sample = np.array([fit_length(raw[offsets[i]:offsets[i + 1]]) for i in sample])
+    return datasets, labels[test], X_sample.reshape(-1, SEQUENCE_LENGTH, NUM_FEATURES), labels[sample]
+
+def load_in_memory(folders, workers=None):
+    """(X, y) of every session, from the packed archive when there is one."""
+    if os.path.isdir(SESSION_ARCHIVE):
+        truthful_seq, truthful_labels = load_sequences_from_archive(SESSION_ARCHIVE, 0)
+        deceptive_seq, deceptive_labels = load_sequences_from_archive(SESSION_ARCHIVE, 1)
+        X = np.concatenate([truthful_seq, deceptive_seq], axis=0)
+        y = np.concatenate([truthful_labels, deceptive_labels], axis=0)
+        return X, y
+    # One process pool over both folders instead of two sequential passes
+    return load_labelled_sequences(folders, workers)
+
+def build_model(variable_length=False, units=64, dropout=0.3):
+    if variable_length:
+        # Batches are padded with PAD_VALUE only to their longest window; Masking skips the padded steps
+        inputs = tf.keras.Input(shape=(None, NUM_FEATURES))
+        x = tf.keras.layers.Masking(mask_value=PAD_VALUE)(inputs)
+    else:
+        inputs = tf.keras.Input(shape=(SEQUENCE_LENGTH, NUM_FEATURES))
+        x = inputs
+    x = tf.keras.layers.LSTM(units, return_sequences=True)(x)
+    x = tf.keras.layers.GRU(units)(x)
+    x = tf.keras.layers.Dense(units, activation='relu')(x)
+    x = tf.keras.layers.Dropout(dropout)(x)
+    outputs = tf.keras.layers.Dense(1, activation='sigmoid')(x)
+
+    model = tf.keras.Model(inputs, outputs)
+    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+    return model
+
+def main(streaming=STREAMING_INPUT, bucketed=BUCKETED_INPUT, export=EXPORT_TFLITE, show_plots=SHOW_PLOTS):
+    """Train, evaluate and save the model; the arguments default to the settings above."""
+    if not show_plots:
+        use_headless()
+    random.seed(SEED)
+    np.random.seed(SEED)
+    tf.random.set_seed(SEED)
+
+    folders = {
+        "data/truthful_responses": 0,
+        "data/deceptive_responses": 1,
+    }
+    callbacks = [tf.keras.callbacks.EarlyStopping(patience=5, restore_best_weights=True)]
+    model = build_model(variable_length=bucketed)
+
+    if bucketed:
+        (train_ds, val_ds, test_ds), y_test, X_train, y_train = load_bucketed_datasets(folders)
+        with span("fit", sequences=len(X_train)):
+            history = model.fit(train_ds, validation_data=val_ds, epochs=50, callbacks=callbacks)
+    elif streaming:
+        # Only row indices and one prefetched batch at a time are held in memory
+        (train_ds, val_ds, test_ds), X_train, y_train = load_streaming_datasets(folders)
+        with span("fit", sequences=len(X_train)):
+            history = model.fit(train_ds, validation_data=val_ds, epochs=50, callbacks=callbacks)
+    else:
+        # Load both truthful and deceptive
+        X, y = load_in_memory(folders)
+
+        # 70/20/10 split
+        X_temp, X_test, y_temp, y_test = train_test_split(X, y, test_size=0.1, stratify=y, random_state=SEED)
+        X_train, X_val, y_train, y_val = train_test_split(X_temp, y_temp, test_size=2/9, stratify=y_temp, random_state=SEED)
+
+        # Training
+        with span("fit", sequences=len(X_train)):
+            history = model.fit(
+                X_train, y_train,
+                validation_data=(X_val, y_val),
+                epochs=50,
+                batch_size=32,
+                callbacks=callbacks
+            )
+
+    # Save the best model
+    model.save("best_lstm_gru_model.h5")
+    print("Model saved as best_lstm_gru_model.h5")
+
+    # Evaluation
+    with span("predict") as timed:
+        if bucketed:
+            # One prediction per answer: the mean over its windows
+            y_prob = predict_sessions(model, test_ds, len(y_test))
+        elif streaming:
+            y_test, y_prob = predict_with_labels(model, test_ds)
+        else:
+            y_prob = model.predict(X_test).reshape(-1)
+        timed.add(sequences=len(y_prob))
+    y_pred = (y_prob > 0.5).astype(int)
+    print("\nFinal Evaluation on Test Set")
+    print("Macro F1:", f1_score(y_test, y_pred, average='macro'))
+    print(classification_report(y_test, y_pred))
+
+    # Slim inference artifact, checked against the h5 on the same test split
+    if export:
+        export_tflite(model)
+        if bucketed:
+            print("⚠️ Skipped TFLite parity check: the bucketed test split holds windows, not padded sequences")
+        else:
+            if streaming:
+                X_test = np.concatenate([x.numpy() for x, _ in test_ds])
+            report = compare_runtimes(X_test, y_test)
+            print_report(report)
+            save_report(report)
+
+    # Confusion matrix
+    cm = confusion_matrix(y_test, y_pred)
+    plt.figure(figsize=(6, 5))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=['Truthful', 'Deceptive'], yticklabels=['Truthful', 'Deceptive'])
+    plt.title("Confusion Matrix")
+    plt.xlabel("Predicted Label")
+    plt.ylabel("True Label")
+    finish_figure("confusion_matrix.png", show_plots)
+
+    # Training & Validation Loss Plot
+    plt.figure(figsize=(8, 5))
+    plt.plot(history.history['loss'], label='Train Loss')
+    plt.plot(history.history['val_loss'], label='Val Loss')
+    plt.title("Training and Validation Loss")
+    plt.xlabel("Epoch")
+    plt.ylabel("Loss")
+    plt.legend()
+    plt.grid(True)
+    finish_figure("training_validation_loss.png", show_plots)
+
+    # Feature importance from per-sequence summary statistics, using a RandomForest baseline
+    # fitted and permuted on all cores
+    X_summary, importance_df, baseline_f1 = importance_analysis(X_train, y_train)
+    print(f"Summary-feature RandomForest baseline, holdout macro F1: {baseline_f1:.4f}")
+
+    # Get top 10 features
+    top_10_features = importance_df.head(10)['Feature'].values
+    top_10_indices = importance_df.head(10).index.values
+
+    # Plot feature importance for top 20
+    plt.figure(figsize=(12, 6))
+    sns.barplot(data=importance_df.head(20), x="Importance", y="Feature")
+    plt.title("Top 20 Features by Permutation Importance")
+    plt.xlabel("Macro F1 drop when permuted")
+    finish_figure("feature_importance.png", show_plots)
+
+    # Feature Correlation Matrix for top 10 features (triangular version)
+    X_top10 = X_summary[:, top_10_indices]
+    corr_matrix = np.corrcoef(X_top10, rowvar=False)
+
+    # Create mask for upper triangle
+    mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
+
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(corr_matrix, 
+                mask=mask,
+                annot=True, 
+                fmt=".2f", 
+                cmap="coolwarm", 
+                center=0,
+                vmin=-1,
+                vmax=1,
+                xticklabels=top_10_features,
+                yticklabels=top_10_features,
+                square=True)
+    plt.title("Feature Correlation Matrix")
+    plt.xticks(rotation=45, ha='right')
+    plt.yticks(rotation=0)
+    finish_figure("feature_correlation_matrix.png", show_plots)
+
+# === Entry Point ===
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import os
+import json
+import sqlite3
+import argparse
+import numpy as np
+from functools import partial
+from aggregate_manifest import decode_contribution, encode_contribution, file_digest, scan_changes
+from label_index import LABEL_INDEX_PATH, labelled_paths
+from parallel_ingest import imap_chunks, load_json
+
+# === Settings ===
+FOLDERS = {
+    "data/truthful_responses": 0,
+    "data/deceptive_responses": 1,
+}
+DENSITY_INDEX_PATH = "pause_density.sqlite"
+EXTENT = 4096  # Screen pixels covered from the top-left corner; points beyond are clamped to the edge
+BASE_CELLS = 256  # Cells per side at level 0 (16 px); level k has BASE_CELLS >> k, the last one a single cell
+LEVELS = BASE_CELLS.bit_length()
+INCLUDE_SAMPLES = False  # Also bin every mouseMovements sample into a "samples" layer
+LAYERS = ["pauses", "pause_seconds", "samples"]  # Pause count, pause duration and trajectory sample count
+LABEL_NAMES = {0: "Truth", 1: "Lie"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    label INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    contribution BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS grids (
+    label INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    layer TEXT NOT NULL,
+    cells BLOB NOT NULL,
+    PRIMARY KEY (label, question, layer)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# === Helper Functions ===
+
+def density_params(include_samples=INCLUDE_SAMPLES):
+    """Settings that change the binning; an index built with others is rebuilt."""
+    return {"EXTENT": EXTENT, "BASE_CELLS": BASE_CELLS, "INCLUDE_SAMPLES": include_samples}
+
+def cell_ids(points):
+    """Level-0 cell of each (x, y) point, row-major."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    cells = (np.clip(points, 0, EXTENT - 1) * BASE_CELLS // EXTENT).astype(np.int64)
+    return cells[:, 1] * BASE_CELLS + cells[:, 0]
+
+def sparse_sum(cells, weights=None):
+    """Unique cells and the summed weight (or count) of each."""
+    unique, inverse = np.unique(cells, return_inverse=True)
+    return unique, np.bincount(inverse, weights=weights, minlength=len(unique)).astype(np.float64)
+
+def file_cells(file_paths, include_samples=INCLUDE_SAMPLES):
+    """(question, sparse layer cells) of a chunk of session files; the process-pool work unit."""
+    results = []
+    for file_path in file_paths:
+        data = load_json(file_path)
+        pauses = data.get("pausePoints") or []
+        points = [(p.get("x", 0), p.get("y", 0)) for p in pauses]
+        cells = cell_ids(points)
+        contribution = {}
+        contribution["pause_cells"], contribution["pauses"] = sparse_sum(cells)
+        _, contribution["pause_seconds"] = sparse_sum(cells, [p.get("duration", 0) for p in pauses])
+        if include_samples:
+            moves = data.get("mouseMovements") or []
+            contribution["sample_cells"], contribution["samples"] = sparse_sum(cell_ids(moves))
+        results.append((str(data.get("question", "")), contribution))
+    return results
+
+def layer_cells(contribution, layer):
+    cells = contribution.get("sample_cells" if layer == "samples" else "pause_cells")
+    return (cells, contribution[layer]) if layer in contribution else (None, None)
+
+def downsample(grid):
+    """Next pyramid level: every 2 x 2 block summed into one cell."""
+    n = grid.shape[0] // 2
+    return grid.reshape(n, 2, n, 2).sum(axis=(1, 3))
+
+def summed_area(grid):
+    """Integral image with a zero first row and column; any rectangle sums in four lookups."""
+    sat = np.zeros((grid.shape[0] + 1, grid.shape[1] + 1))
+    sat[1:, 1:] = grid.cumsum(axis=0).cumsum(axis=1)
+    return sat
+
+# === Index ===
+
+class PauseDensity:
+    """Pause points binned into per-label, per-question 2-D histograms, queryable as a pyramid.
+
+    Only the level-0 grids are stored, sparsely, next to each file's own
+    sparse contribution, so changed and deleted sessions can be taken back
+    out. Coarser levels and their integral images are built on the first
+    query of a (layer, label, question) and kept in memory; every region
+    query after that costs four lookups.
+    """
+
+    def __init__(self, index_path=DENSITY_INDEX_PATH, include_samples=INCLUDE_SAMPLES):
+        self.index_path = index_path
+        self.include_samples = include_samples
+        self.conn = sqlite3.connect(index_path)
+        self.conn.executescript(SCHEMA)
+        params = json.dumps(density_params(include_samples), sort_keys=True)
+        stored = self.conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if stored is None or stored[0] != params:
+            with self.conn:
+                self.conn.execute("DELETE FROM files")
+                self.conn.execute("DELETE FROM grids")
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('params', ?)", (params,))
+        self._pyramids = {}
+
+    def close(self):
+        self.conn.close()
+
+    def _grid(self, grids, label, question, layer):
+        key = (label, question, layer)
+        if key not in grids:
+            grid = np.zeros(BASE_CELLS * BASE_CELLS)
+            row = self.conn.execute("SELECT cells FROM grids WHERE label = ? AND question = ? AND layer = ?",
+                                    key).fetchone()
+            if row is not None:
+                stored = decode_contribution(row[0])
+                grid[stored["cells"]] = stored["values"]
+            grids[key] = grid
+        return grids[key]
+
+    def _apply(self, grids, label, question, contribution, sign):
+        for layer in LAYERS:
+            cells, values = layer_cells(contribution, layer)
+            if cells is not None:
+                self._grid(grids, label, question, layer)[cells] += sign * values
+
+    def update(self, folders=FOLDERS, workers=None, label_index=LABEL_INDEX_PATH):
+        """Bring the index up to date with every session below folders ({folder: label}).
+
+        Only new, changed and relabelled files are read; deleted ones are
+        retracted. Returns a report of what was ingested.
+        """
+        labels = dict(labelled_paths(folders, label_index))
+        file_paths = sorted(labels)
+        stale, fresh, removed = scan_changes(self.conn, file_paths)
+        changed = {record[0] for record in stale}
+
+        # A file whose label changed in the index is re-binned under its new label
+        stored = dict(self.conn.execute("SELECT path, label FROM files"))
+        for path in file_paths:
+            if path in stored and path not in changed and stored[path] != labels[path]:
+                st = os.stat(path)
+                stale.append((path, st.st_mtime_ns, st.st_size, file_digest(path)))
+                changed.add(path)
+        replaced = [record[0] for record in stale]
+
+        grids = {}
+        with self.conn:
+            for path in removed + [path for path in replaced if path in stored]:
+                label, question, blob = self.conn.execute(
+                    "SELECT label, question, contribution FROM files WHERE path = ?", (path,)).fetchone()
+                self._apply(grids, label, question, decode_contribution(blob), -1)
+            self.conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+            self.conn.executemany("UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                                  [(mtime_ns, size, path) for path, mtime_ns, size, _ in fresh])
+
+            results = (r for chunk in imap_chunks(partial(file_cells, include_samples=self.include_samples),
+                                                  replaced, workers) for r in chunk)
+            for (path, mtime_ns, size, digest), (question, contribution) in zip(stale, results):
+                self._apply(grids, labels[path], question, contribution, 1)
+                self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  (path, mtime_ns, size, digest, labels[path], question,
+                                   encode_contribution(contribution)))
+
+            for (label, question, layer), grid in grids.items():
+                grid[np.abs(grid) < 1e-9] = 0  # Rounding left over from retracted durations
+                cells = np.flatnonzero(grid)
+                self.conn.execute("INSERT OR REPLACE INTO grids VALUES (?, ?, ?, ?)",
+                                  (label, question, layer, encode_contribution({"cells": cells,
+                                                                                 "values": grid[cells]})))
+        self._pyramids.clear()
+        return {"files": len(file_paths), "ingested": len(stale), "removed": len(removed),
+                "unchanged": len(file_paths) - len(stale)}
+
+    def groups(self):
+        """(label, question) of every group in the index."""
+        return self.conn.execute("SELECT DISTINCT label, question FROM grids ORDER BY label, question").fetchall()
+
+    def pyramid(self, layer="pauses", label=None, question=None):
+        """Grids and integral images of every level for one layer, summed over the matching groups."""
+        key = (layer, label, question)
+        if key not in self._pyramids:
+            sql, args = "SELECT cells FROM grids WHERE layer = ?", [layer]
+            if label is not None:
+                sql, args = sql + " AND label = ?", args + [label]
+            if question is not None:
+                sql, args = sql + " AND question = ?", args + [question]
+            grid = np.zeros(BASE_CELLS * BASE_CELLS)
+            for (blob,) in self.conn.execute(sql, args):
+                stored = decode_contribution(blob)
+                grid[stored["cells"]] += stored["values"]
+            levels = [grid.reshape(BASE_CELLS, BASE_CELLS)]
+            while len(levels) < LEVELS:
+                levels.append(downsample(levels[-1]))
+            self._pyramids[key] = (levels, [summed_area(level) for level in levels])
+        return self._pyramids[key]
+
+    def density(self, layer="pauses", label=None, question=None, level=0):
+        """The (rows, cols) histogram at a zoom level; cells are EXTENT / (BASE_CELLS >> level) px wide."""
+        return self.pyramid(layer, label, question)[0][level]
+
+    def query(self, region, layer="pauses", label=None, question=None, level=0):
+        """Total of a layer inside region = (x0, y0, x1, y1) in px, at a level's cell resolution.
+
+        Cells the region only partly covers count fully, so coarser levels
+        answer for a slightly larger area.
+        """
+        sat = self.pyramid(layer, label, question)[1][level]
+        n = sat.shape[0] - 1
+        size = EXTENT / n
+        x0, y0, x1, y1 = region
+        c0, r0 = (int(np.clip(np.floor(v / size), 0, n)) for v in (x0, y0))
+        c1, r1 = (int(np.clip(np.ceil(v / size), 0, n)) for v in (x1, y1))
+        return float(sat[r1, c1] - sat[r0, c1] - sat[r1, c0] + sat[r0, c0])
+
+# === Heatmaps ===
+
+def crop(grid, region, level):
+    """Cells of a level's grid inside region, and the region's extent in px for imshow."""
+    n = grid.shape[0]
+    size = EXTENT / n
+    x0, y0, x1, y1 = region or (0, 0, EXTENT, EXTENT)
+    c0, r0 = int(np.clip(x0 // size, 0, n - 1)), int(np.clip(y0 // size, 0, n - 1))
+    c1, r1 = int(np.clip(np.ceil(x1 / size), c0 + 1, n)), int(np.clip(np.ceil(y1 / size), r0 + 1, n))
+    return grid[r0:r1, c0:c1], (c0 * size, c1 * size, r1 * size, r0 * size)
+
+def plot_heatmap(index, layer="pauses", label=None, question=None, level=2, region=(0, 0, 1920, 1080),
+                 output_path=None, show=True, title=None):
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+    from batch_render import finish_figure
+
+    cells, extent = crop(index.density(layer, label, question, level), region, level)
+    plt.figure(figsize=(10, 6))
+    plt.imshow(np.where(cells > 0, cells, np.nan), extent=extent, cmap="magma", norm=LogNorm(), interpolation="nearest")
+    plt.colorbar(label=layer)
+    plt.title(title or f"{layer.replace('_', ' ').capitalize()} density ({LABEL_NAMES.get(label, 'all')})")
+    plt.xlabel("X position")
+    plt.ylabel("Y position")
+    finish_figure(output_path, show)
+
+def plot_label_comparison(index, layer="pauses", question=None, level=2, region=(0, 0, 1920, 1080),
+                          output_path=None, show=True):
+    """Truth and lie densities, each normalised to its total, and their difference."""
+    import matplotlib.pyplot as plt
+    from batch_render import finish_figure
+
+    shares = []
+    for label in LABEL_NAMES:
+        cells, extent = crop(index.density(layer, label, question, level), region, level)
+        total = index.density(layer, label, question, level).sum()
+        shares.append(cells / total if total else cells)
+
+    fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+    vmax = max(share.max() for share in shares) or 1
+    for ax, share, name in zip(axes, shares, LABEL_NAMES.values()):
+        image = ax.imshow(share, extent=extent, cmap="magma", vmin=0, vmax=vmax, interpolation="nearest")
+        ax.set_title(f"{name}: share of {layer.replace('_', ' ')}")
+        fig.colorbar(image, ax=ax, shrink=0.8)
+    difference = shares[1] - shares[0]
+    limit = np.abs(difference).max() or 1
+    image = axes[2].imshow(difference, extent=extent, cmap="coolwarm", vmin=-limit, vmax=limit, interpolation="nearest")
+    axes[2].set_title("Lie - Truth")
+    fig.colorbar(image, ax=axes[2], shrink=0.8)
+    plt.suptitle(question or "All questions")
+    finish_figure(output_path, show)
+
+# === Entry Point ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pause-point density pyramid: update, query regions, draw heatmaps.")
+    parser.add_argument("--index", default=DENSITY_INDEX_PATH)
+    parser.add_argument("--folders", nargs=2, metavar=("TRUTHFUL", "DECEPTIVE"), help="Defaults to data/")
+    parser.add_argument("--no-update", action="store_true", help="Query the index as it is")
+    parser.add_argument("--samples", action="store_true", help="Also bin every trajectory sample")
+    parser.add_argument("--layer", choices=LAYERS, default="pauses")
+    parser.add_argument("--label", type=int, choices=list(LABEL_NAMES))
+    parser.add_argument("--question")
+    parser.add_argument("--level", type=int, default=2, help=f"Zoom level, 0 (finest) to {LEVELS - 1}")
+    parser.add_argument("--region", type=float, nargs=4, metavar=("X0", "Y0", "X1", "Y1"), default=(0, 0, 1920, 1080))
+    parser.add_argument("--heatmap", help="Save a heatmap of the selection to this PNG")
+    parser.add_argument("--compare", help="Save the truth/lie comparison to this PNG")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    index = PauseDensity(args.index, INCLUDE_SAMPLES or args.samples)
+    try:
+        if not args.no_update:
+            report = index.update({args.folders[0]: 0, args.folders[1]: 1} if args.folders else FOLDERS, args.workers)
+            print(f"Ingested {report['ingested']}, removed {report['removed']}, "
+                  f"reused {report['unchanged']} of {report['files']} files.")
+        for label in [args.label] if args.label is not None else LABEL_NAMES:
+            total = index.query(args.region, args.layer, label, args.question, args.level)
+            print(f"{LABEL_NAMES[label]}: {total:.1f} {args.layer} in {tuple(args.region)}")
+        if args.heatmap or args.compare:
+            from batch_render import use_headless
+            use_headless()
+        if args.heatmap:
+            plot_heatmap(index, args.layer, args.label, args.question, args.level, args.region, args.heatmap, show=False)
+            print(f"✅ Saved heatmap to: {args.heatmap}")
+        if args.compare:
+            plot_label_comparison(index, args.layer, args.question, args.level, args.region, args.compare, show=False)
+            print(f"✅ Saved comparison to: {args.compare}")
+    finally:
+        index.close()
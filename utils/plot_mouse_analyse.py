@@ -2,6 +2,8 @@ import json
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.ndimage import gaussian_filter1d
+from batch_render import finish_figure
+from resample import downsample_path, lttb_indices
 
 # === Loaders ===
 def load_array(filepath, key):
@@ -9,34 +11,49 @@ def load_array(filepath, key):
         data = json.load(f)
     return data.get(key, [])
 
+def load_band(filepath, key):
+    """Lower and upper confidence band saved by calc_averages, or None if absent."""
+    with open(filepath, 'r') as f:
+        data = json.load(f)
+    if f"{key}Lower" not in data or f"{key}Upper" not in data:
+        return None
+    return data[f"{key}Lower"], data[f"{key}Upper"]
+
 def load_mouse_movements(filepath):
     with open(filepath, 'r') as f:
         data = json.load(f)
     return np.array(data.get("mouseMovements", []))
 
 # === Plotters ===
-def plot_series_comparison(series_lie, series_truth, title, ylabel, filename, sigma=2):
+def plot_series_comparison(series_lie, series_truth, title, ylabel, filename, sigma=2,
+                           band_lie=None, band_truth=None, show=True, max_points=None):
     min_len = min(len(series_lie), len(series_truth))
     x = np.arange(min_len)
-    series_lie = gaussian_filter1d(series_lie[:min_len], sigma=sigma)
-    series_truth = gaussian_filter1d(series_truth[:min_len], sigma=sigma)
 
     plt.figure(figsize=(12, 5))
-    plt.plot(x, series_lie, label="Lie", color="red", alpha=0.8)
-    plt.plot(x, series_truth, label="Truth", color="blue", alpha=0.8)
+    for series, band, label, color in ((series_lie, band_lie, "Lie", "red"),
+                                       (series_truth, band_truth, "Truth", "blue")):
+        series = gaussian_filter1d(np.asarray(series[:min_len], dtype=float), sigma=sigma)
+        # Long series keep only the LTTB points of the mean, its band follows them
+        kept = lttb_indices(np.column_stack((x, series)), max_points) if max_points else x
+        plt.plot(x[kept], series[kept], label=label, color=color, alpha=0.8)
+
+        # Optional confidence bands, smoothed like the mean they surround
+        if band is not None:
+            lower = gaussian_filter1d(np.asarray(band[0][:min_len], dtype=float), sigma=sigma)
+            upper = gaussian_filter1d(np.asarray(band[1][:min_len], dtype=float), sigma=sigma)
+            plt.fill_between(x[kept], lower[kept], upper[kept], color=color, alpha=0.15, linewidth=0)
     plt.title(f"{title} Over Time")
     plt.xlabel("Time Step")
     plt.ylabel(ylabel)
     plt.grid(True)
     plt.legend()
-    plt.tight_layout()
-    plt.savefig(filename)
-    plt.show()
+    finish_figure(filename, show)
 
-def plot_mouse_path_comparison(path_lie, path_truth, filename):
+def plot_mouse_path_comparison(path_lie, path_truth, filename, show=True, max_points=None):
     min_len = min(len(path_lie), len(path_truth))
-    path_lie = np.array(path_lie[:min_len])
-    path_truth = np.array(path_truth[:min_len])
+    path_lie = downsample_path(path_lie[:min_len], max_points)
+    path_truth = downsample_path(path_truth[:min_len], max_points)
 
     plt.figure(figsize=(8, 6))
     plt.plot(path_lie[:, 0], path_lie[:, 1], label="Lie", color="red", alpha=0.8)
@@ -47,9 +64,7 @@ def plot_mouse_path_comparison(path_lie, path_truth, filename):
     plt.gca().invert_yaxis()
     plt.grid(True)
     plt.legend()
-    plt.tight_layout()
-    plt.savefig(filename)
-    plt.show()
+    finish_figure(filename, show)
 
 # === Main ===
 if __name__ == "__main__":
@@ -59,14 +74,17 @@ if __name__ == "__main__":
     # Acceleration
     lie_acc = load_array(lie_file, "accelerations")
     truth_acc = load_array(truth_file, "accelerations")
-    plot_series_comparison(lie_acc, truth_acc, "Acceleration", "Acceleration", "averaged_charts/acceleration_comparison.png")
+    plot_series_comparison(lie_acc, truth_acc, "Acceleration", "Acceleration", "averaged_charts/acceleration_comparison.png",
+                           band_lie=load_band(lie_file, "accelerations"), band_truth=load_band(truth_file, "accelerations"))
 
     # Curvature
     lie_curv = load_array(lie_file, "curvatures")
     truth_curv = load_array(truth_file, "curvatures")
-    plot_series_comparison(lie_curv, truth_curv, "Curvature", "Curvature", "averaged_charts/curvature_comparison.png")
+    plot_series_comparison(lie_curv, truth_curv, "Curvature", "Curvature", "averaged_charts/curvature_comparison.png",
+                           band_lie=load_band(lie_file, "curvatures"), band_truth=load_band(truth_file, "curvatures"))
 
     # Jerk
     lie_jerk = load_array(lie_file, "jerks")
     truth_jerk = load_array(truth_file, "jerks")
-    plot_series_comparison(lie_jerk, truth_jerk, "Jerk", "Jerk", "averaged_charts/jerk_comparison.png")
+    plot_series_comparison(lie_jerk, truth_jerk, "Jerk", "Jerk", "averaged_charts/jerk_comparison.png",
+                           band_lie=load_band(lie_file, "jerks"), band_truth=load_band(truth_file, "jerks"))
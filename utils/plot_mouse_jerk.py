@@ -2,42 +2,48 @@ import json
 import os
 import matplotlib.pyplot as plt
 import numpy as np
+from resample import downsample_series
 
 # === Optional smoothing
-plt.style.use("default")  # Reset to clean default
-
 def smooth(data, window_size=3):  # Less aggressive smoothing
     return np.convolve(data, np.ones(window_size)/window_size, mode='same')
 
-def plot_jerk_from_json(jerks, jerk_spike_count, output_path):
+def plot_jerk_from_json(jerks, jerk_spike_count, output_path, max_points=None, population_threshold=None):
+    jerks = np.asarray(jerks, dtype=np.float64)
+    abs_jerks = np.abs(jerks)
     smoothed_jerk = smooth(jerks)
 
     # Print jerk values around step 20 for debugging
     print("Jerk values 15–25:", jerks[15:26])
 
     # Try multiple threshold methods
-    mean_abs_jerk = np.mean([abs(j) for j in jerks])
+    mean_abs_jerk = abs_jerks.mean()
     dynamic_threshold_mean = min(max(mean_abs_jerk * 4, 400000), 1000000)
-    dynamic_threshold_percentile = np.percentile(np.abs(jerks), 95)
+    dynamic_threshold_percentile = np.percentile(abs_jerks, 95)
     fixed_threshold = 20000
 
-    # Choose the lowest of all thresholds for sensitivity
-    dynamic_threshold = min(dynamic_threshold_mean, dynamic_threshold_percentile, fixed_threshold)
+    # Choose the lowest of all thresholds for sensitivity, unless a corpus-wide one
+    # (population_thresholds.py) is given so spikes compare across participants
+    if population_threshold is not None:
+        dynamic_threshold = population_threshold
+    else:
+        dynamic_threshold = min(dynamic_threshold_mean, dynamic_threshold_percentile, fixed_threshold)
     print("Final dynamic threshold:", dynamic_threshold)
 
     # Detect spike locations based on dynamic threshold
-    spike_indices = [i for i, val in enumerate(jerks) if abs(val) >= dynamic_threshold]
-    spike_values = [smoothed_jerk[i] for i in spike_indices]
+    spike_indices = np.flatnonzero(abs_jerks >= dynamic_threshold)
+    spike_values = smoothed_jerk[spike_indices]
 
     # Plot jerk curve
+    plt.style.use("default")  # Reset to clean default
     plt.figure(figsize=(10, 4), dpi=150)
-    plt.plot(smoothed_jerk, linestyle='-', linewidth=2, color='red', label="Jerk")
+    plt.plot(*downsample_series(smoothed_jerk, max_points), linestyle='-', linewidth=2, color='red', label="Jerk")
 
     # Add threshold line
     plt.axhline(dynamic_threshold, color='gray', linestyle='--', linewidth=1, label='Threshold')
 
     # Mark spikes
-    if spike_indices:
+    if len(spike_indices):
         plt.scatter(spike_indices, spike_values, color='blue', label='Detected Spikes', zorder=5)
         for i in spike_indices:
             plt.axvline(x=i, color='red', linestyle=':', alpha=0.3)
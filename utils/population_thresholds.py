@@ -0,0 +1,159 @@
+import csv
+import json
+import argparse
+import numpy as np
+from functools import partial
+from kinematics import compute_kinematics, session_ids
+from label_index import LABEL_INDEX_PATH, labelled_paths
+from parallel_ingest import imap_chunks, load_json
+from quantile_sketch import KLLSketch
+from resample import to_ragged
+
+# === Settings ===
+FOLDERS = {
+    "data/truthful_responses": 0,
+    "data/deceptive_responses": 1,
+}
+FIELDS = ["abs_jerk", "acceleration", "curvature", "speed"]  # Jerk is sketched by magnitude, as spikes are
+SPIKE_QUANTILE = 0.95  # Population |jerk| quantile a spike must exceed
+SPIKE_GROUP = "all"  # Sketch group the threshold comes from: "all", "label:0", "question:..."
+SKETCHES_PATH = "population_quantiles.json"
+SPIKES_PATH = "population_spikes.csv"
+REPORT_QUANTILES = [0.5, 0.9, 0.95, 0.99]
+
+# === Helper Functions ===
+
+def field_values(records):
+    """Ragged values of every FIELDS series over a batch of parsed sessions: {field: (values, offsets)}."""
+    jerks = to_ragged([data.get("jerks") or [] for data in records])
+    values = {
+        "abs_jerk": (np.abs(jerks[0]), jerks[1]),
+        "acceleration": to_ragged([data.get("accelerations") or [] for data in records]),
+        "curvature": to_ragged([data.get("curvatures") or [] for data in records]),
+    }
+
+    # Speeds are not stored, they are recomputed per event as script.js does
+    moves = [np.asarray(data.get("mouseMovements") or [], dtype=np.float64).reshape(-1, 2) for data in records]
+    times = [np.asarray(data.get("timestamps") or [], dtype=np.float64) for data in records]
+    usable = [len(m) == len(t) for m, t in zip(moves, times)]
+    positions, offsets = to_ragged([m if ok else np.zeros((0, 2)) for m, ok in zip(moves, usable)])
+    timestamps, _ = to_ragged([t if ok else np.zeros(0) for t, ok in zip(times, usable)])
+    speeds = compute_kinematics(positions.reshape(-1, 2), timestamps, offsets)["speeds"]
+    speeds[offsets[:-1][np.diff(offsets) > 0]] = np.nan  # The first event measures from (0, 0), not a move
+    values["speed"] = (np.where(np.isfinite(speeds), speeds, np.nan), offsets)
+    return values
+
+def group_names(label, question, by_question=True):
+    names = ["all", f"label:{label}"]
+    if by_question and question is not None:
+        names.append(f"question:{question}")
+    return names
+
+def sketch_files(items, by_question=True):
+    """Sketches of a chunk of (file_path, label) pairs per group and field; the process-pool work unit."""
+    records = [load_json(file_path) for file_path, _ in items]
+    values = field_values(records)
+    ids = {field: session_ids(offsets) for field, (_, offsets) in values.items()}
+
+    members = {}
+    for i, ((_, label), data) in enumerate(zip(items, records)):
+        for name in group_names(label, data.get("question"), by_question):
+            members.setdefault(name, np.zeros(len(items), dtype=bool))[i] = True
+
+    groups = {}
+    for name, member in members.items():
+        groups[name] = {field: KLLSketch().update(series[member[ids[field]]])
+                        for field, (series, _) in values.items()}
+    return groups
+
+def merge_sketches(total, partial_result):
+    for name, fields in partial_result.items():
+        target = total.setdefault(name, {})
+        for field, sketch in fields.items():
+            if field in target:
+                target[field].merge(sketch)
+            else:
+                target[field] = sketch
+    return total
+
+# === Main Functions ===
+
+def build_population_sketches(folders=FOLDERS, workers=None, label_index=LABEL_INDEX_PATH, by_question=True):
+    """One pass over every session: {group: {field: KLLSketch}}, chunks sketched on a process pool."""
+    items = labelled_paths(folders, label_index)
+    total = {}
+    for partial_result in imap_chunks(partial(sketch_files, by_question=by_question), items, workers):
+        merge_sketches(total, partial_result)
+    return total
+
+def save_sketches(sketches, output_path=SKETCHES_PATH):
+    state = {name: {field: sketch.to_state() for field, sketch in fields.items()} for name, fields in sketches.items()}
+    with open(output_path, 'w') as f:
+        json.dump(state, f)
+    print(f"✅ Saved population quantile sketches to: {output_path}")
+
+def load_sketches(input_path=SKETCHES_PATH):
+    with open(input_path, 'r') as f:
+        state = json.load(f)
+    return {name: {field: KLLSketch.from_state(s) for field, s in fields.items()} for name, fields in state.items()}
+
+def population_threshold(sketches, group=SPIKE_GROUP, quantile=SPIKE_QUANTILE):
+    return float(sketches[group]["abs_jerk"].quantile(quantile))
+
+def spike_counts(jerks, offsets, threshold):
+    """Jerk spikes per session of a ragged batch against one population threshold."""
+    above = np.abs(np.asarray(jerks, dtype=np.float64)) > threshold
+    return np.bincount(session_ids(offsets), weights=above, minlength=len(offsets) - 1).astype(np.int64)
+
+def spike_rows(items, threshold):
+    """(file, label, client jerkSpikeCount, population spike count) of a chunk; the process-pool work unit."""
+    records = [load_json(file_path) for file_path, _ in items]
+    jerks, offsets = to_ragged([data.get("jerks") or [] for data in records])
+    counts = spike_counts(jerks, offsets, threshold)
+    return [(file_path, label, data.get("jerkSpikeCount"), int(count))
+            for (file_path, label), data, count in zip(items, records, counts)]
+
+def recompute_spike_counts(threshold, folders=FOLDERS, output_path=SPIKES_PATH, workers=None,
+                           label_index=LABEL_INDEX_PATH):
+    """Count every session's jerk spikes against the population threshold and write them to a CSV."""
+    items = labelled_paths(folders, label_index)
+    rows = 0
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "label", "jerkSpikeCount", "populationSpikeCount"])
+        for chunk in imap_chunks(partial(spike_rows, threshold=threshold), items, workers):
+            writer.writerows(chunk)
+            rows += len(chunk)
+    print(f"✅ Saved population spike counts of {rows} sessions to: {output_path}")
+    return rows
+
+def print_quantiles(sketches, groups=None):
+    print(f"{'group':<28}{'field':<14}{'count':>10}" + "".join(f"{f'p{q * 100:g}':>14}" for q in REPORT_QUANTILES))
+    for name in groups or sorted(sketches):
+        for field, sketch in sketches[name].items():
+            values = "".join(f"{value:>14.4g}" for value in np.atleast_1d(sketch.quantile(REPORT_QUANTILES)))
+            print(f"{name[:27]:<28}{field:<14}{sketch.count:>10}{values}")
+
+# === Entry Point ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Corpus quantile sketches and jerk spikes against population thresholds.")
+    parser.add_argument("--folders", nargs=2, metavar=("TRUTHFUL", "DECEPTIVE"), help="Defaults to data/")
+    parser.add_argument("--sketches", default=SKETCHES_PATH)
+    parser.add_argument("--reuse", action="store_true", help="Load the saved sketches instead of rebuilding them")
+    parser.add_argument("--group", default=SPIKE_GROUP, help='Threshold group, e.g. "all" or "label:0"')
+    parser.add_argument("--quantile", type=float, default=SPIKE_QUANTILE)
+    parser.add_argument("--output", default=SPIKES_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    folders = {args.folders[0]: 0, args.folders[1]: 1} if args.folders else FOLDERS
+    if args.reuse:
+        sketches = load_sketches(args.sketches)
+    else:
+        sketches = build_population_sketches(folders, args.workers)
+        save_sketches(sketches, args.sketches)
+    print_quantiles(sketches, [name for name in sorted(sketches) if not name.startswith("question:")])
+
+    threshold = population_threshold(sketches, args.group, args.quantile)
+    print(f"Population |jerk| threshold (p{args.quantile * 100:g} of {args.group}): {threshold:.4g}")
+    recompute_spike_counts(threshold, folders, args.output, args.workers)
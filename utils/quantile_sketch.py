@@ -0,0 +1,115 @@
+import numpy as np
+
+# === Settings ===
+SKETCH_K = 400  # Top compactor size; rank error is roughly 1.7 / SKETCH_K
+CAPACITY_DECAY = 2 / 3  # Each lower compactor holds this fraction of the one above
+
+class KLLSketch:
+    """Bounded-memory quantile sketch of a stream of values (Karnin, Lang and Liberty).
+
+    Values enter compactor 0; a full compactor is sorted and every other
+    item, from a random start, moves up a level with twice the weight. The
+    sketch holds O(k log(n / k)) values however many are folded in, and
+    sketches built over separate chunks merge into one over all of them.
+    Count, min and max stay exact.
+    """
+
+    def __init__(self, k=SKETCH_K, seed=0):
+        self.k = k
+        self.seed = seed
+        self.compactions = 0  # Drives the coin flips, so a restored sketch continues the same sequence
+        self.levels = [np.zeros(0)]
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * CAPACITY_DECAY ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.zeros(0))
+                items = np.sort(self.levels[level])
+                keep = items[len(items) - len(items) % 2:]  # An odd item out stays behind
+                start = np.random.default_rng([self.seed, self.compactions]).integers(2)
+                self.levels[level + 1] = np.concatenate((self.levels[level + 1], items[start:len(items) - len(keep):2]))
+                self.levels[level] = keep
+                self.compactions += 1
+            level += 1
+
+    def update(self, values):
+        """Fold a batch of values in, NaN is skipped."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = values.min() if self.min is None else min(self.min, values.min())
+        self.max = values.max() if self.max is None else max(self.max, values.max())
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch's values into this one."""
+        if not other.count:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.zeros(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate((self.levels[level], items))
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.compactions += other.compactions
+        self._compress()
+        return self
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(held), 2.0 ** level) for level, held in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """Approximate value at quantile q (scalar or array in [0, 1]); q = 0 and 1 are exact."""
+        q = np.asarray(q, dtype=np.float64)
+        if not self.count:
+            return np.full(q.shape, np.nan)[()]
+        items, cumulative = self._weighted()
+        index = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        values = items[np.minimum(index, len(items) - 1)]
+        values = np.where(q <= 0, self.min, np.where(q >= 1, self.max, values))
+        return values[()]
+
+    def rank(self, values):
+        """Approximate fraction of the stream at or below each value."""
+        values = np.asarray(values, dtype=np.float64)
+        if not self.count:
+            return np.full(values.shape, np.nan)[()]
+        items, cumulative = self._weighted()
+        index = np.searchsorted(items, values, side="right")
+        below = np.where(index > 0, cumulative[np.maximum(index - 1, 0)], 0)
+        return (below / cumulative[-1])[()]
+
+    @property
+    def size(self):
+        """Values held, the sketch's memory in float64s."""
+        return sum(len(items) for items in self.levels)
+
+    def to_state(self):
+        """JSON-serializable snapshot, restored with from_state."""
+        return {"k": self.k, "seed": self.seed, "compactions": self.compactions, "count": self.count,
+                "min": self.min, "max": self.max, "levels": [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state["k"], state["seed"])
+        sketch.compactions, sketch.count = state["compactions"], state["count"]
+        sketch.min, sketch.max = state["min"], state["max"]
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in state["levels"]]
+        return sketch
@@ -0,0 +1,199 @@
+import numpy as np
+from instrumentation import count, traced
+
+# === Settings ===
+INTERPOLATION_POINTS = 100
+CHUNK_SIZE = 4096  # Trajectories per cubic solve, bounds the padded work arrays
+
+# === Helper Functions ===
+
+def to_point_array(array):
+    """Convert one JSON series to a float array, {"x": ..., "y": ...} dicts become [x, y]."""
+    if len(array) and isinstance(array[0], dict):
+        array = [[pt["x"], pt["y"]] for pt in array]
+    return np.asarray(array, dtype=np.float64)
+
+def to_ragged(arrays):
+    """Concatenate a list of sequences into a ragged (values, offsets) pair."""
+    arrays = [to_point_array(arr) for arr in arrays]
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([len(arr) for arr in arrays], out=offsets[1:])
+
+    # Empty entries parse as shape (0,), give them the width of the others
+    row_shape = next((arr.shape[1:] for arr in arrays if len(arr)), ())
+    arrays = [arr if len(arr) else arr.reshape((0,) + row_shape) for arr in arrays]
+    if not arrays:
+        return np.zeros(0), offsets
+    return np.concatenate(arrays), offsets
+
+def _segment_positions(lengths, target_len):
+    """Left sample index and fractional position of every output point."""
+    grid = np.linspace(0, 1, target_len)
+    pos = grid[None, :] * (lengths[:, None] - 1)
+    left = np.minimum(pos.astype(np.int64), lengths[:, None] - 2)
+    return left, pos - left
+
+def _resample_linear(values, starts, lengths, target_len):
+    left, frac = _segment_positions(lengths, target_len)
+    idx = starts[:, None] + left
+    frac = frac[..., None]
+    return values[idx] * (1 - frac) + values[idx + 1] * frac
+
+def _resample_cubic(values, starts, lengths, target_len):
+    """Not-a-knot cubic spline on a uniform grid, identical to scipy's CubicSpline.
+
+    With equal spacing the not-a-knot conditions fix M[1] and M[L-2] directly,
+    leaving a (1, 4, 1) tridiagonal system for the interior second derivatives.
+    Its forward-sweep coefficients depend only on the row, so one Thomas pass
+    solves every trajectory of the chunk at once. The chunk must be sorted by
+    length.
+    """
+    m, max_len = len(starts), int(lengths.max())
+    rows = np.arange(m)
+    cols = np.minimum(np.arange(max_len)[None, :], lengths[:, None] - 1)
+    y = values[starts[:, None] + cols]  # Padded by repeating the last sample
+
+    h = 1.0 / (lengths - 1)
+    r = np.zeros_like(y)
+    r[:, 1:-1] = (y[:, :-2] - 2 * y[:, 1:-1] + y[:, 2:]) * (6 / h ** 2)[:, None, None]
+
+    M = np.zeros_like(y)
+    first = r[:, 1] / 6
+    last = r[rows, lengths - 2] / 6
+
+    # Interior unknowns M[2] .. M[L-3]
+    unknowns = np.maximum(lengths - 4, 0)
+    size = int(unknowns.max())
+    if size:
+        # Row-major (k, m, d) layout keeps every sweep step contiguous
+        d = np.ascontiguousarray(r[:, 2:2 + size].swapaxes(0, 1))
+        k = np.arange(size)[:, None]
+        d[k >= unknowns[None, :]] = 0
+        has = (unknowns > 0)[:, None]
+        d[0] -= np.where(has, first, 0)
+        d[np.maximum(unknowns - 1, 0), rows] -= np.where(has, last, 0)
+
+        c = np.empty(size)
+        c[0] = 0.25
+        d[0] /= 4
+        for i in range(1, size):
+            denom = 4 - c[i - 1]
+            c[i] = 1 / denom
+            d[i] -= d[i - 1]
+            d[i] /= denom
+
+        # Rows past a trajectory's own system stay zero; sorting makes them a prefix
+        done = np.searchsorted(unknowns, np.arange(size), side="right")
+        x = np.zeros((size + 1,) + d.shape[1:])
+        for i in range(size - 1, -1, -1):
+            np.multiply(x[i + 1], -c[i], out=x[i])
+            x[i] += d[i]
+            x[i][:done[i]] = 0
+        M[:, 2:2 + size] = x[:size].swapaxes(0, 1)
+    M[:, 1] = first
+    M[rows, lengths - 2] = last
+
+    # Not-a-knot ends; three points collapse to a single parabola
+    three = lengths == 3
+    M[:, 0] = np.where(three[:, None], M[:, 1], 2 * M[:, 1] - M[:, 2])
+    end = np.maximum(lengths - 3, 0)
+    M[rows, lengths - 1] = np.where(three[:, None], M[:, 1],
+                                    2 * M[rows, lengths - 2] - M[rows, end])
+
+    left, s = _segment_positions(lengths, target_len)
+    s = s[..., None]
+    y0 = np.take_along_axis(y, left[..., None], axis=1)
+    y1 = np.take_along_axis(y, left[..., None] + 1, axis=1)
+    m0 = np.take_along_axis(M, left[..., None], axis=1)
+    m1 = np.take_along_axis(M, left[..., None] + 1, axis=1)
+    hh = (h ** 2 / 6)[:, None, None]
+    return (1 - s) * y0 + s * y1 + hh * (((1 - s) ** 3 - (1 - s)) * m0 + (s ** 3 - s) * m1)
+
+# === Main Function ===
+
+@traced("resample")
+def resample_ragged(values, offsets, target_len=INTERPOLATION_POINTS, kind="cubic", min_cubic_points=3):
+    """Resample every entry of a ragged array to `target_len` evenly spaced points.
+
+    values is (N,) or (N, d) and offsets has one entry more than there are
+    trajectories. Returns (n, target_len) or (n, target_len, d). kind is
+    "linear" or "cubic"; entries shorter than min_cubic_points fall back to
+    linear. Single-point entries are repeated and empty entries come back as NaN.
+    """
+    if kind not in ("linear", "cubic"):
+        raise ValueError(f"Unknown resampling kind: {kind}")
+
+    values = np.asarray(values, dtype=np.float64)
+    flat = values.reshape(len(values), -1) if len(values) else values.reshape(0, int(np.prod(values.shape[1:])) or 1)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    count(sequences=len(lengths), points=int(lengths.sum()))
+
+    out = np.full((len(lengths), target_len, flat.shape[1]), np.nan)
+
+    single = np.flatnonzero(lengths == 1)
+    out[single] = flat[starts[single]][:, None, :]
+
+    cubic = lengths >= max(min_cubic_points, 3) if kind == "cubic" else np.zeros(len(lengths), dtype=bool)
+    linear = np.flatnonzero((lengths >= 2) & ~cubic)
+    if len(linear):
+        out[linear] = _resample_linear(flat, starts[linear], lengths[linear], target_len)
+
+    # Sort by length so each chunk pads to a similar size
+    cubic = np.flatnonzero(cubic)
+    cubic = cubic[np.argsort(lengths[cubic], kind="stable")]
+    for i in range(0, len(cubic), CHUNK_SIZE):
+        chunk = cubic[i:i + CHUNK_SIZE]
+        out[chunk] = _resample_cubic(flat, starts[chunk], lengths[chunk], target_len)
+
+    if values.ndim == 1:
+        return out[..., 0]
+    return out.reshape((len(lengths), target_len) + values.shape[1:])
+
+# === Downsampling ===
+
+def lttb_indices(points, n_out):
+    """Indices of the n_out points Largest-Triangle-Three-Buckets keeps of (N, 2) points.
+
+    The first and last point are always kept. Every bucket in between keeps
+    the point spanning the largest triangle with the point kept before it and
+    the mean of the next bucket, so peaks and turns survive the reduction.
+    For a series pass (x, value) columns, for a path the (x, y) positions.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets over the interior points, with every bucket's mean up front
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    sums = np.concatenate((np.zeros((1, 2)), np.cumsum(points, axis=0)))
+    means = (sums[edges[1:]] - sums[edges[:-1]]) / np.diff(edges)[:, None]
+    means = np.concatenate((means[1:], points[-1:]))  # The last bucket looks at the end point
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = points[0]
+    for b in range(n_out - 2):
+        candidates = points[edges[b]:edges[b + 1]]
+        c = means[b]
+        area = np.abs((a[0] - c[0]) * (candidates[:, 1] - a[1]) - (a[0] - candidates[:, 0]) * (c[1] - a[1]))
+        kept[b + 1] = edges[b] + np.argmax(area)
+        a = points[kept[b + 1]]
+    return kept
+
+def downsample_series(values, max_points):
+    """(x, values) of a 1-D series reduced to at most max_points with LTTB; None keeps all."""
+    values = np.asarray(values, dtype=np.float64)
+    x = np.arange(len(values))
+    if max_points is None:
+        return x, values
+    kept = lttb_indices(np.column_stack((x, values)), max_points)
+    return x[kept], values[kept]
+
+def downsample_path(path, max_points):
+    """An (N, 2) path reduced to at most max_points with LTTB; None keeps all."""
+    path = np.asarray(path, dtype=np.float64)
+    if max_points is None:
+        return path
+    return path[lttb_indices(path, max_points)]
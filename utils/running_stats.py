@@ -0,0 +1,106 @@
+import numpy as np
+
+# === Settings ===
+CONFIDENCE_Z = 1.96  # 95% confidence band around the mean
+
+class RunningStats:
+    """Constant-memory count, mean, variance, min and max per element.
+
+    Batches are folded in with Welford's update in Chan's pairwise form, so
+    accumulators built over separate chunks can also be merged.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def from_batch(cls, batch):
+        """Accumulator over a (k, ...) batch, rows that contain NaN are skipped."""
+        batch = np.asarray(batch, dtype=np.float64)
+        if batch.ndim > 1:
+            batch = batch[~np.isnan(batch.reshape(len(batch), -1)).any(axis=1)]
+        else:
+            batch = batch[~np.isnan(batch)]
+
+        stats = cls()
+        if len(batch):
+            stats.count = len(batch)
+            stats.mean = batch.mean(axis=0)
+            stats.m2 = ((batch - stats.mean) ** 2).sum(axis=0)
+            stats.min = batch.min(axis=0)
+            stats.max = batch.max(axis=0)
+        return stats
+
+    def update(self, batch):
+        """Fold a (k, ...) batch of samples in, skipping rows that contain NaN."""
+        return self.merge(RunningStats.from_batch(batch))
+
+    def remove(self, batch):
+        """Retract samples that were folded in earlier, inverting the merge.
+
+        Mean and variance stay exact; min and max cannot be retracted and are
+        left as they are, so callers holding the samples should rebuild them.
+        """
+        other = RunningStats.from_batch(batch)
+        if not other.count:
+            return self
+        if other.count >= self.count:
+            self.__init__()
+            return self
+
+        rest = self.count - other.count
+        mean = (self.mean * self.count - other.mean * other.count) / rest
+        delta = other.mean - mean
+        m2 = self.m2 - other.m2 - delta ** 2 * (rest * other.count / self.count)
+        self.mean, self.m2, self.count = mean, np.maximum(m2, 0), rest
+        return self
+
+    def merge(self, other):
+        """Fold another accumulator's samples into this one."""
+        if not other.count:
+            return self
+        if not self.count:
+            self.count = other.count
+            self.mean, self.m2 = other.mean.copy(), other.m2.copy()
+            self.min, self.max = other.min.copy(), other.max.copy()
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / total)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / total)
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.count = total
+        return self
+
+    def to_state(self):
+        """JSON-serializable snapshot, restored with from_state."""
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "mean": self.mean.tolist(), "m2": self.m2.tolist(),
+                "min": self.min.tolist(), "max": self.max.tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls()
+        if state.get("count"):
+            stats.count = state["count"]
+            stats.mean, stats.m2 = np.asarray(state["mean"]), np.asarray(state["m2"])
+            stats.min, stats.max = np.asarray(state["min"]), np.asarray(state["max"])
+        return stats
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        return np.sqrt(self.m2 / (self.count - 1))
+
+    def band(self, z=CONFIDENCE_Z):
+        """Lower and upper confidence bound of the mean."""
+        half_width = z * self.std / np.sqrt(max(self.count, 1))
+        return self.mean - half_width, self.mean + half_width
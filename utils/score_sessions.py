@@ -0,0 +1,124 @@
+import csv
+import gzip
+import time
+import argparse
+import numpy as np
+from instrumentation import span
+from parallel_ingest import imap_stream
+from sequence_features import NUM_FEATURES, SEQUENCE_LENGTH, build_sequence, featurize_files
+from session_archive import SessionArchive, iter_session_files
+from tflite_export import TFLiteModel
+
+# === Settings ===
+MODEL_PATH = "best_lstm_gru_model.h5"
+MICRO_BATCH_SIZE = 256
+REPORT_EVERY = 10000  # Files between progress lines
+ARCHIVE_FIELDS = ["mouseMovements", "timestamps", "accelerations", "jerks", "curvatures"]
+
+# === Helper Functions ===
+
+def load_model(model_path=MODEL_PATH):
+    """The Keras model, or for a .tflite path the export, which starts without TensorFlow."""
+    if model_path.endswith(".tflite"):
+        return TFLiteModel(model_path)
+    import tensorflow as tf
+    return tf.keras.models.load_model(model_path, compile=False)
+
+def chunks_from_folder(folder_path, workers=None, chunk_size=MICRO_BATCH_SIZE):
+    """Yield (paths, sequences, usable) for chunks of the session files below folder_path.
+
+    Files are featurized on a process pool with bounded read-ahead.
+    """
+    for paths, (sequences, usable) in imap_stream(featurize_files, iter_session_files(folder_path),
+                                                  workers, chunk_size):
+        yield paths, sequences, usable
+
+def chunks_from_archive(archive_path, chunk_size=MICRO_BATCH_SIZE):
+    """Same chunks as chunks_from_folder, sliced from a packed session archive."""
+    archive = SessionArchive(archive_path)
+    columns = [archive.ragged(field) for field in ARCHIVE_FIELDS]
+    for start in range(0, len(archive), chunk_size):
+        stop = min(start + chunk_size, len(archive))
+        sequences, usable = [], []
+        for i in range(start, stop):
+            xys, ts, acc, jerk, curvature = (values[offsets[i]:offsets[i + 1]] for values, offsets in columns)
+            ok = len(xys) >= 2 and len(ts) >= 2
+            usable.append(ok)
+            if ok:
+                sequences.append(build_sequence(xys, ts, acc, jerk, curvature))
+        yield (archive.paths[start:stop],
+               np.array(sequences).reshape(-1, SEQUENCE_LENGTH, NUM_FEATURES),
+               np.array(usable, dtype=bool))
+
+def predict_padded(model, sequences, batch_size=MICRO_BATCH_SIZE):
+    """Probabilities in fixed-size micro-batches; the last one is zero-filled so the graph is traced once."""
+    probabilities = np.empty(len(sequences))
+    batch = np.zeros((batch_size, SEQUENCE_LENGTH, NUM_FEATURES), dtype=np.float32)
+    with span("predict", sequences=len(sequences)):
+        for i in range(0, len(sequences), batch_size):
+            part = sequences[i:i + batch_size]
+            batch[:len(part)] = part
+            batch[len(part):] = 0
+            probabilities[i:i + len(part)] = model.predict_on_batch(batch).reshape(-1)[:len(part)]
+    return probabilities
+
+# === Main Function ===
+
+def score_sessions(model, chunks, output_path, batch_size=MICRO_BATCH_SIZE):
+    """Write one CSV row (file, probability) per session, streaming chunk by chunk.
+
+    Files that yield no sequence get an empty probability. Output ending in
+    .gz is gzip-compressed. Returns throughput statistics.
+    """
+    opener = gzip.open if output_path.endswith(".gz") else open
+    files = scored = 0
+    start = time.perf_counter()
+
+    with opener(output_path, 'wt', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "probability"])
+        for paths, sequences, usable in chunks:
+            probabilities = iter(predict_padded(model, sequences, batch_size))
+            for path, ok in zip(paths, usable):
+                writer.writerow([path, f"{next(probabilities):.6f}" if ok else ""])
+
+            reported = files // REPORT_EVERY
+            files += len(paths)
+            scored += len(sequences)
+            if files // REPORT_EVERY > reported:
+                print(f"{files} files, {files / (time.perf_counter() - start):.0f} files/s")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "files": files,
+        "scored": scored,
+        "seconds": elapsed,
+        "files_per_sec": files / elapsed if elapsed else 0.0,
+    }
+
+def score_source(source, output_path, archive=False, model_path=MODEL_PATH, workers=None,
+                 batch_size=MICRO_BATCH_SIZE):
+    """Score a session folder or archive with the model at model_path and report the throughput."""
+    model = load_model(model_path)
+    if archive:
+        chunks = chunks_from_archive(source, batch_size)
+    else:
+        chunks = chunks_from_folder(source, workers, batch_size)
+
+    stats = score_sessions(model, chunks, output_path, batch_size)
+    print(f"✅ Scored {stats['scored']} of {stats['files']} files in {stats['seconds']:.1f}s "
+          f"({stats['files_per_sec']:.0f} files/s), saved to {output_path}")
+    return stats
+
+# === Entry Point ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score session JSONs with the trained LSTM/GRU model.")
+    parser.add_argument("source", help="Folder of session JSONs (searched recursively) or a packed archive")
+    parser.add_argument("output", help="CSV file of per-file probabilities (.csv.gz to compress)")
+    parser.add_argument("--archive", action="store_true", help="Read the source as a session archive")
+    parser.add_argument("--model", default=MODEL_PATH, help="h5 model or its .tflite export")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=MICRO_BATCH_SIZE)
+    args = parser.parse_args()
+
+    score_source(args.source, args.output, args.archive, args.model, args.workers, args.batch_size)
@@ -0,0 +1,247 @@
+import json
+import time
+import queue
+import threading
+import numpy as np
+from collections import Counter, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sequence_features import NUM_FEATURES, SEQUENCE_LENGTH, featurize_session
+
+# === Settings ===
+MODEL_PATH = "best_lstm_gru_model.h5"
+HOST = "localhost"
+PORT = 3001  # Next to the Express server on 3000
+ALLOWED_ORIGIN = "http://localhost:3000"
+LATENCY_BUDGET_MS = 5  # How long the first request of a batch waits for others to join
+MAX_BATCH_SIZE = 32
+REQUEST_TIMEOUT_S = 10
+DECEPTION_THRESHOLD = 0.5
+METRICS_WINDOW = 10000  # Most recent requests/batches the percentiles are computed over
+LISTEN_BACKLOG = 128  # Pending connections; the socketserver default of 5 resets bursts of clients
+SERIES_KEYS = ("timestamps", "accelerations", "jerks", "curvatures")  # Recorded next to mouseMovements, one per point
+
+# === Helper Functions ===
+
+def parse_series(data):
+    """mouseMovements and the other recorded series of a payload as float arrays; ValueError says what is wrong."""
+    missing = [key for key in SERIES_KEYS if key not in data]
+    if missing:
+        raise ValueError(f"Missing series in request body: {', '.join(missing)}")
+    try:
+        series = {key: np.asarray(data[key], dtype=np.float64) for key in ("mouseMovements",) + SERIES_KEYS}
+    except (TypeError, ValueError):
+        raise ValueError("Series in request body must be numeric")
+    if not all(np.isfinite(values).all() for values in series.values()):
+        raise ValueError("Series in request body must be numeric")  # null decodes to NaN
+    xys = series["mouseMovements"]
+    if xys.ndim != 2 or xys.shape[1] != 2:
+        raise ValueError("mouseMovements must be a list of [x, y] points")
+    if any(series[key].ndim != 1 or len(series[key]) != len(xys) for key in SERIES_KEYS):
+        raise ValueError("Series in request body have inconsistent lengths")
+    return series
+
+# === Helper Classes ===
+
+class ServiceMetrics:
+    """Rolling request latencies and batch sizes, safe to update from any thread."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    def record_request(self, seconds, ok=True):
+        with self.lock:
+            self.requests += 1
+            self.errors += not ok
+            self.latencies.append(seconds)
+
+    def record_batch(self, size):
+        with self.lock:
+            self.batch_sizes.append(size)
+
+    def snapshot(self):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            sizes = np.array(self.batch_sizes, dtype=np.int64)
+            requests, errors = self.requests, self.errors
+
+        latency = {"p50": None, "p99": None, "max": None}
+        if len(latencies):
+            latency = {"p50": float(np.percentile(latencies, 50)),
+                       "p99": float(np.percentile(latencies, 99)),
+                       "max": float(latencies.max())}
+        return {
+            "requests": requests,
+            "errors": errors,
+            "latency_ms": latency,
+            "batches": len(sizes),
+            "batch_size": {
+                "mean": float(sizes.mean()) if len(sizes) else None,
+                "histogram": {str(k): v for k, v in sorted(Counter(sizes.tolist()).items())},
+            },
+        }
+
+class MicroBatcher:
+    """Coalesces concurrent scoring requests into one model call.
+
+    A single worker thread owns the model. It takes the first waiting
+    request, collects more until the batch is full or the latency budget is
+    spent, and pads the batch to a power of two so only a few graph shapes
+    are ever traced (all of them during warm-up).
+    """
+
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, latency_budget_ms=LATENCY_BUDGET_MS):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.latency_budget = latency_budget_ms / 1000
+        self.requests = queue.Queue()
+        self.metrics = ServiceMetrics()
+        self._warm_up()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _padded_size(self, count):
+        size = 1
+        while size < count:
+            size *= 2
+        return min(size, self.max_batch_size)
+
+    def _warm_up(self):
+        sizes = {self._padded_size(n) for n in range(1, self.max_batch_size + 1)}
+        for size in sorted(sizes):
+            self.model.predict_on_batch(np.zeros((size, SEQUENCE_LENGTH, NUM_FEATURES), dtype=np.float32))
+
+    def submit(self, sequence):
+        future = Future()
+        self.requests.put((sequence, future))
+        return future
+
+    def score(self, sequence, timeout=REQUEST_TIMEOUT_S):
+        return self.submit(sequence).result(timeout)
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.latency_budget
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            x = np.zeros((self._padded_size(len(batch)), SEQUENCE_LENGTH, NUM_FEATURES), dtype=np.float32)
+            for i, (sequence, _) in enumerate(batch):
+                x[i] = sequence
+            try:
+                probabilities = self.model.predict_on_batch(x).reshape(-1)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), probability in zip(batch, probabilities):
+                future.set_result(float(probability))
+            self.metrics.record_batch(len(batch))
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """POST /score takes the /save-data payload; GET /metrics and /health report on the service."""
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Access-Control-Allow-Origin", ALLOWED_ORIGIN)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", ALLOWED_ORIGIN)
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(200, self.server.batcher.metrics.snapshot())
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"message": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/score":
+            return self._send_json(404, {"message": "Not found"})
+
+        start = time.perf_counter()
+        status, body = self._score()
+        self.server.batcher.metrics.record_request(time.perf_counter() - start, ok=status == 200)
+        self._send_json(status, body)
+
+    def _score(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+        except (ValueError, json.JSONDecodeError):
+            return 400, {"message": "Request body is not valid JSON"}
+
+        # Same validation as /save-data in server.js
+        session_id = request.get("sessionId") if isinstance(request, dict) else None
+        data = request.get("data") if isinstance(request, dict) else None
+        if not session_id or not isinstance(data, dict) or not data.get("question") or not data.get("answer") or not data.get("mouseMovements"):
+            return 400, {"message": "Missing required fields in request body"}
+
+        # Validated up front, so featurize_session neither raises nor prints its missing-key warning here
+        try:
+            sequence = featurize_session(parse_series(data), f"session {session_id}")
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            return 400, {"message": str(e) if isinstance(e, ValueError) else "Malformed series in request body"}
+        if sequence is None:
+            return 422, {"message": "Not enough mouse data to score"}
+
+        try:
+            probability = self.server.batcher.score(sequence)
+        except Exception as e:
+            return 500, {"message": f"Scoring failed: {e}"}
+
+        return 200, {
+            "sessionId": session_id,
+            "question": data["question"],
+            "probability": probability,
+            "deceptionFlag": probability > DECEPTION_THRESHOLD,
+        }
+
+    def log_message(self, format, *args):
+        pass  # Per-request logging would dominate the latency budget
+
+class ScoringServer(ThreadingHTTPServer):
+    request_queue_size = LISTEN_BACKLOG
+    daemon_threads = True
+
+# === Main Function ===
+
+def create_server(model_path=MODEL_PATH, host=HOST, port=PORT,
+                  max_batch_size=MAX_BATCH_SIZE, latency_budget_ms=LATENCY_BUDGET_MS):
+    import tensorflow as tf  # Only loading the model needs TensorFlow
+
+    model = tf.keras.models.load_model(model_path, compile=False)
+    server = ScoringServer((host, port), ScoringHandler)
+    server.batcher = MicroBatcher(model, max_batch_size, latency_budget_ms)
+    return server
+
+# === Entry Point ===
+if __name__ == "__main__":
+    server = create_server()
+    print(f"Scoring service is running on http://{HOST}:{PORT} (POST /score, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
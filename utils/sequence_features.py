@@ -0,0 +1,125 @@
+import os
+import numpy as np
+from instrumentation import count, traced
+from parallel_ingest import load_json
+from resample import resample_ragged
+
+# === Settings ===
+SEQUENCE_LENGTH = 150
+NUM_FEATURES = 6  # x, y, velocity, acceleration, jerk, curvature
+DT_FLOOR = 1e-6  # Stands in for zero time steps when computing velocity
+RESAMPLE_SEQUENCES = False  # Resample each answer to SEQUENCE_LENGTH instead of truncating/padding
+WINDOW_STRIDE = 75  # Step between the windows cut from answers longer than SEQUENCE_LENGTH
+
+# === Feature Extraction ===
+
+def feature_params():
+    """Settings that change the extracted features; caches are keyed on them."""
+    return {
+        "SEQUENCE_LENGTH": SEQUENCE_LENGTH,
+        "NUM_FEATURES": NUM_FEATURES,
+        "DT_FLOOR": DT_FLOOR,
+        "RESAMPLE_SEQUENCES": RESAMPLE_SEQUENCES,
+    }
+
+def raw_sequence(xys, ts, acc, jerk, curvature):
+    """Per-step features of one answer at its recorded length."""
+    dt = np.diff(ts)
+    dt[dt == 0] = DT_FLOOR
+    velocity = np.linalg.norm(np.diff(xys, axis=0), axis=1) / dt
+    velocity = np.concatenate(([0], velocity))
+
+    return np.stack([
+        xys[:, 0],  # x
+        xys[:, 1],  # y
+        velocity,
+        acc,
+        jerk,
+        curvature
+    ], axis=1)
+
+def fit_length(seq):
+    """Truncate or zero-pad (or resample) a raw sequence to SEQUENCE_LENGTH steps."""
+    if RESAMPLE_SEQUENCES:
+        return resample_ragged(seq, [0, len(seq)], SEQUENCE_LENGTH, kind="linear")[0]
+
+    if seq.shape[0] >= SEQUENCE_LENGTH:
+        seq = seq[:SEQUENCE_LENGTH]
+    else:
+        pad = np.zeros((SEQUENCE_LENGTH - seq.shape[0], seq.shape[1]))
+        seq = np.vstack((seq, pad))
+    return seq
+
+def build_sequence(xys, ts, acc, jerk, curvature):
+    return fit_length(raw_sequence(xys, ts, acc, jerk, curvature))
+
+def window_starts(length, window=SEQUENCE_LENGTH, stride=WINDOW_STRIDE):
+    """Start of each window covering a sequence; the last window ends at the sequence end."""
+    if length <= window:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.arange(0, length - window + 1, stride)
+    if starts[-1] != length - window:
+        starts = np.append(starts, length - window)
+    return starts
+
+@traced("featurize")
+def featurize_session(data, source="", raw=False):
+    """Feature sequence for one parsed session, or None if it cannot be used.
+
+    With raw=True the sequence keeps its recorded length.
+    """
+    try:
+        xys = np.array(data['mouseMovements'])
+        ts = np.array(data['timestamps'])
+        acc = np.array(data['accelerations'])
+        jerk = np.array(data['jerks'])
+        curvature = np.array(data['curvatures'])
+    except KeyError as e:
+        print(f"Missing key {e} in {source}, skipping.")
+        return None
+
+    count(sessions=1, points=len(xys))
+    if len(xys) < 2 or len(ts) < 2:
+        return None
+
+    if raw:
+        return raw_sequence(xys, ts, acc, jerk, curvature)
+    return build_sequence(xys, ts, acc, jerk, curvature)
+
+def featurize_files(file_paths):
+    """Featurize a chunk of files; returns the sequences and which files produced one."""
+    sequences = []
+    usable = []
+    for file_path in file_paths:
+        seq = featurize_session(load_json(file_path), os.path.basename(file_path))
+        usable.append(seq is not None)
+        if seq is not None:
+            sequences.append(seq)
+    return np.array(sequences).reshape(-1, SEQUENCE_LENGTH, NUM_FEATURES), np.array(usable, dtype=bool)
+
+def featurize_labelled_files(items):
+    """Featurize a chunk of (file_path, label) pairs; the process-pool work unit."""
+    sequences = []
+    labels = []
+    for file_path, label in items:
+        seq = featurize_session(load_json(file_path), os.path.basename(file_path))
+        if seq is not None:
+            sequences.append(seq)
+            labels.append(label)
+    return np.array(sequences).reshape(-1, SEQUENCE_LENGTH, NUM_FEATURES), np.array(labels, dtype=np.int64)
+
+def featurize_raw_labelled_files(items):
+    """Like featurize_labelled_files, but keeps every sequence at its recorded length.
+
+    Returns the sequences stacked into one (steps, NUM_FEATURES) array, the
+    length of each and the labels.
+    """
+    sequences = []
+    labels = []
+    for file_path, label in items:
+        seq = featurize_session(load_json(file_path), os.path.basename(file_path), raw=True)
+        if seq is not None:
+            sequences.append(seq)
+            labels.append(label)
+    values = np.concatenate(sequences) if sequences else np.zeros((0, NUM_FEATURES))
+    return values, np.array([len(seq) for seq in sequences], dtype=np.int64), np.array(labels, dtype=np.int64)
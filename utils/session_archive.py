@@ -0,0 +1,201 @@
+import os
+import json
+import numpy as np
+from glob import glob
+from instrumentation import span
+from parallel_ingest import load_json
+
+# === Settings ===
+# Ragged per-sample series and the number of columns each row holds
+SERIES_FIELDS = {
+    "mouseMovements": 2,
+    "timestamps": 1,
+    "accelerations": 1,
+    "jerks": 1,
+    "curvatures": 1,
+    "pausePoints": 3,  # x, y, duration
+}
+SCALAR_FIELDS = ["totalTime", "averageSpeed", "hesitation", "jerkSpikeCount"]
+TEXT_FIELDS = ["question", "answer", "hesitationLevel"]
+UNLABELLED = -1
+
+# Output of calc_averages.py, lives next to the sessions it summarises
+AVERAGED_RESULT_NAME = "averaged_result_interpolated.json"
+INDEX_NAME = "index.json"
+
+# === Helper Functions ===
+
+def find_session_files(folder_path):
+    """Return every session JSON below folder_path, sorted for a stable order."""
+    with span("discover") as timed:
+        pattern = os.path.join(folder_path, "**", "*.json")
+        files = sorted(f for f in glob(pattern, recursive=True) if os.path.basename(f) != AVERAGED_RESULT_NAME)
+        timed.add(files=len(files))
+    return files
+
+def iter_session_files(folder_path):
+    """Yield session JSONs below folder_path without listing the whole tree first.
+
+    Directories and files are visited in sorted order, so the order is stable.
+    """
+    for root, dirs, files in os.walk(folder_path):
+        dirs.sort()
+        for fname in sorted(files):
+            if fname.endswith(".json") and fname != AVERAGED_RESULT_NAME:
+                yield os.path.join(root, fname)
+
+def series_to_array(values, width):
+    """Convert one JSON series to a float array with `width` columns."""
+    if values and isinstance(values[0], dict):
+        keys = ["x", "y", "duration"][:width]
+        values = [[pt.get(k, 0) for k in keys] for pt in values]
+    arr = np.asarray(values if values else [], dtype=np.float64)
+    if width == 1:
+        return arr.reshape(-1)
+    return arr.reshape(-1, width)
+
+def take_ragged(values, offsets, indices):
+    """Gather the rows of `indices` from a ragged (values, offsets) pair.
+
+    Returns a new (values, offsets) pair holding only the selected entries.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    starts = offsets[indices]
+    lengths = offsets[indices + 1] - starts
+    new_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    gather = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+    return np.asarray(values[gather]), new_offsets
+
+def session_row(data, label=None):
+    """(series, scalars, texts, label) of one parsed session as the archive stores it.
+
+    A label of None keeps the session's own "label" key, if any. Raises
+    ValueError or TypeError on a malformed series.
+    """
+    series = {field: series_to_array(data.get(field, []), width) for field, width in SERIES_FIELDS.items()}
+    scalars = {field: data.get(field) or 0 for field in SCALAR_FIELDS}
+    texts = {field: data.get(field) for field in TEXT_FIELDS}
+    if label is None:
+        label = data.get("label")
+        label = UNLABELLED if label is None else label
+    return series, scalars, texts, label
+
+def write_archive(output_dir, paths, series, scalars, labels, texts):
+    """Write already-columnar data as an archive directory.
+
+    `series` maps field -> list of arrays, `scalars` maps field -> list of floats.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    for field, width in SERIES_FIELDS.items():
+        arrays = series[field]
+        lengths = np.fromiter((len(a) for a in arrays), dtype=np.int64, count=len(arrays))
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        shape = (int(offsets[-1]),) if width == 1 else (int(offsets[-1]), width)
+        values = np.concatenate(arrays) if arrays else np.zeros(shape)
+        np.save(os.path.join(output_dir, f"{field}.npy"), values.reshape(shape))
+        np.save(os.path.join(output_dir, f"{field}.offsets.npy"), offsets)
+
+    for field in SCALAR_FIELDS:
+        np.save(os.path.join(output_dir, f"{field}.npy"), np.asarray(scalars[field], dtype=np.float64))
+    np.save(os.path.join(output_dir, "label.npy"), np.asarray(labels, dtype=np.int64))
+
+    index = {"count": len(paths), "paths": list(paths)}
+    index.update({field: list(texts[field]) for field in TEXT_FIELDS})
+    with open(os.path.join(output_dir, INDEX_NAME), 'w') as f:
+        json.dump(index, f)
+
+# === Main Functions ===
+
+def pack_sessions(folders, output_dir):
+    """Pack session JSONs into a memory-mappable columnar archive.
+
+    `folders` maps a folder path to the label of its sessions (0 truthful,
+    1 deceptive). A label of None keeps the file's own "label" key, if any.
+    """
+    paths = []
+    series = {field: [] for field in SERIES_FIELDS}
+    scalars = {field: [] for field in SCALAR_FIELDS}
+    texts = {field: [] for field in TEXT_FIELDS}
+    labels = []
+
+    for folder_path, label in folders.items():
+        for file_path in find_session_files(folder_path):
+            try:
+                rows, row_scalars, row_texts, row_label = session_row(load_json(file_path), label)
+            except (ValueError, TypeError) as e:
+                print(f"⚠️ Skipped malformed session {file_path}: {e}")
+                continue
+
+            paths.append(file_path)
+            for field, arr in rows.items():
+                series[field].append(arr)
+            for field in SCALAR_FIELDS:
+                scalars[field].append(row_scalars[field])
+            for field in TEXT_FIELDS:
+                texts[field].append(row_texts[field])
+            labels.append(row_label)
+
+    write_archive(output_dir, paths, series, scalars, labels, texts)
+    print(f"✅ Packed {len(paths)} sessions into: {output_dir}")
+    return len(paths)
+
+class SessionArchive:
+    """Read-only view over a packed archive; all arrays are memory-mapped."""
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        with open(os.path.join(archive_dir, INDEX_NAME), 'r') as f:
+            self.index = json.load(f)
+        self._arrays = {}
+
+    def __len__(self):
+        return self.index["count"]
+
+    def _load(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.archive_dir, f"{name}.npy"), mmap_mode='r')
+        return self._arrays[name]
+
+    @property
+    def paths(self):
+        return self.index["paths"]
+
+    @property
+    def labels(self):
+        return self._load("label")
+
+    def text(self, field):
+        return self.index[field]
+
+    def scalar(self, field):
+        return self._load(field)
+
+    def offsets(self, field):
+        return self._load(f"{field}.offsets")
+
+    def ragged(self, field, indices=None):
+        """Return (values, offsets) for a series, optionally for a subset of sessions."""
+        values, offsets = self._load(field), self.offsets(field)
+        if indices is None:
+            return values, offsets
+        return take_ragged(values, offsets, indices)
+
+    def series(self, field, i):
+        offsets = self.offsets(field)
+        return self._load(field)[offsets[i]:offsets[i + 1]]
+
+    def select(self, label=None):
+        """Indices of the sessions carrying `label` (all sessions if None)."""
+        if label is None:
+            return np.arange(len(self))
+        return np.flatnonzero(self.labels == label)
+
+# === Entry Point ===
+if __name__ == "__main__":
+    pack_sessions({
+        "questionnaire_sessions/truth": 0,
+        "questionnaire_sessions/lie": 1,
+    }, "session_archive")  # Update paths as needed
@@ -0,0 +1,254 @@
+import os
+import json
+import argparse
+import numpy as np
+from functools import partial
+from kinematics import jerk_spike_counts, session_ids
+from parallel_ingest import imap_chunks, load_json
+from resample import to_point_array, to_ragged
+from session_archive import SCALAR_FIELDS, SERIES_FIELDS, TEXT_FIELDS, find_session_files, session_row, write_archive
+
+# === Settings ===
+FOLDERS = {
+    "data/truthful_responses": 0,
+    "data/deceptive_responses": 1,
+}
+TOLERANCE = 2.0  # Largest distance (px) a dropped sample may lie from the simplified path
+METRIC = "time"  # "time": from the path position at the sample's timestamp, "space": from the path segment
+KEEP_JERK_SPIKES = True  # Never drop a sample whose |jerk| is over its session's spike threshold
+EVENT_FIELDS = ["timestamps", "accelerations", "jerks", "curvatures"]  # Per-sample series kept aligned with the path
+OUTPUT_DIR = "data_simplified"
+
+# === Helper Functions ===
+# Sessions are simplified as one ragged batch: positions (N, 2) and timestamps
+# (N,) back to back, offsets (n + 1,) marking where each session starts.
+
+def deviations(positions, timestamps, points, first, last, metric=METRIC):
+    """Distance of each sample in `points` from the simplified segment first -> last.
+
+    "time" compares the sample with where the segment is at the sample's
+    timestamp (synchronized Euclidean distance), so a pause that the path
+    passes through without stopping is not simplified away. "space"
+    compares it with the closest point of the segment.
+    """
+    start, end = positions[first], positions[last]
+    direction = end - start
+    if metric == "time":
+        span = timestamps[last] - timestamps[first]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(span > 0, (timestamps[points] - timestamps[first]) / span, 0.0)
+    elif metric == "space":
+        length = (direction ** 2).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(length > 0, ((positions[points] - start) * direction).sum(axis=1) / length, 0.0)
+    else:
+        raise ValueError(f"unknown metric {metric!r}, use 'time' or 'space'")
+    nearest = start + np.clip(t, 0, 1)[:, None] * direction
+    return np.sqrt(((positions[points] - nearest) ** 2).sum(axis=1))
+
+def anchors(keep):
+    """Previous and next kept sample of every sample (itself when kept)."""
+    index = np.arange(len(keep))
+    first = np.maximum.accumulate(np.where(keep, index, 0))
+    last = np.minimum.accumulate(np.where(keep, index, len(keep))[::-1])[::-1]
+    return first, last
+
+def simplify_batch(positions, timestamps, offsets, tolerance=TOLERANCE, metric=METRIC, forced=None):
+    """Ramer-Douglas-Peucker over a batch of sessions; the kept-sample mask.
+
+    Every session keeps its first and last sample and the `forced` ones.
+    The segments between kept samples are split at their farthest sample
+    until none is more than `tolerance` away. Each pass handles the open
+    segments of all sessions at once, so the number of passes is the depth
+    of the recursion, not the number of segments.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    keep = np.zeros(len(positions), dtype=bool) if forced is None else np.asarray(forced, dtype=bool).copy()
+    lengths = np.diff(offsets)
+    keep[offsets[:-1][lengths > 0]] = True
+    keep[offsets[1:][lengths > 0] - 1] = True
+
+    # Initial segments run between consecutive kept samples of a session
+    kept = np.flatnonzero(keep)
+    first, last = kept[:-1], kept[1:]
+    ids = session_ids(offsets)
+    same = ids[first] == ids[last] if len(kept) else np.zeros(0, dtype=bool)
+    first, last = first[same], last[same]
+
+    while True:
+        inner = last - first - 1
+        first, last, inner = first[inner > 0], last[inner > 0], inner[inner > 0]
+        if not len(first):
+            return keep
+        segment = np.repeat(np.arange(len(first)), inner)
+        block = np.concatenate(([0], np.cumsum(inner)[:-1]))
+        points = np.repeat(first + 1 - block, inner) + np.arange(inner.sum())
+        distance = deviations(positions, timestamps, points, first[segment], last[segment], metric)
+
+        # Farthest sample of each segment, the first one on ties
+        farthest = np.maximum.reduceat(distance, block)
+        candidates = np.flatnonzero(distance == farthest[segment])
+        _, first_candidate = np.unique(segment[candidates], return_index=True)
+        split = points[candidates[first_candidate]]
+
+        open_ = farthest > tolerance
+        keep[split[open_]] = True
+        first, last = np.concatenate((first[open_], split[open_])), np.concatenate((split[open_], last[open_]))
+
+def simplification_report(positions, timestamps, offsets, keep, metric=METRIC):
+    """Samples in and out per session and the largest deviation of any dropped sample."""
+    first, last = anchors(keep)
+    dropped = np.flatnonzero(~keep)
+    distance = np.zeros(len(keep))
+    distance[dropped] = deviations(positions, timestamps, dropped, first[dropped], last[dropped], metric)
+    ids = session_ids(offsets)
+    max_deviation = np.zeros(len(offsets) - 1)
+    np.maximum.at(max_deviation, ids, distance)
+    return {
+        "points": np.diff(offsets),
+        "kept": np.bincount(ids, weights=keep, minlength=len(offsets) - 1).astype(np.int64),
+        "max_deviation": max_deviation,
+    }
+
+def reduce_session(data, kept, original_points, tolerance, metric):
+    """Copy of a session with every per-sample series cut down to the kept samples."""
+    reduced = dict(data)
+    movements = data.get("mouseMovements") or []
+    reduced["mouseMovements"] = [movements[i] for i in kept]
+    for field in EVENT_FIELDS:
+        values = data.get(field)
+        if isinstance(values, list) and len(values) == original_points:
+            reduced[field] = [values[i] for i in kept]
+    reduced["simplification"] = {"tolerance": tolerance, "metric": metric, "originalPoints": original_points}
+    return reduced
+
+def simplify_files(items, tolerance=TOLERANCE, metric=METRIC, pack=False):
+    """Simplify a chunk of (file_path, label, output_path) sessions; the process-pool work unit.
+
+    Reduced sessions are written to output_path when it is set. Returns the
+    per-session report rows and, with `pack`, the archive rows of the kept
+    sessions. Sessions whose path and timestamps differ in length are
+    passed through unsimplified.
+    """
+    records = [load_json(file_path) for file_path, _, _ in items]
+    paths, times, abs_jerks = [], [], []
+    for data in records:
+        xy = to_point_array(data.get("mouseMovements") or []).reshape(-1, 2)
+        ts = np.asarray(data.get("timestamps") or [], dtype=np.float64)
+        aligned = len(xy) == len(ts)
+        paths.append(xy if aligned else np.zeros((0, 2)))
+        times.append(ts if aligned else np.zeros(0))
+        jerks = data.get("jerks")
+        abs_jerks.append(np.abs(np.asarray(jerks, dtype=np.float64)) if aligned and isinstance(jerks, list)
+                      and len(jerks) == len(xy) else np.zeros(len(paths[-1])))
+    positions, offsets = to_ragged(paths)
+    timestamps, _ = to_ragged(times)
+    magnitudes, _ = to_ragged(abs_jerks)
+
+    spikes = np.zeros(len(positions), dtype=bool)
+    if KEEP_JERK_SPIKES and len(positions):
+        _, thresholds = jerk_spike_counts(magnitudes, offsets)
+        spikes = magnitudes > thresholds[session_ids(offsets)]
+    keep = simplify_batch(positions, timestamps, offsets, tolerance, metric, spikes)
+    report = simplification_report(positions, timestamps, offsets, keep, metric)
+
+    rows, packed = [], []
+    for i, ((file_path, label, output_path), data) in enumerate(zip(items, records)):
+        start, end = offsets[i], offsets[i + 1]
+        original = len(data.get("mouseMovements") or [])
+        if end > start:
+            reduced = reduce_session(data, np.flatnonzero(keep[start:end]), original, tolerance, metric)
+        else:
+            reduced = data
+        kept = len(reduced.get("mouseMovements") or [])
+        rows.append((file_path, original, kept, float(report["max_deviation"][i])))
+        if output_path is not None:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            with open(output_path, 'w') as f:
+                json.dump(reduced, f, separators=(",", ":"))  # Compact, unlike server.js
+        if pack:
+            try:
+                packed.append((file_path, *session_row(reduced, label)))
+            except (ValueError, TypeError) as e:
+                print(f"⚠️ Skipped malformed session {file_path}: {e}")
+    return rows, packed
+
+def output_paths(folders, output_dir):
+    """(file_path, label, output_path) of every session; each folder is mirrored under output_dir by its name."""
+    items = []
+    for folder_path, label in folders.items():
+        target = os.path.join(output_dir, os.path.basename(os.path.normpath(folder_path))) if output_dir else None
+        for file_path in find_session_files(folder_path):
+            out = os.path.join(target, os.path.relpath(file_path, folder_path)) if target else None
+            items.append((file_path, label, out))
+    return items
+
+# === Main Functions ===
+
+def simplify_sessions(folders=FOLDERS, output_dir=OUTPUT_DIR, archive_dir=None, tolerance=TOLERANCE, metric=METRIC,
+                      workers=None):
+    """Simplify every session's path and write the reduced JSONs, the packed archive, or both.
+
+    `folders` maps a folder to the label its sessions get in the archive
+    (None keeps a session's own "label" key). Timestamps, accelerations,
+    jerks and curvatures keep the samples the path keeps; pause points and
+    the per-session scalars describe the recorded session and are copied.
+    Returns a report of the samples kept and the largest deviation.
+    """
+    if output_dir is None and archive_dir is None:
+        raise ValueError("nothing to write, pass an output folder and/or an archive folder")
+    items = output_paths(folders, output_dir)
+    pack = archive_dir is not None
+    work = partial(simplify_files, tolerance=tolerance, metric=metric, pack=pack)
+
+    points = kept = sessions = 0
+    max_deviation = 0.0
+    packed_paths, labels = [], []
+    series = {field: [] for field in SERIES_FIELDS}
+    scalars = {field: [] for field in SCALAR_FIELDS}
+    texts = {field: [] for field in TEXT_FIELDS}
+    for rows, packed in imap_chunks(work, items, workers):
+        for _, original, reduced, deviation in rows:
+            points += original
+            kept += reduced
+            max_deviation = max(max_deviation, deviation)
+        sessions += len(rows)
+        for file_path, row_series, row_scalars, row_texts, label in packed:
+            packed_paths.append(file_path)
+            labels.append(label)
+            for field in SERIES_FIELDS:
+                series[field].append(row_series[field])
+            for field in SCALAR_FIELDS:
+                scalars[field].append(row_scalars[field])
+            for field in TEXT_FIELDS:
+                texts[field].append(row_texts[field])
+
+    if output_dir is not None:
+        print(f"✅ Saved {sessions} simplified sessions to: {output_dir}")
+    if pack:
+        write_archive(archive_dir, packed_paths, series, scalars, labels, texts)
+        print(f"✅ Packed {len(packed_paths)} simplified sessions into: {archive_dir}")
+    report = {"sessions": sessions, "points": points, "kept": kept,
+              "compression": points / kept if kept else 1.0, "max_deviation": max_deviation,
+              "tolerance": tolerance, "metric": metric}
+    print(f"Kept {kept} of {points} samples ({report['compression']:.2f}x smaller), "
+          f"largest deviation {max_deviation:.3f} px (tolerance {tolerance} px, {metric}).")
+    return report
+
+# === Entry Point ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Error-bounded simplification of session paths (Ramer-Douglas-Peucker).")
+    parser.add_argument("--folders", nargs=2, metavar=("TRUTHFUL", "DECEPTIVE"), help="Defaults to data/")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="Folder for the reduced session JSONs")
+    parser.add_argument("--no-json", action="store_true", help="Only write the archive")
+    parser.add_argument("--archive", help="Also pack the reduced sessions into this archive folder")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--metric", choices=["time", "space"], default=METRIC)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    folders = {args.folders[0]: 0, args.folders[1]: 1} if args.folders else FOLDERS
+    simplify_sessions(folders, None if args.no_json else args.output, args.archive, args.tolerance, args.metric,
+                      args.workers)
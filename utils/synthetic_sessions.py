@@ -0,0 +1,128 @@
+import os
+import json
+import numpy as np
+from kinematics import recompute_sessions
+from parallel_ingest import imap_chunks
+
+# === Settings ===
+LABEL_FOLDERS = {0: "truthful_responses", 1: "deceptive_responses"}
+QUESTIONS = [
+    "Are you currently located in Norway?",
+    "Are you currently located in the county Innlandet?",
+    "Are you currently located in Gjovik?",
+    "Are you currently located at NTNU?",
+    "Are you currently a student at NTNU?",
+    "Are you currently located in Australia?",
+    "Are you currently located in the state Victoria?",
+    "Are you currently located in Melbourne?",
+    "Are you currently located at RMIT?",
+    "Are you currently employed as a professor at RMIT?",
+]
+SCREEN_SIZE = (1920, 1080)
+MEDIAN_EVENTS = {0: 60, 1: 80}  # Median mousemove events per answer, truthful vs deceptive
+LENGTH_SIGMA = 0.8  # Log-normal spread of the answer lengths
+MAX_EVENTS = 3000
+EVENT_INTERVAL_MS = 16  # Typical spacing of mousemove events
+PAUSE_PROBABILITY = {0: 0.01, 1: 0.025}  # Chance that an event is followed by a pause
+PAUSE_RANGE_MS = (200, 1500)
+STILL_EVENT_INTERVAL_MS = 150  # Spacing of the sub-pixel jitter events while the hand rests
+
+# === Session Generation ===
+
+def generate_session(rng, label, question):
+    """One answer in the schema server.js writes."""
+    n = int(np.clip(rng.lognormal(np.log(MEDIAN_EVENTS[label]), LENGTH_SIGMA), 2, MAX_EVENTS))
+    answer = "Yes" if rng.random() < 0.5 else "No"
+
+    # Event gaps in whole milliseconds (Date.now() resolution), with occasional pauses
+    gaps = np.maximum(rng.gamma(4.0, EVENT_INTERVAL_MS / 4, n).round(), 1)
+    paused = np.flatnonzero(rng.random(n) < PAUSE_PROBABILITY[label])
+    pause_ms = rng.uniform(*PAUSE_RANGE_MS, len(paused)).round()
+    delay = np.zeros(n)
+    delay[paused] = pause_ms
+    t_ms = np.cumsum(gaps + np.concatenate(([0], delay[:-1])))
+
+    # Minimum-jerk reach from the start position to the answer button, plus hand tremor
+    width, height = SCREEN_SIZE
+    start = rng.uniform([0.3 * width, 0.6 * height], [0.7 * width, 0.9 * height])
+    target = np.array([(0.42 if answer == "Yes" else 0.58) * width, 0.55 * height]) + rng.normal(0, 15, 2)
+    tau = (t_ms / t_ms[-1])[:, None]
+    progress = 10 * tau ** 3 - 15 * tau ** 4 + 6 * tau ** 5
+    tremor = np.cumsum(rng.normal(0, 1.5, (n, 2)), axis=0)
+    xy = np.round(start + (target - start) * progress + tremor)
+
+    # While the hand rests the browser still reports the odd 1 px jitter
+    times, points = [t_ms], [xy]
+    for i, duration in zip(paused, pause_ms):
+        count = max(int(duration // STILL_EVENT_INTERVAL_MS), 1)
+        offsets = np.sort(rng.choice(np.arange(1, int(duration)), count, replace=False))
+        jitter = np.zeros((count, 2))
+        jitter[:, 0] = rng.integers(0, 2, count)
+        times.append(t_ms[i] + offsets)
+        points.append(xy[i] + jitter)
+    order = np.argsort(np.concatenate(times), kind='stable')
+    t = np.concatenate(times)[order] / 1000
+    xy = np.concatenate(points)[order]
+
+    # Derived fields exactly as public/script.js computes them
+    derived = recompute_sessions(xy, t, [0, len(t)])
+    series = derived["series"]
+    pauses = derived["pausePoints"][0]
+    speed = derived["averageSpeed"][0]
+    return {
+        "question": question,
+        "answer": answer,
+        "mouseMovements": xy.astype(int).tolist(),
+        "timestamps": t.tolist(),
+        "accelerations": series["accelerations"].tolist(),
+        "jerks": series["jerks"].tolist(),
+        "curvatures": series["curvatures"].tolist(),
+        "pausePoints": [{"x": int(x), "y": int(y), "duration": d} for x, y, d in pauses.tolist()],
+        "hesitation": float(derived["hesitation"][0]),
+        "hesitationLevel": str(derived["hesitationLevel"][0]),
+        "totalTime": float(t[-1] + rng.uniform(0.1, 0.6)),  # Click comes after the last move
+        "averageSpeed": None if np.isnan(speed) else float(speed),
+        "deceptionFlag": bool(derived["deceptionFlag"][0]),
+        "jerkSpikeCount": int(derived["jerkSpikeCount"][0]),
+    }
+
+def write_sessions(items):
+    """Write a chunk of (output_dir, label, index, seed) sessions; the pool work unit.
+
+    Every file has its own seed, so the output does not depend on the chunking.
+    """
+    for output_dir, label, index, seed in items:
+        rng = np.random.default_rng([seed, label, index])
+        session = generate_session(rng, label, QUESTIONS[index % len(QUESTIONS)])
+        path = os.path.join(output_dir, LABEL_FOLDERS[label], f"question_{index:07d}.json")
+        with open(path, 'w') as f:
+            json.dump(session, f, indent=2)
+    return len(items)
+
+# === Main Function ===
+
+def generate_dataset(output_dir, count, seed=0, workers=None):
+    """Write `count` sessions, half truthful and half deceptive, below output_dir.
+
+    A dataset already generated with the same count and seed is reused.
+    """
+    marker_path = os.path.join(output_dir, "synthetic.json")
+    marker = {"count": count, "seed": seed}
+    if os.path.exists(marker_path):
+        with open(marker_path, 'r') as f:
+            if json.load(f) == marker:
+                return output_dir
+
+    for folder in LABEL_FOLDERS.values():
+        os.makedirs(os.path.join(output_dir, folder), exist_ok=True)
+    items = [(output_dir, i % 2, i // 2, seed) for i in range(count)]
+    written = sum(imap_chunks(write_sessions, items, workers))
+
+    with open(marker_path, 'w') as f:
+        json.dump(marker, f)
+    print(f"✅ Generated {written} synthetic sessions in: {output_dir}")
+    return output_dir
+
+# === Entry Point ===
+if __name__ == "__main__":
+    generate_dataset("synthetic_sessions", 1000)
@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+import json
+import tempfile
+import subprocess
+import numpy as np
+from instrumentation import peak_rss_mb
+from sequence_features import NUM_FEATURES, SEQUENCE_LENGTH
+
+# Interpreter without TensorFlow: LiteRT, or the older tflite_runtime package
+try:
+    from ai_edge_litert.interpreter import Interpreter
+except ImportError:
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        Interpreter = None  # Falls back to tf.lite.Interpreter, which imports all of TensorFlow
+
+# === Settings ===
+MODEL_PATH = "best_lstm_gru_model.h5"
+TFLITE_PATH = "best_lstm_gru_model.tflite"
+TFLITE_QUANTIZATION = "float16"  # None, "float16" or "int8" (int8 weights, float activations)
+TFLITE_BATCH_SIZE = 1  # The LSTM/GRU only convert to builtin ops with a fixed batch size; larger trades latency for throughput
+PARITY_TOLERANCE = 0.01  # Largest probability difference to the h5 model the parity check accepts
+LATENCY_REPEATS = 50
+REPORT_PATH = "tflite_parity.json"
+
+# === Export and Loading ===
+
+def export_tflite(model, output_path=TFLITE_PATH, quantization=TFLITE_QUANTIZATION, batch_size=TFLITE_BATCH_SIZE):
+    """Convert a Keras model to a TFLite flatbuffer with a fixed (batch, 150, 6) input.
+
+    Full-integer quantization of the recurrent layers is not supported by the
+    converter, so "int8" quantizes the weights and keeps float activations.
+    """
+    import tensorflow as tf  # Only the export needs TensorFlow
+
+    inputs = tf.keras.Input(shape=(SEQUENCE_LENGTH, NUM_FEATURES), batch_size=batch_size)
+    fixed = tf.keras.Model(inputs, model(inputs))
+    converter = tf.lite.TFLiteConverter.from_keras_model(fixed)
+    if quantization == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantization is not None:
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+    return output_path
+
+class TFLiteModel:
+    """An exported model behind the Keras predict/predict_on_batch interface.
+
+    Inputs of any length are fed in zero-filled batches of the exported size.
+    """
+
+    def __init__(self, model_path=TFLITE_PATH, num_threads=None):
+        interpreter_class = Interpreter
+        if interpreter_class is None:
+            import tensorflow as tf
+            interpreter_class = tf.lite.Interpreter
+        self.interpreter = interpreter_class(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch = np.zeros(self.input["shape"], dtype=np.float32)
+
+    def predict(self, x, **kwargs):
+        x = np.asarray(x, dtype=np.float32)
+        size = len(self.batch)
+        probabilities = np.empty((len(x), 1), dtype=np.float32)
+        for i in range(0, len(x), size):
+            part = x[i:i + size]
+            self.batch[:len(part)] = part
+            self.batch[len(part):] = 0
+            self.interpreter.set_tensor(self.input["index"], self.batch)
+            self.interpreter.invoke()
+            probabilities[i:i + len(part)] = self.interpreter.get_tensor(self.output["index"])[:len(part)]
+        return probabilities
+
+    def predict_on_batch(self, x):
+        return self.predict(x)
+
+# === Parity and Latency ===
+
+def measure_runtime(model_path, X):
+    """Cold start, latency, throughput and peak memory of one model file, plus its predictions.
+
+    Meant to run in a fresh interpreter, so the import cost is part of the cold start.
+    """
+    start = time.perf_counter()
+    if model_path.endswith(".tflite"):
+        model = TFLiteModel(model_path)
+    else:
+        import tensorflow as tf
+        model = tf.keras.models.load_model(model_path, compile=False)
+    model.predict_on_batch(X[:1])
+    cold_start = time.perf_counter() - start
+
+    latencies = []
+    for i in range(LATENCY_REPEATS):
+        single = X[i % len(X):i % len(X) + 1]
+        start = time.perf_counter()
+        model.predict_on_batch(single)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    probabilities = np.asarray(model.predict_on_batch(X)).reshape(-1)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "model": model_path,
+        "size_kb": os.path.getsize(model_path) / 1024,
+        "cold_start_s": cold_start,
+        "latency_ms_p50": float(np.percentile(latencies, 50)),
+        "latency_ms_p99": float(np.percentile(latencies, 99)),
+        "sequences_per_sec": len(X) / elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+    }, probabilities
+
+def compare_runtimes(X_test, y_test, h5_path=MODEL_PATH, tflite_path=TFLITE_PATH):
+    """Parity and cost of the TFLite export against the h5 model on the test split."""
+    from sklearn.metrics import accuracy_score, f1_score
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        x_path = os.path.join(tmp, "X_test.npy")
+        np.save(x_path, np.asarray(X_test, dtype=np.float32))
+        for name, path in (("h5", h5_path), ("tflite", tflite_path)):
+            # A fresh interpreter per runtime, so the caller's imports (TensorFlow)
+            # count neither towards the cold start nor the peak memory
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", path, x_path, tmp], check=True)
+            with open(os.path.join(tmp, "stats.json"), 'r') as f:
+                stats = json.load(f)
+            results[name] = (stats, np.load(os.path.join(tmp, "probabilities.npy")))
+
+    for stats, probabilities in results.values():
+        predictions = (probabilities > 0.5).astype(int)
+        stats["accuracy"] = accuracy_score(y_test, predictions)
+        stats["macro_f1"] = f1_score(y_test, predictions, average='macro')
+
+    difference = np.abs(results["h5"][1] - results["tflite"][1])
+    agreement = np.mean((results["h5"][1] > 0.5) == (results["tflite"][1] > 0.5))
+    return {
+        "h5": results["h5"][0],
+        "tflite": results["tflite"][0],
+        "max_abs_difference": float(difference.max()) if len(difference) else 0.0,
+        "label_agreement": float(agreement) if len(difference) else 1.0,
+        "parity": bool(len(difference) == 0 or difference.max() <= PARITY_TOLERANCE),
+    }
+
+def print_report(report):
+    print(f"{'':<8}{'size KB':>10}{'cold s':>10}{'p50 ms':>10}{'p99 ms':>10}{'seq/s':>10}{'peak MB':>10}{'F1':>8}")
+    for name in ("h5", "tflite"):
+        r = report[name]
+        peak = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else "n/a"
+        print(f"{name:<8}{r['size_kb']:>10.0f}{r['cold_start_s']:>10.2f}{r['latency_ms_p50']:>10.2f}"
+              f"{r['latency_ms_p99']:>10.2f}{r['sequences_per_sec']:>10.0f}{peak:>10}{r['macro_f1']:>8.3f}")
+    status = "✅ Parity" if report["parity"] else "⚠️ No parity"
+    print(f"{status}: max |Δp| = {report['max_abs_difference']:.2e}, label agreement {report['label_agreement']:.1%}")
+
+def save_report(report, output_path=REPORT_PATH):
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Saved parity report to {output_path}")
+
+# === Entry Point ===
+if __name__ == "__main__" and sys.argv[1:2] == ["--measure"]:
+    # Child process of compare_runtimes
+    model_path, x_path, out_dir = sys.argv[2:5]
+    stats, probabilities = measure_runtime(model_path, np.load(x_path))
+    np.save(os.path.join(out_dir, "probabilities.npy"), probabilities)
+    with open(os.path.join(out_dir, "stats.json"), 'w') as f:
+        json.dump(stats, f)
+
+elif __name__ == "__main__":
+    import tensorflow as tf
+    from input_pipeline import stratified_split
+    from model_training_dl_lstm_gru_v1 import SEED, load_labelled_sequences
+
+    export_tflite(tf.keras.models.load_model(MODEL_PATH, compile=False))
+    print(f"✅ Exported {MODEL_PATH} to {TFLITE_PATH} ({TFLITE_QUANTIZATION or 'float32'})")
+
+    # Same held-out 10% as the training script
+    X, y = load_labelled_sequences({
+        "data/truthful_responses": 0,
+        "data/deceptive_responses": 1,
+    })
+    _, _, test = stratified_split(y, SEED)
+    report = compare_runtimes(X[test], y[test])
+    print_report(report)
+    save_report(report)
@@ -0,0 +1,441 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+import argparse
+import numpy as np
+from numpy.lib.format import open_memmap
+from instrumentation import span
+from label_index import LABEL_INDEX_PATH, labelled_paths
+from parallel_ingest import imap_chunks, load_json
+from resample import INTERPOLATION_POINTS, resample_ragged, to_point_array, to_ragged
+
+# === Settings ===
+FOLDERS = {
+    "data/truthful_responses": 0,
+    "data/deceptive_responses": 1,
+}
+INDEX_DIR = "trajectory_index"
+N_COMPONENTS = 16  # PCA dimensions the tree is built on
+PCA_SAMPLE = 100000  # Paths the projection is fitted on
+PCA_REFIT_GROWTH = 2  # Refit the projection at a rebuild once the index has grown this many times since the fit
+LEAF_SIZE = 40
+RERANK_FACTOR = 20  # Tree candidates per requested neighbour, re-ranked on the full resampled paths
+REBUILD_FRACTION = 0.1  # Rebuild the tree once the unindexed buffer holds this fraction of its size
+MIN_REBUILD = 1024  # ... and at least this many paths
+INITIAL_CAPACITY = 1024
+K_NEIGHBOURS = 15
+SEED = 42  # The training script's, so evaluate holds out the same test split
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    row INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    label INTEGER NOT NULL,
+    flagged INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# === Helper Functions ===
+
+def embed_paths(movements):
+    """(n, INTERPOLATION_POINTS * 2) float32 of mouseMovements series, resampled as interpolate_to_fixed_length.
+
+    Paths stay in screen coordinates, the answer buttons sit at fixed
+    positions. Paths that cannot be resampled come back as NaN rows.
+    """
+    values, offsets = to_ragged([to_point_array(m).reshape(-1, 2) for m in movements])
+    resampled = resample_ragged(values, offsets, INTERPOLATION_POINTS, kind="cubic")
+    return resampled.reshape(len(movements), -1).astype(np.float32)
+
+def embed_files(items):
+    """Embedded paths, labels, deceptionFlags and file paths of a chunk of (file_path, label) pairs.
+
+    The process-pool work unit.
+    """
+    records = [load_json(file_path) for file_path, _ in items]
+    vectors = embed_paths([data.get("mouseMovements") or [] for data in records])
+    flagged = np.array([bool(data.get("deceptionFlag")) for data in records])
+    labels = np.array([label for _, label in items], dtype=np.int64)
+    return vectors, labels, flagged, [file_path for file_path, _ in items]
+
+def fit_pca(vectors, n_components=N_COMPONENTS, sample=PCA_SAMPLE, seed=SEED):
+    """(mean, components, explained variance ratio) of a random sample of the rows."""
+    from sklearn.decomposition import PCA
+
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(vectors), min(sample, len(vectors)), replace=False))
+    pca = PCA(n_components=min(n_components, len(rows), vectors.shape[1]), random_state=seed)
+    pca.fit(np.asarray(vectors[rows], dtype=np.float64))
+    return pca.mean_.astype(np.float32), pca.components_.astype(np.float32), pca.explained_variance_ratio_
+
+def vote(labels, distances):
+    """Inverse-distance weighted share of label-1 neighbours per row; an exact match decides alone."""
+    weights = 1 / np.maximum(distances, 1e-9)
+    return (weights * (labels == 1)).sum(axis=1) / weights.sum(axis=1)
+
+# === Index ===
+
+class TrajectoryIndex:
+    """Nearest-neighbour index over resampled mouse paths.
+
+    Paths are resampled to INTERPOLATION_POINTS points and stored in a
+    memory-mapped block; a PCA projection of them is indexed with a
+    BallTree. Paths added after the last build sit in a buffer that is
+    searched by brute force, and the tree is rebuilt once the buffer
+    outgrows REBUILD_FRACTION of it. Tree candidates are re-ranked on the
+    full resampled paths, so distances are exact Euclidean distances
+    between resampled paths. Paths, labels and flags live in SQLite.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(index_dir, "entries.sqlite"))
+        self.conn.executescript(SCHEMA)
+        self.arrays = {}
+        self.tree = None
+        self.pca = None
+        pca_path = os.path.join(index_dir, "pca.npz")
+        if os.path.exists(pca_path):
+            with np.load(pca_path) as saved:
+                self.pca = (saved["mean"], saved["components"])
+        tree_path = os.path.join(index_dir, "tree.pkl")
+        if os.path.exists(tree_path):
+            with open(tree_path, 'rb') as f:
+                self.tree = pickle.load(f)
+
+    def close(self):
+        for array in self.arrays.values():
+            array.flush()
+        self.conn.close()
+
+    def __len__(self):
+        return self._meta("count")
+
+    @property
+    def tree_size(self):
+        return self._meta("tree_size")
+
+    def _meta(self, key, value=None):
+        if value is not None:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+            return value
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def _array(self, name, width, dtype, rows=0):
+        """Memory-mapped block `name` with room for `rows` rows, growing by doubling."""
+        path = os.path.join(self.index_dir, f"{name}.npy")
+        if name not in self.arrays:
+            if not os.path.exists(path):
+                open_memmap(path, mode='w+', dtype=dtype, shape=(INITIAL_CAPACITY, width)).flush()
+            self.arrays[name] = np.load(path, mmap_mode='r+')
+        array = self.arrays[name]
+        if rows > len(array):
+            capacity = len(array)
+            while capacity < rows:
+                capacity *= 2
+            tmp_path = path + ".tmp"
+            grown = open_memmap(tmp_path, mode='w+', dtype=dtype, shape=(capacity, width))
+            used = min(len(self), len(array))
+            grown[:used] = array[:used]
+            grown.flush()
+            del grown, array
+            self.arrays[name] = None
+            os.replace(tmp_path, path)
+            self.arrays[name] = np.load(path, mmap_mode='r+')
+        return self.arrays[name]
+
+    @property
+    def vectors(self):
+        return self._array("vectors", INTERPOLATION_POINTS * 2, np.float32)
+
+    @property
+    def reduced(self):
+        return self._array("reduced", N_COMPONENTS, np.float32)
+
+    @property
+    def labels(self):
+        return self._array("labels", 1, np.int64)[:, 0]
+
+    def known_paths(self):
+        return {path for (path,) in self.conn.execute("SELECT path FROM entries")}
+
+    def project(self, vectors):
+        mean, components = self.pca
+        reduced = np.zeros((len(vectors), N_COMPONENTS), dtype=np.float32)
+        reduced[:, :len(components)] = (np.asarray(vectors, dtype=np.float32) - mean) @ components.T
+        return reduced
+
+    # === Insertion ===
+
+    def append(self, vectors, labels, flagged, paths):
+        """Store embedded paths; rows that are NaN (unusable paths) are skipped. Returns the number stored."""
+        usable = ~np.isnan(vectors).any(axis=1)
+        vectors, labels, flagged = vectors[usable], labels[usable], flagged[usable]
+        paths = [path for path, ok in zip(paths, usable) if ok]
+        start = len(self)
+        end = start + len(vectors)
+        self._array("vectors", INTERPOLATION_POINTS * 2, np.float32, end)[start:end] = vectors
+        self._array("labels", 1, np.int64, end)[start:end, 0] = labels
+        if self.pca is not None:
+            self._array("reduced", N_COMPONENTS, np.float32, end)[start:end] = self.project(vectors)
+        with self.conn:
+            self.conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)",
+                                  [(start + i, path, int(label), int(flag))
+                                   for i, (path, label, flag) in enumerate(zip(paths, labels, flagged))])
+            self._meta("count", end)
+        return len(vectors)
+
+    def add(self, items, workers=None):
+        """Embed and insert (file_path, label) pairs not yet indexed; the tree is rebuilt when the buffer is full.
+
+        Returns (added, skipped as unusable).
+        """
+        known = self.known_paths()
+        items = [(file_path, label) for file_path, label in items if file_path not in known]
+        added = 0
+        with span("index_insert", files=len(items)):
+            for vectors, labels, flagged, paths in imap_chunks(embed_files, items, workers):
+                added += self.append(vectors, labels, flagged, paths)
+
+        buffered = len(self) - self.tree_size
+        if buffered and (self.tree is None or buffered >= max(MIN_REBUILD, REBUILD_FRACTION * self.tree_size)
+                         or len(self) >= PCA_REFIT_GROWTH * self.pca_count):
+            self.rebuild()
+        self.flush()
+        return added, len(items) - added
+
+    @property
+    def pca_count(self):
+        """Number of stored paths when the projection was fitted."""
+        return self._meta("pca_count")
+
+    def fit_projection(self):
+        """Fit the PCA projection on the stored paths and project all of them; the tree must be rebuilt after."""
+        with span("pca_fit", sequences=len(self)):
+            mean, components, explained = fit_pca(self.vectors[:len(self)])
+            np.savez(os.path.join(self.index_dir, "pca.npz"), mean=mean, components=components,
+                     explained=explained)
+            self.pca = (mean, components)
+            reduced = self._array("reduced", N_COMPONENTS, np.float32, len(self))
+            for start in range(0, len(self), INITIAL_CAPACITY * 64):
+                stop = min(start + INITIAL_CAPACITY * 64, len(self))
+                reduced[start:stop] = self.project(self.vectors[start:stop])
+            with self.conn:
+                self._meta("pca_count", len(self))
+        print(f"PCA: {len(components)} components keep {explained.sum():.1%} of the path variance")
+
+    def rebuild(self):
+        """Rebuild the BallTree over every stored path, emptying the buffer.
+
+        The projection is refitted first when there is none yet or the index
+        has grown PCA_REFIT_GROWTH times since it was fitted, so a small first
+        batch does not fix the projection for good.
+        """
+        from sklearn.neighbors import BallTree
+
+        if self.pca is None or len(self) >= PCA_REFIT_GROWTH * self.pca_count:
+            self.fit_projection()
+        with span("tree_build", sequences=len(self)):
+            self.tree = BallTree(np.asarray(self.reduced[:len(self)]), leaf_size=LEAF_SIZE)
+            with open(os.path.join(self.index_dir, "tree.pkl"), 'wb') as f:
+                pickle.dump(self.tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+            with self.conn:
+                self._meta("tree_size", len(self))
+
+    def flush(self):
+        for array in self.arrays.values():
+            array.flush()
+
+    def update(self, folders=FOLDERS, workers=None, label_index=LABEL_INDEX_PATH):
+        """Add every session of the folders that is not indexed yet."""
+        return self.add(labelled_paths(folders, label_index), workers)
+
+    # === Queries ===
+
+    def search(self, vectors, k=K_NEIGHBOURS, exclude_rows=None):
+        """(rows, distances) of the k nearest stored paths to each embedded path, nearest first.
+
+        exclude_rows gives one stored row per query to leave out (e.g. the
+        query itself), or -1.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        count, tree_size = len(self), self.tree_size
+        extra = 0 if exclude_rows is None else 1
+        candidates = min(count, (k + extra) * RERANK_FACTOR)
+        reduced = self.project(vectors)
+
+        parts = []
+        if self.tree is not None and tree_size:
+            _, tree_rows = self.tree.query(reduced, k=min(candidates, tree_size))
+            parts.append(tree_rows)
+        if count > tree_size:
+            # The buffer is small, brute force in the reduced space
+            buffer = np.asarray(self.reduced[tree_size:count])
+            gap = ((reduced[:, None, :] - buffer[None, :, :]) ** 2).sum(axis=2)
+            take = min(candidates, len(buffer))
+            parts.append(tree_size + np.argpartition(gap, take - 1, axis=1)[:, :take])
+        rows = np.concatenate(parts, axis=1)
+
+        # Exact distances on the full resampled paths; rows are read in order from the memory map
+        unique, inverse = np.unique(rows, return_inverse=True)
+        full = np.asarray(self.vectors[unique])[inverse.reshape(rows.shape)]
+        distances = np.sqrt(((full - vectors[:, None, :]) ** 2).sum(axis=2))
+        if exclude_rows is not None:
+            distances[rows == np.asarray(exclude_rows)[:, None]] = np.inf
+        order = np.argsort(distances, axis=1, kind="stable")[:, :min(k, rows.shape[1])]
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(distances, order, axis=1)
+
+    def entries(self, rows):
+        """(path, label, flagged) of stored rows, in the order given."""
+        rows = [int(row) for row in np.ravel(rows)]
+        found = {}
+        for start in range(0, len(rows), 900):  # SQLite's bound-parameter limit
+            part = rows[start:start + 900]
+            found.update({row: (path, label, bool(flag)) for row, path, label, flag in self.conn.execute(
+                f"SELECT row, path, label, flagged FROM entries WHERE row IN ({','.join('?' * len(part))})", part)})
+        return [found[row] for row in rows]
+
+    def row_of(self, file_path):
+        row = self.conn.execute("SELECT row FROM entries WHERE path = ?", (file_path,)).fetchone()
+        return -1 if row is None else row[0]
+
+    def similar(self, file_path, k=10):
+        """The k stored answers whose path is closest to the file's, as (path, label, flagged, distance) rows.
+
+        The file itself is left out when it is indexed.
+        """
+        vectors = embed_paths([load_json(file_path).get("mouseMovements") or []])
+        if np.isnan(vectors).any():
+            raise ValueError(f"{file_path} has no usable mouse path")
+        rows, distances = self.search(vectors, k, exclude_rows=[self.row_of(file_path)])
+        return [(*entry, float(d)) for entry, d in zip(self.entries(rows[0]), distances[0]) if np.isfinite(d)]
+
+    def predict_proba(self, vectors, k=K_NEIGHBOURS, exclude_rows=None):
+        """k-NN probability of the deceptive label for each embedded path."""
+        rows, distances = self.search(vectors, k, exclude_rows)
+        return vote(np.asarray(self.labels)[rows], distances)
+
+# === Evaluation ===
+
+def knn_baseline(items, k=K_NEIGHBOURS, workers=None, index_dir=None, seed=SEED):
+    """Macro F1 and latency of the k-NN classifier on the training script's test split of (file_path, label) pairs.
+
+    Like the training script, only sessions featurize_session can use are
+    split, with stratified_split and the same seed, so the k-NN and the model
+    are scored on the same held-out answers. The index is built on the
+    training part only, in index_dir or a temporary directory. Returns the
+    report and the test items it scored.
+    """
+    import tempfile
+    from sklearn.metrics import f1_score
+    from input_pipeline import stratified_split
+    from sequence_features import featurize_files
+
+    featurized = np.concatenate([ok for _, ok in imap_chunks(featurize_files, [path for path, _ in items], workers)])
+    items = [item for item, ok in zip(items, featurized) if ok]
+    labels = np.array([label for _, label in items])
+    train, _, test = stratified_split(labels, seed)
+    train_items = [items[i] for i in train]
+    test_items = [items[i] for i in test]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = TrajectoryIndex(index_dir or tmp)
+        try:
+            start = time.perf_counter()
+            index.add(train_items, workers)
+            build_seconds = time.perf_counter() - start
+
+            vectors = np.concatenate([chunk[0] for chunk in imap_chunks(embed_files, test_items, workers)])
+            usable = ~np.isnan(vectors).any(axis=1)
+            start = time.perf_counter()
+            probabilities = index.predict_proba(vectors[usable], k)
+            batch_seconds = time.perf_counter() - start
+            single = [time.perf_counter()]
+            for vector in vectors[usable][:200]:
+                index.predict_proba(vector[None, :], k)
+                single.append(time.perf_counter())
+        finally:
+            index.close()
+
+    y_test = labels[test][usable]
+    test_items = [item for item, ok in zip(test_items, usable) if ok]
+    report = {
+        "model": f"{k}-NN on resampled paths",
+        "train": len(train_items), "test": int(usable.sum()),
+        "macro_f1": f1_score(y_test, (probabilities > 0.5).astype(int), average='macro'),
+        "build_seconds": build_seconds,
+        "batch_ms_per_answer": batch_seconds / max(len(y_test), 1) * 1000,
+        "single_query_ms": float(np.median(np.diff(single))) * 1000 if len(single) > 1 else None,
+    }
+    return report, test_items
+
+def model_baseline(test_items, model_path, workers=None):
+    """The same figures for the LSTM/GRU model on the same test answers (score_sessions)."""
+    from sklearn.metrics import f1_score
+    from score_sessions import load_model, predict_padded
+    from sequence_features import featurize_labelled_files
+
+    chunks = list(imap_chunks(featurize_labelled_files, test_items, workers))
+    X = np.concatenate([c[0] for c in chunks])
+    y = np.concatenate([c[1] for c in chunks])
+    model = load_model(model_path)
+    predict_padded(model, X[:1])  # Trace the graph outside the timing
+    start = time.perf_counter()
+    probabilities = predict_padded(model, X)
+    batch_seconds = time.perf_counter() - start
+    single = [time.perf_counter()]
+    for sequence in X[:200]:
+        model.predict_on_batch(sequence[None].astype(np.float32))
+        single.append(time.perf_counter())
+    return {
+        "model": os.path.basename(model_path), "train": None, "test": len(y),
+        "macro_f1": f1_score(y, (probabilities > 0.5).astype(int), average='macro'),
+        "build_seconds": None,
+        "batch_ms_per_answer": batch_seconds / max(len(y), 1) * 1000,
+        "single_query_ms": float(np.median(np.diff(single))) * 1000 if len(single) > 1 else None,
+    }
+
+def print_comparison(reports):
+    print(f"{'model':<32}{'test':>8}{'macro F1':>10}{'batch ms/answer':>17}{'single ms':>11}")
+    for r in reports:
+        single = f"{r['single_query_ms']:.2f}" if r['single_query_ms'] is not None else "n/a"
+        print(f"{r['model'][:31]:<32}{r['test']:>8}{r['macro_f1']:>10.4f}{r['batch_ms_per_answer']:>17.3f}{single:>11}")
+
+# === Entry Point ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nearest-neighbour index over resampled mouse paths.")
+    parser.add_argument("query", nargs="?", help="Session JSON to find similar answers for")
+    parser.add_argument("--index", default=INDEX_DIR)
+    parser.add_argument("--folders", nargs=2, metavar=("TRUTHFUL", "DECEPTIVE"), help="Defaults to data/")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--evaluate", action="store_true", help="Compare the k-NN classifier with the model")
+    parser.add_argument("--model", default="best_lstm_gru_model.h5")
+    parser.add_argument("--output", default="knn_comparison.json")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    folders = {args.folders[0]: 0, args.folders[1]: 1} if args.folders else FOLDERS
+    if args.evaluate:
+        knn, test_items = knn_baseline(labelled_paths(folders), K_NEIGHBOURS, args.workers)
+        reports = [knn]
+        if os.path.exists(args.model):
+            reports.append(model_baseline(test_items, args.model, args.workers))
+        print_comparison(reports)
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"✅ Saved comparison to: {args.output}")
+    else:
+        index = TrajectoryIndex(args.index)
+        try:
+            added, skipped = index.update(folders, args.workers)
+            print(f"Indexed {added} new answers ({skipped} without a usable path), {len(index)} in total.")
+            if args.query:
+                for path, label, flagged, distance in index.similar(args.query, args.k):
+                    print(f"{distance:>10.1f}  label {label}  {'flagged' if flagged else '       '}  {path}")
+        finally:
+            index.close()